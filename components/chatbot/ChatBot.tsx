@@ -53,6 +53,11 @@ const parseMarkdown = (text: string): string => {
     return text;
 };
 
+// Polling for an uploaded report: start fast, back off, give up after a while
+const UPLOAD_POLL_INITIAL_MS = 500;
+const UPLOAD_POLL_MAX_MS = 5000;
+const UPLOAD_POLL_TIMEOUT_MS = 3 * 60 * 1000;
+
 const Chatbot: React.FC<ChatbotProps> = ({ onClose }) => {
     const router = useRouter();
     const [messages, setMessages] = useState<ChatMessage[]>([]);
@@ -161,6 +166,32 @@ const Chatbot: React.FC<ChatbotProps> = ({ onClose }) => {
         return 'general';
     };
 
+    // Resolves with the session once it is ready or failed (a failed job carries its error);
+    // throws if the session is gone or processing takes longer than UPLOAD_POLL_TIMEOUT_MS
+    const waitForSession = async (sessionId: string) => {
+        const deadline = Date.now() + UPLOAD_POLL_TIMEOUT_MS;
+        let delay = UPLOAD_POLL_INITIAL_MS;
+        while (Date.now() < deadline) {
+            const response = await fetch(`${CHAT_URL}/session/${sessionId}`);
+            const session = await response.json().catch(() => ({}));
+            if (response.status === 404) {
+                throw new Error(session.error === 'Session not found'
+                    ? 'the report expired before it was processed. Please upload it again.'
+                    : session.error || 'Session not found');
+            }
+            // Other client errors will not go away; server errors may, so keep polling
+            if (!response.ok && response.status < 500) {
+                throw new Error(session.error || `Could not check the upload (HTTP ${response.status})`);
+            }
+            if (response.ok && session.status !== 'processing') {
+                return session;
+            }
+            await new Promise((resolve) => setTimeout(resolve, Math.min(delay, Math.max(0, deadline - Date.now()))));
+            delay = Math.min(delay * 2, UPLOAD_POLL_MAX_MS);
+        }
+        throw new Error('processing the report is taking too long. Please try again later.');
+    };
+
     const handleFileUpload = async (file: File) => {
         if (file.size > 16 * 1024 * 1024) {
             showError('File size must be less than 16MB.');
@@ -182,12 +213,18 @@ const Chatbot: React.FC<ChatbotProps> = ({ onClose }) => {
             const result = await response.json();
 
             if (response.ok) {
+                // The report is processed in the background; poll until it is ready
+                const session = await waitForSession(result.session_id);
+                if (session.status === 'failed') {
+                    showError(session.error || 'Upload failed');
+                    return;
+                }
                 setCurrentSessionId(result.session_id);
                 setFileInfo({
-                    name: result.filename,
-                    length: result.text_length
+                    name: session.filename,
+                    length: session.text_length
                 });
-                addMessage('system', `✅ PDF "<strong>${result.filename}</strong>" uploaded successfully! You can now ask questions about your lab report.`);
+                addMessage('system', `✅ PDF "<strong>${session.filename}</strong>" uploaded successfully! You can now ask questions about your lab report.`);
             } else {
                 showError(result.error || 'Upload failed');
             }
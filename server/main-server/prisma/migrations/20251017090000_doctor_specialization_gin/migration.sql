@@ -0,0 +1,18 @@
+-- CreateFunction
+-- Lowercased copy of a text array, used by the Python server's
+-- case-insensitive specialization lookup.
+CREATE OR REPLACE FUNCTION lower_text_array(text[]) RETURNS text[]
+    LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE
+    AS $$ SELECT array_agg(lower(s)) FROM unnest($1) AS s $$;
+
+-- CreateIndex
+-- Managed outside schema.prisma: Prisma cannot express an index on an
+-- expression, so `prisma migrate dev` sees this index as drift and proposes
+-- DROP INDEX "Doctor_specialization_lower_gin_idx". Delete that statement
+-- from any generated migration; the specialization lookup needs this index.
+CREATE INDEX "Doctor_specialization_lower_gin_idx" ON "Doctor" USING GIN (lower_text_array("specialization"));
+
+-- CreateIndex
+-- Declared in schema.prisma as @@index([ratings(sort: Desc), noOfPatients(sort: Desc)]);
+-- NULLS LAST matches the lookup's ORDER BY and is not modelled by Prisma.
+CREATE INDEX "Doctor_ratings_noOfPatients_idx" ON "Doctor"("ratings" DESC NULLS LAST, "noOfPatients" DESC);
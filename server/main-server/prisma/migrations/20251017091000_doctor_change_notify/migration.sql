@@ -0,0 +1,16 @@
+-- CreateFunction
+-- Lets the Python server's doctor directory cache invalidate itself
+-- (LISTEN doctor_changed) instead of waiting for its TTL.
+CREATE OR REPLACE FUNCTION notify_doctor_changed() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+BEGIN
+    PERFORM pg_notify('doctor_changed', TG_OP);
+    RETURN NULL;
+END;
+$$;
+
+-- CreateTrigger
+CREATE TRIGGER "Doctor_notify_changed"
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON "Doctor"
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_doctor_changed();
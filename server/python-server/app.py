@@ -1,19 +1,32 @@
 import os
-import pdfplumber
 import uuid
-import io
 import re
-from datetime import datetime, timedelta
-from flask import Flask, request, jsonify, render_template
+import json
+import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, as_completed
+from datetime import datetime
+from flask import Flask, Response, request, jsonify, render_template, g
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 from dotenv import load_dotenv
-from phi.agent import Agent
-from phi.model.google import Gemini
-from phi.tools.duckduckgo import DuckDuckGo
-import asyncio
-from connection import fetch_doctors_with_user
-from data import SYMPTOM_KEYWORDS,SYMPTOM_SPECIALIZATION_MAP
+import doctor_cache
+import response_cache
+from matcher import scan_text
+from specialization_scorer import rank_specializations, rank_specializations_many
+from session_store import create_session_store
+from lazy_agent import LazyAgent
+import lab_values
+import report_index
+import extraction_cache
+import upload_spool
+import metrics
+import llm_gateway
+import search_tools
+import conversation
+import context_cache
+from upload_jobs import UploadJobs, UploadQueueFull, session_status, PROCESSING, READY, FAILED, UPLOAD_RETRY_AFTER_SECONDS
 load_dotenv()
 
 app = Flask(__name__)
@@ -25,13 +38,11 @@ app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 ALLOWED_EXTENSIONS = {'pdf'}
 SESSION_TIMEOUT_MINUTES = 30
 
-# In-memory session storage (for serverless deployment)
-session_data = {}
+# Session storage: in-memory by default, Redis with SESSION_BACKEND=redis
+session_store = create_session_store(SESSION_TIMEOUT_MINUTES * 60)
 
-# Initialize AI Agents
-lab_agent = Agent(
-    model=Gemini(id="gemini-1.5-flash"),
-    tools=[DuckDuckGo()],
+# AI Agents (phi and Gemini are only imported when an agent is first used)
+lab_agent = LazyAgent(
     description="Medical assistant for lab report analysis",
     instructions=[
         "Explain lab results in simple language",
@@ -40,13 +51,10 @@ lab_agent = Agent(
         "Always recommend consulting healthcare professionals",
         "Never provide specific diagnoses or treatments",
         "Use bullet points for clarity"
-    ],
-    markdown=True
+    ]
 )
 
-general_agent = Agent(
-    model=Gemini(id="gemini-1.5-flash"),
-    tools=[DuckDuckGo()],
+general_agent = LazyAgent(
     description="Medical assistant for general health questions",
     instructions=[
         "Provide educational health information",
@@ -55,13 +63,10 @@ general_agent = Agent(
         "Always recommend professional consultation",
         "Stay within educational bounds",
         "Use clear formatting"
-    ],
-    markdown=True
+    ]
 )
 
-symptoms_agent = Agent(
-    model=Gemini(id="gemini-1.5-flash"),
-    tools=[DuckDuckGo()],
+symptoms_agent = LazyAgent(
     description="Medical assistant for symptom analysis",
     instructions=[
         "Analyze symptoms educationally",
@@ -70,65 +75,262 @@ symptoms_agent = Agent(
         "Provide general self-care tips",
         "Always emphasize professional evaluation",
         "Include medical disclaimers"
+    ]
+)
+
+summary_agent = LazyAgent(
+    description="Assistant that keeps notes of a conversation about a lab report",
+    instructions=[
+        "Summarize conversations briefly and factually",
+        "Keep the lab values, concerns and questions that were discussed",
+        "Leave out greetings, disclaimers and formatting"
     ],
-    markdown=True
+    markdown=False
 )
 
+# Concurrency, rate limits, retries and circuit breaking for every model call
+model_gateway = llm_gateway.LLMGateway()
+
 def allowed_file(filename):
     """Check if file extension is allowed"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def extract_text_from_pdf_bytes(pdf_bytes):
-    """Extract text from PDF bytes using pdfplumber"""
+@metrics.timed('pdf_extraction')
+def process_uploaded_pdf(source, on_progress=None):
+    """Extract text and tables once at upload time -> fields for the session.
+
+    source is the PDF's bytes or the path of the spooled upload.
+    """
+    import pdf_extract
     try:
-        text = ""
-        with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
-        return text.strip()
+        text, tables = pdf_extract.extract_document(source, on_progress=on_progress, tables=True)
     except Exception as e:
         raise Exception(f"Error extracting text from PDF: {str(e)}")
+    return {
+        'text': text,
+        'lab_values': lab_values.parse_lab_values(text, tables),
+        'report_index': report_index.build_index(text)
+    }
 
-def cleanup_expired_sessions():
-    """Remove expired sessions from memory"""
-    current_time = datetime.now()
-    expired_sessions = []
-    
-    for session_id, data in session_data.items():
-        if current_time - data['timestamp'] > timedelta(minutes=SESSION_TIMEOUT_MINUTES):
-            expired_sessions.append(session_id)
-    
-    for session_id in expired_sessions:
-        del session_data[session_id]
+def lab_context(session_info, query):
+    """Report text for a lab prompt: the flagged results and the chunks
+    relevant to the question, within REPORT_CONTEXT_TOKENS"""
+    index = session_info.get('report_index') or report_index.build_index(session_info['text'])
+    columns = session_info.get('lab_values') or lab_values.parse_lab_values(session_info['text'])
+    flagged = lab_values.flagged_text(columns)
+    # A follow-up ("is that bad?") is searched together with the question before it
+    previous = conversation_memory.last_question(session_info)
+    return report_index.select_context(index, f"{previous} {query}" if previous else query,
+                                       pinned=flagged.split("\n") if flagged else (),
+                                       pinned_title="Results flagged outside their reference range:")
+
+def lab_request(session_id, session_info, query):
+    """(agent, prompt) for a question about a report, with the conversation so far.
+
+    Once the report is cached with the model (see context_cache) the prompt
+    is only the question part; otherwise the relevant chunks of the report
+    are inlined. Questions that need web search keep the inline prompt, since
+    requests on cached content cannot add tools.
+    """
+    agent = choose_agent(lab_agent, query)
+    history = conversation_memory.history(session_info)
+    if report_context_cache is not None and agent is lab_agent:
+        cached_agent = report_context_cache.agent_for(session_id, session_info, lab_agent,
+                                                      lambda: build_lab_prefix(session_info['text']))
+        if cached_agent is not None:
+            return cached_agent, build_lab_question(query, history)
+    return agent, build_lab_prompt(lab_context(session_info, query), query, history)
+
+def remember_turn(session_id, query):
+    """on_response callback that adds the answer to the session's conversation"""
+    return lambda response: conversation_memory.add_turn(session_id, query, response)
+
+# Report prefixes registered with the model once per session (None when
+# CONTEXT_CACHE_BACKEND=off); they expire together with their sessions
+_context_backend = context_cache.create_context_backend()
+report_context_cache = (context_cache.ContextCache(session_store, _context_backend, SESSION_TIMEOUT_MINUTES * 60)
+                        if _context_backend else None)
+
+# Re-uploads of the same file share one extraction result. Sessions hold a
+# reference to it, which only stores that report removals can release.
+TRACK_CONTENT_REFS = session_store.reports_removals
+
+def release_session(session_id, session):
+    """Drop what a removed session held outside the session store"""
+    extraction_cache.release(session_id)
+    if report_context_cache is not None:
+        report_context_cache.release(session)
+
+if TRACK_CONTENT_REFS:
+    session_store.on_remove = release_session
+
+def process_upload(session_id, upload, on_progress=None):
+    """Upload job: the (cached) extraction result for a spooled upload,
+    which is removed once extracted"""
+    digest = upload.digest
+    try:
+        fields = extraction_cache.get_or_create(digest, lambda: process_uploaded_pdf(upload.path, on_progress),
+                                                session_id if TRACK_CONTENT_REFS else None)
+    finally:
+        upload.remove()
+    # A session deleted or expired while extracting already ran release_session;
+    # drop the reference it could not release. Later removals release it as usual
+    if TRACK_CONTENT_REFS and session_store.get(session_id, touch=False) is None:
+        extraction_cache.release(session_id)
+    return {**fields, 'content_id': digest}
+
+def reuse_extraction(session_id, filename, digest):
+    """Create a ready session straight away if this file was extracted before.
+
+    Returns the session, or None if the upload needs a new extraction.
+    """
+    fields = extraction_cache.get(digest, session_id if TRACK_CONTENT_REFS else None)
+    if fields is None:
+        return None
     
-    if expired_sessions:
-        print(f"Cleaned up {len(expired_sessions)} expired sessions")
+    session = {
+        **fields,
+        'content_id': digest,
+        'filename': filename,
+        'status': READY if fields.get('text') else FAILED,
+        'timestamp': datetime.now()
+    }
+    if session['status'] == FAILED:
+        session['error'] = "No text could be extracted from the PDF"
+    session_store.put(session_id, session)
+    return session
+
+def upload_accepted(session_id, session):
+    """Response body for an upload answered from the extraction cache"""
+    return {
+        "message": "PDF uploaded and processed successfully",
+        "session_id": session_id,
+        "filename": session['filename'],
+        "text_length": len(session['text']),
+        "status": READY
+    }
+
+def spool_upload(stream):
+    """Copy an uploaded file to disk in chunks -> SpooledUpload (never the whole file in memory)"""
+    return upload_spool.spool(stream, app.config['MAX_CONTENT_LENGTH'])
+
+def start_upload(session_id, filename, upload):
+    """Reuse an earlier extraction of this file, or queue a new one.
+
+    Returns (body, status code); raises UploadQueueFull. Takes ownership of
+    the spooled upload: a queued job removes it when done, otherwise it is
+    removed here.
+    """
+    queued = False
+    try:
+        # The same file uploaded before: reuse its extraction
+        session = reuse_extraction(session_id, filename, upload.digest)
+        if session is not None:
+            if session['status'] == FAILED:
+                return {"error": session['error']}, 400
+            return upload_accepted(session_id, session), 200
+
+        # Extraction runs in the background; poll /session/<id> for progress
+        upload_jobs.submit(session_id, filename, upload)
+        queued = True
+        return {
+            "message": "PDF uploaded, processing started",
+            "session_id": session_id,
+            "filename": filename,
+            "status": PROCESSING
+        }, 202
+    finally:
+        if not queued:
+            upload.remove()
+
+# Background text extraction for uploads (bounded queue, see upload_jobs.py)
+upload_jobs = UploadJobs(session_store, process_upload)
+
+metrics.Gauge("sessions_live", "Sessions currently stored",
+              lambda: session_store.stats().get("sessions"))
+metrics.Gauge("session_bytes", "Approximate memory held by stored sessions",
+              lambda: session_store.stats().get("bytes"))
+metrics.Gauge("upload_jobs_in_flight", "Uploads being processed or waiting",
+              lambda: upload_jobs.stats()["in_flight"])
+metrics.Gauge("llm_generations_running", "Model generations holding a gateway slot",
+              lambda: model_gateway.stats()["running"])
+
+def session_progress(session_info):
+    """Processing status of an uploaded report"""
+    return {
+        "status": session_status(session_info),
+        "pages_done": session_info.get('pages_done'),
+        "pages_total": session_info.get('pages_total')
+    }
+
+def session_not_ready(session_info):
+    """(payload, status code) if the report cannot be queried yet, else None"""
+    status = session_status(session_info)
+    if status == PROCESSING:
+        return {
+            "message": "Your report is still being processed. Please try again in a moment.",
+            "filename": session_info['filename'],
+            **session_progress(session_info)
+        }, 202
+    if status == FAILED:
+        return {"error": session_info['error'], "status": FAILED}, 400
+    return None
+
+def describe_session(session_info):
+    """Public view of a session for /session/<id>"""
+    info = {
+        "filename": session_info['filename'],
+        "text_length": len(session_info['text']),
+        "upload_time": session_info['timestamp'].isoformat(),
+        **session_progress(session_info),
+        "conversation": conversation_memory.stats(session_info)
+    }
+    if info["status"] == FAILED:
+        info["error"] = session_info['error']
+    return info
+
+def describe_values(session_info, query=None, flagged_only=False):
+    """Lab values of a session matching the query, for /session/<id>/values"""
+    columns = session_info.get('lab_values') or lab_values.parse_lab_values(session_info['text'])
+    values = lab_values.lookup(columns, query, flagged_only)
+    return {
+        "filename": session_info['filename'],
+        "query": query,
+        "count": len(values),
+        "flagged_count": sum(1 for value in values if value['flag']),
+        "values": values
+    }
 
+def cleanup_expired_sessions():
+    """Remove expired sessions from the session store"""
+    expired = session_store.cleanup()
+    if expired:
+        print(f"Cleaned up {expired} expired sessions")
+
+# Phrasings that usually introduce a symptom description
+SYMPTOM_PATTERNS = [re.compile(pattern) for pattern in [
+    r'i have|i am having|i feel|i am feeling|experiencing',
+    r'my \w+ (hurt|pain|ache|sore)',
+    r'(pain|ache|hurt) in my',
+    r'i have been (sick|unwell|feeling)',
+    r'symptoms include|symptoms are',
+    r'for \d+ days?|for \d+ weeks?|since yesterday|since last week'
+]]
+
+@metrics.timed('detect_query_type')
 def detect_query_type(query):
     """Detect what type of query this is based on content"""
     query_lower = query.lower()
+    hits = scan_text(query)
     
     # Check for file upload requests
-    upload_keywords = ['upload', 'pdf', 'report', 'lab report', 'test results', 'file']
-    if any(keyword in query_lower for keyword in upload_keywords):
+    if hits['upload_keywords']:
         return 'upload_request'
     
     # Check for symptom descriptions
-    symptom_count = sum(1 for keyword in SYMPTOM_KEYWORDS if keyword in query_lower)
-    
-    # Symptom patterns
-    symptom_patterns = [
-        r'i have|i am having|i feel|i am feeling|experiencing',
-        r'my \w+ (hurt|pain|ache|sore)',
-        r'(pain|ache|hurt) in my',
-        r'i have been (sick|unwell|feeling)',
-        r'symptoms include|symptoms are',
-        r'for \d+ days?|for \d+ weeks?|since yesterday|since last week'
-    ]
+    symptom_count = len(hits['symptom_keywords'])
     
-    pattern_matches = sum(1 for pattern in symptom_patterns if re.search(pattern, query_lower))
+    pattern_matches = sum(1 for pattern in SYMPTOM_PATTERNS if pattern.search(query_lower))
     
     # If high symptom keyword count or pattern matches, likely symptoms
     if symptom_count >= 2 or pattern_matches >= 1:
@@ -137,49 +339,61 @@ def detect_query_type(query):
     # Default to general medical question
     return 'general'
 
+# Reported when no symptom phrase matched; no doctors are looked up for it
+FALLBACK_SPECIALIZATION = 'general'
+SYMPTOMS_RECOMMENDED_DOCTORS = int(os.getenv('SYMPTOMS_RECOMMENDED_DOCTORS', '3'))
+
+@metrics.timed('analyze_symptoms_for_specialization')
 def analyze_symptoms_for_specialization(symptoms_text):
-    """Analyze symptoms to determine appropriate medical specialization"""
-    symptoms_lower = symptoms_text.lower()
-    
-    # Count matches for each specialization
-    specialization_scores = {}
-    
-    for symptom, specialization in SYMPTOM_SPECIALIZATION_MAP.items():
-        if symptom in symptoms_lower:
-            if specialization not in specialization_scores:
-                specialization_scores[specialization] = 0
-            specialization_scores[specialization] += 1
-    
-    # Return the specialization with highest score, or general if no matches
-    if specialization_scores:
-        return max(specialization_scores, key=specialization_scores.get)
-    else:
-        return 'general'
+    """Rank the specializations that fit the symptoms: [(specialization, confidence), ...]"""
+    return rank_specializations(symptoms_text)
 
-def get_doctors_by_specialization(specialization):
-    data = asyncio.run(fetch_doctors_with_user())
-    # print(data)
-    ans = []
+def merge_doctors(ranked, doctors_by_specialization, limit=SYMPTOMS_RECOMMENDED_DOCTORS):
+    """Pick doctors across the ranked specializations.
+
+    Slots go to specializations in proportion to their confidence (highest
+    confidence / (doctors already taken + 1) next), so the top match gets
+    most of the list and a close runner-up still gets a doctor.
+    """
+    candidates = {specialization: list(doctors_by_specialization.get(specialization) or [])
+                  for specialization, _ in ranked}
+    taken = {specialization: 0 for specialization, _ in ranked}
+    seen = set()
+    merged = []
+    while len(merged) < limit:
+        available = [(confidence / (taken[specialization] + 1), specialization)
+                     for specialization, confidence in ranked if candidates[specialization]]
+        if not available:
+            break
+        specialization = max(available, key=lambda item: item[0])[1]
+        doctor = candidates[specialization].pop(0)
+        if doctor["Doctor ID"] in seen:
+            continue
+        seen.add(doctor["Doctor ID"])
+        taken[specialization] += 1
+        merged.append({**doctor, "Specialization": specialization})
+    return merged
 
-    # print(f"Looking for specialization: {specialization.lower()}")
+def symptoms_triage(ranked, doctors_by_specialization):
+    """The specialization and doctor fields of a symptoms response"""
+    return {
+        "specialization": ranked[0][0] if ranked else FALLBACK_SPECIALIZATION,
+        "specializations": [{"specialization": specialization, "confidence": confidence}
+                            for specialization, confidence in ranked],
+        "recommended_doctors": merge_doctors(ranked, doctors_by_specialization)
+    }
+
+def format_doctors(data):
+    """Shape doctor directory records for API responses"""
+    ans = []
 
     for doc in data:
-        specializations = doc.get('Specialization', [])
-        # print(f"Doctor: {doc['name']} - Specializations: {specializations}")
-
-        # Lowercase conversion for matching
-        specializations_lower = [spec.lower() for spec in specializations]
-        # print(f"Converted Specializations: {specializations_lower}")
-
-        if specialization.lower() in specializations_lower:
-            # print(f"Matched Doctor: {doc['name']}")
-            ans.append({
-                "Doctor ID": doc["id"],
-                "Doctor Name": doc["name"],
-                "Rating": doc["rating"]
-            })
+        ans.append({
+            "Doctor ID": doc["id"],
+            "Doctor Name": doc["name"],
+            "Rating": doc["rating"]
+        })
 
-    # print("Final matched doctors:", ans)
     return ans
 
 #Storing data(work for Ankush)
@@ -187,6 +401,532 @@ def store_data_for_past_reports(request_type,data,any_file):
     # Store data for past reports
     return ""
 
+def build_lab_prefix(report):
+    """Stable part of a lab prompt: the report and how to answer about it.
+    Every question on a session shares it, so it can be cached with the model."""
+    return f"""Here is a medical lab report (or the parts of it relevant to the question):
+
+{report}
+
+Please analyze this lab report and answer the user's question. Remember to:
+- Explain medical terms in simple language
+- Mention normal ranges when discussing lab values
+- Be reassuring and educational
+- Always recommend consulting with a healthcare provider
+- Never provide specific medical diagnoses or treatment recommendations"""
+
+def build_lab_question(query, history=""):
+    """Per-question part of a lab prompt, after the prefix"""
+    if history:
+        history = f"""Earlier in this conversation:
+
+{history}
+
+"""
+    return f"{history}User's question: {query}"
+
+def build_lab_prompt(context, query, history=""):
+    """Prompt for questions about an uploaded lab report"""
+    return f"{build_lab_prefix(context)}\n\n{build_lab_question(query, history)}"
+
+def build_summary_prompt(summary, turns):
+    """Prompt for folding older turns of a conversation into its summary"""
+    earlier = f"Summary so far: {summary}\n\n" if summary else ""
+    transcript = "\n\n".join(conversation.turn_text(question, answer) for question, answer in turns)
+    return f"""{earlier}{transcript}
+
+Update the summary of this conversation about the user's lab report so it covers everything above, in at most {conversation.CONVERSATION_SUMMARY_TOKENS * 3 // 4} words. Keep:
+- The lab values and results that were discussed
+- The user's concerns and open questions
+Return only the summary text."""
+
+def build_symptoms_prompt(symptoms):
+    """Prompt for symptom analysis"""
+    return f"""User is experiencing these symptoms: {symptoms}
+
+Please provide educational information about these symptoms. Remember to:
+- Explain what these symptoms might indicate in general terms
+- Mention possible common causes (without diagnosing)
+- Suggest when to seek immediate medical attention (red flags)
+- Provide general self-care tips where appropriate
+- Always emphasize that symptoms require professional medical evaluation
+- Never provide specific diagnoses or treatment recommendations
+- Be reassuring while being informative
+- Use bullet points and clear formatting for better readability
+- Include disclaimer about not replacing professional medical advice"""
+
+def build_general_prompt(query):
+    """Prompt for general medical questions"""
+    return f"""User's general medical question: {query}
+
+Please provide helpful, educational information about this health topic. Remember to:
+- Explain medical terms and concepts in simple language
+- Provide accurate, general health information
+- Be reassuring and educational
+- Always emphasize the importance of consulting healthcare professionals
+- Never provide specific diagnoses, prescriptions, or critical medical decisions
+- Stay within the bounds of general health education
+- Use bullet points and clear formatting for better readability"""
+
+# Fallback messages per agent: (log label, empty response, error response)
+# Shown when the gateway sheds load instead of calling the model
+LLM_BUSY_MESSAGE = "I'm getting a lot of questions right now. Please try again in a minute."
+
+LAB_MESSAGES = (
+    "Agent",
+    "I apologize, but I couldn't generate a response. Please try rephrasing your question.",
+    "I'm sorry, but I encountered an error while processing your question. Please try again."
+)
+SYMPTOMS_MESSAGES = (
+    "Symptoms agent",
+    "I apologize, but I couldn't generate a response. Please try describing your symptoms differently.",
+    "I'm sorry, but I encountered an error while analyzing your symptoms. Please try again."
+)
+GENERAL_MESSAGES = (
+    "General agent",
+    "I apologize, but I couldn't generate a response. Please try rephrasing your question.",
+    "I'm sorry, but I encountered an error while processing your question. Please try again."
+)
+
+def agent_name(agent):
+    """Label for an agent in /metrics"""
+    agent = getattr(agent, 'plain', agent)
+    if agent is lab_agent:
+        return 'lab'
+    if agent is symptoms_agent:
+        return 'symptoms'
+    if agent is general_agent:
+        return 'general'
+    if agent is summary_agent:
+        return 'summary'
+    return 'other'
+
+def choose_agent(agent, query):
+    """The agent to answer this question with: its web-search twin only when
+    the question needs fresh information (see search_tools.SEARCH_POLICY)"""
+    if search_tools.needs_web_search(query) and hasattr(agent, 'with_web_search'):
+        return agent.with_web_search()
+    return agent
+
+def run_model(agent, prompt):
+    """Start a streamed generation through the model gateway, timed for
+    /metrics. Identical prompts to the same agent share one generation."""
+    name = agent_name(agent)
+    metrics.LLM_PROMPT_TOKENS.observe(report_index.estimate_tokens(prompt), agent=name)
+    upstream = model_gateway.stream(lambda: agent.run(prompt, stream=True), key=(id(agent), prompt))
+    return metrics.time_generation(name, upstream)
+
+def summarize_conversation(summary, turns):
+    """Summary of a conversation's older turns, written by the model"""
+    text = "".join(chunk.content for chunk in run_model(summary_agent, build_summary_prompt(summary, turns))
+                   if chunk.content).strip()
+    if not text:
+        raise ValueError("empty summary")
+    return text
+
+# Per-session history for follow-up questions about a report
+conversation_memory = conversation.ConversationMemory(session_store, summarize_conversation)
+
+def failure_message(error, error_message):
+    """What to tell the user when a generation failed"""
+    if isinstance(error, llm_gateway.LLMUnavailable):
+        return LLM_BUSY_MESSAGE
+    return error_message
+
+def run_agent(agent, prompt, messages, cache_key=None, on_response=None):
+    """Run an agent to completion and return its full response text.
+
+    cache_key is an optional (namespace, query) pair for response_cache; only
+    pass it for answers that do not depend on per-session data. on_response
+    is called with the answer when the model produced one (not with the
+    fallback messages).
+    """
+    label, empty_message, error_message = messages
+    if cache_key:
+        cached = response_cache.get(*cache_key)
+        if cached is not None:
+            if on_response:
+                on_response(cached)
+            return cached
+    
+    start = time.perf_counter()
+    try:
+        chunks = []
+        for chunk in run_model(agent, prompt):
+            if chunk.content:
+                chunks.append(chunk.content)
+        response = "".join(chunks)
+        
+        if not response.strip():
+            return empty_message
+        if cache_key:
+            response_cache.put(*cache_key, response, time.perf_counter() - start)
+    
+    except Exception as e:
+        print(f"{label} error: {e}")
+        return failure_message(e, error_message)
+    
+    if on_response:
+        on_response(response)
+    return response
+
+def wants_stream(data):
+    """Whether the client asked for a streamed (SSE) response"""
+    return bool(data.get("stream")) or request.accept_mimetypes.best == 'text/event-stream'
+
+def sse_event(event, payload):
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+def stream_agent(agent, prompt, metadata, messages, cache_key=None, on_response=None):
+    """Stream an agent response as Server-Sent Events.
+
+    Sends a `metadata` event first, then one `chunk` event per piece of text as
+    the model produces it, then `done` (or `error`). If the client disconnects,
+    the WSGI server closes this generator and the upstream generation is closed
+    with it, so we stop pulling tokens from Gemini. A cached response is sent
+    as a single chunk. on_response gets the full answer once it has been sent.
+    """
+    label, empty_message, error_message = messages
+
+    def generate():
+        yield sse_event('metadata', metadata)
+        cached = response_cache.get(*cache_key) if cache_key else None
+        if cached is not None:
+            yield sse_event('chunk', {"content": cached})
+            if on_response:
+                on_response(cached)
+            yield sse_event('done', {})
+            return
+        
+        upstream = None
+        pieces = []
+        start = time.perf_counter()
+        try:
+            upstream = run_model(agent, prompt)
+            for chunk in upstream:
+                if chunk.content:
+                    pieces.append(chunk.content)
+                    yield sse_event('chunk', {"content": chunk.content})
+            
+            if not pieces:
+                yield sse_event('chunk', {"content": empty_message})
+            else:
+                if cache_key:
+                    response_cache.put(*cache_key, "".join(pieces), time.perf_counter() - start)
+                if on_response:
+                    on_response("".join(pieces))
+        except Exception as e:
+            print(f"{label} error: {e}")
+            yield sse_event('error', {"error": failure_message(e, error_message)})
+        finally:
+            if upstream is not None and hasattr(upstream, 'close'):
+                upstream.close()
+        yield sse_event('done', {})
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+# Symptoms pipeline: the LLM explanation does not depend on the doctor lookup,
+# so both stages run at the same time, each with its own time budget
+SYMPTOMS_DOCTORS_TIMEOUT = float(os.getenv('SYMPTOMS_DOCTORS_TIMEOUT', '3'))
+SYMPTOMS_GENERATION_TIMEOUT = float(os.getenv('SYMPTOMS_GENERATION_TIMEOUT', '60'))
+PIPELINE_THREADS = int(os.getenv('PIPELINE_THREADS', '32'))
+SYMPTOMS_DOCTOR_THREADS = int(os.getenv('SYMPTOMS_DOCTOR_THREADS', '8'))
+SYMPTOMS_TIMEOUT_MESSAGE = "I'm sorry, analyzing your symptoms is taking longer than expected. Please check the recommended doctors below or try again."
+
+_pipeline_executor = ThreadPoolExecutor(max_workers=PIPELINE_THREADS, thread_name_prefix="pipeline")
+# Doctor lookups get threads of their own: a generation can hold a pipeline
+# thread for up to SYMPTOMS_GENERATION_TIMEOUT while it waits for the gateway
+_doctor_executor = ThreadPoolExecutor(max_workers=SYMPTOMS_DOCTOR_THREADS, thread_name_prefix="doctors")
+
+_STREAM_DONE = object()
+
+def start_agent_stream(agent, prompt, timeout):
+    """Start an agent generation in the background.
+
+    Returns (chunks, cancelled, deadline): a queue that receives text chunks (or
+    an exception) followed by _STREAM_DONE, an event that stops the generation
+    at the next chunk, and the monotonic time by which it must finish.
+    """
+    chunks = queue.Queue()
+    cancelled = threading.Event()
+
+    def produce():
+        upstream = None
+        try:
+            upstream = run_model(agent, prompt)
+            for chunk in upstream:
+                if cancelled.is_set():
+                    break
+                if chunk.content:
+                    chunks.put(chunk.content)
+        except Exception as e:
+            chunks.put(e)
+        finally:
+            if upstream is not None and hasattr(upstream, 'close'):
+                upstream.close()
+            chunks.put(_STREAM_DONE)
+
+    _pipeline_executor.submit(produce)
+    return chunks, cancelled, time.monotonic() + timeout
+
+def completed_agent_stream(text):
+    """An agent stream that is already finished, e.g. for a cached response"""
+    chunks = queue.Queue()
+    chunks.put(text)
+    chunks.put(_STREAM_DONE)
+    return chunks, threading.Event(), float('inf')
+
+def iterate_agent_stream(stream):
+    """Yield text from a started agent stream; TimeoutError past its deadline"""
+    chunks, cancelled, deadline = stream
+    try:
+        while True:
+            try:
+                item = chunks.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                raise TimeoutError("Agent generation timed out")
+            if item is _STREAM_DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        cancelled.set()
+
+def find_doctors_for_symptoms(symptoms):
+    """Doctor stage: rank specializations, then look up doctors for the top ones"""
+    ranked = analyze_symptoms_for_specialization(symptoms)
+    doctors = get_doctors_for_specializations([specialization for specialization, _ in ranked]) if ranked else {}
+    return symptoms_triage(ranked, doctors)
+
+def start_symptoms_pipeline(symptoms):
+    """Start LLM generation and the doctor stage concurrently.
+
+    Returns (stream, lookup, from_cache); a cached explanation skips the LLM.
+    """
+    stream, from_cache = start_symptoms_generation(symptoms)
+    return stream, start_doctor_lookup(symptoms), from_cache
+
+def start_doctor_lookup(symptoms):
+    """Start the doctor stage in the background.
+
+    Returns (future, started): started receives the monotonic time at which
+    the lookup left the queue, which is when its time budget begins.
+    """
+    started = queue.Queue(maxsize=1)
+
+    def lookup():
+        started.put(time.monotonic())
+        return find_doctors_for_symptoms(symptoms)
+
+    return _doctor_executor.submit(lookup), started
+
+def start_symptoms_generation(symptoms):
+    """Start the LLM explanation, or serve it from the response cache.
+
+    Returns (stream, from_cache).
+    """
+    cached = response_cache.get('symptoms', symptoms)
+    if cached is not None:
+        return completed_agent_stream(cached), True
+    stream = start_agent_stream(choose_agent(symptoms_agent, symptoms), build_symptoms_prompt(symptoms), SYMPTOMS_GENERATION_TIMEOUT)
+    return stream, False
+
+def resolve_doctor_lookup(symptoms, lookup):
+    """Wait for the doctor stage, SYMPTOMS_DOCTORS_TIMEOUT from when it
+    started; on timeout or error return no doctors"""
+    future, started = lookup
+    try:
+        started_at = started.get(timeout=SYMPTOMS_GENERATION_TIMEOUT)
+        return future.result(timeout=max(0, started_at + SYMPTOMS_DOCTORS_TIMEOUT - time.monotonic()))
+    except (FutureTimeoutError, queue.Empty):
+        print("Doctor lookup timed out")
+    except Exception as e:
+        print(f"Doctor lookup error: {e}")
+    return symptoms_triage(analyze_symptoms_for_specialization(symptoms), {})
+
+def run_symptoms_pipeline(symptoms):
+    """Run the symptoms pipeline; returns (response, triage), triage being the
+    symptoms_triage() fields.
+
+    Latency is the slower of the two stages rather than their sum, and a
+    timeout in one stage still returns the result of the other.
+    """
+    start = time.perf_counter()
+    stream, lookup, from_cache = start_symptoms_pipeline(symptoms)
+    triage = resolve_doctor_lookup(symptoms, lookup)
+    response = collect_symptoms_response(symptoms, stream, from_cache, start)
+    return response, triage
+
+def collect_symptoms_response(symptoms, stream, from_cache, start):
+    """Wait for a started symptoms explanation and return the text to send"""
+    label, empty_message, error_message = SYMPTOMS_MESSAGES
+    try:
+        response = "".join(iterate_agent_stream(stream))
+        if not response.strip():
+            response = empty_message
+        elif not from_cache:
+            response_cache.put('symptoms', symptoms, response, time.perf_counter() - start)
+    except TimeoutError:
+        print(f"{label} timed out")
+        response = SYMPTOMS_TIMEOUT_MESSAGE
+    except Exception as e:
+        print(f"{label} error: {e}")
+        response = failure_message(e, error_message)
+    return response
+
+def stream_symptoms_pipeline(symptoms, metadata):
+    """Streaming variant of run_symptoms_pipeline().
+
+    Generation starts straight away; the leading metadata event is sent once
+    the doctor stage resolves, followed by whatever text is buffered so far.
+    """
+    label, empty_message, error_message = SYMPTOMS_MESSAGES
+    start = time.perf_counter()
+    stream, lookup, from_cache = start_symptoms_pipeline(symptoms)
+
+    def generate():
+        pieces = []
+        try:
+            triage = resolve_doctor_lookup(symptoms, lookup)
+            yield sse_event('metadata', {**metadata, **triage})
+
+            for content in iterate_agent_stream(stream):
+                pieces.append(content)
+                yield sse_event('chunk', {"content": content})
+
+            if not pieces:
+                yield sse_event('chunk', {"content": empty_message})
+            elif not from_cache:
+                response_cache.put('symptoms', symptoms, "".join(pieces), time.perf_counter() - start)
+        except TimeoutError:
+            print(f"{label} timed out")
+            yield sse_event('error', {"error": SYMPTOMS_TIMEOUT_MESSAGE})
+        except Exception as e:
+            print(f"{label} error: {e}")
+            yield sse_event('error', {"error": failure_message(e, error_message)})
+        finally:
+            # Client went away or we are done: stop the generation either way
+            stream[1].set()
+        yield sse_event('done', {})
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+# Batch triage: many symptom texts in one request. Explanations run on a
+# bounded pool shared by all batches so one large batch cannot take every
+# pipeline thread.
+SYMPTOMS_BATCH_MAX_ITEMS = int(os.getenv('SYMPTOMS_BATCH_MAX_ITEMS', '50'))
+SYMPTOMS_BATCH_CONCURRENCY = int(os.getenv('SYMPTOMS_BATCH_CONCURRENCY', '8'))
+
+_batch_executor = ThreadPoolExecutor(max_workers=SYMPTOMS_BATCH_CONCURRENCY, thread_name_prefix="batch")
+
+def parse_symptoms_batch(data):
+    """(texts, None) for a valid batch request, else (None, error message)"""
+    items = data.get("symptoms")
+    if not isinstance(items, list) or not items:
+        return None, "Provide a non-empty list of symptom descriptions in 'symptoms'"
+    if len(items) > SYMPTOMS_BATCH_MAX_ITEMS:
+        return None, f"A batch can have at most {SYMPTOMS_BATCH_MAX_ITEMS} items"
+    return [item.strip() if isinstance(item, str) else "" for item in items], None
+
+@metrics.timed('analyze_symptoms_for_specialization')
+def specializations_for_batch(texts):
+    """analyze_symptoms_for_specialization() for every text of a batch, scored together"""
+    return rank_specializations_many(texts)
+
+def get_doctors_for_specializations(specializations, limit=10):
+    """Doctors for several specializations with one directory lookup"""
+    found = doctor_cache.get_doctors_many(specializations, limit, timeout=SYMPTOMS_DOCTORS_TIMEOUT)
+    return {specialization: format_doctors(doctors) for specialization, doctors in found.items()}
+
+def resolve_batch_doctors(specializations):
+    """Doctors per specialization for a batch; none on timeout or error"""
+    try:
+        return get_doctors_for_specializations(specializations)
+    except Exception as e:
+        print(f"Batch doctor lookup error: {e!r}")
+        return {}
+
+def explain_symptoms(symptoms):
+    """The LLM explanation for one symptom text (cached, within the time budget)"""
+    start = time.perf_counter()
+    stream, from_cache = start_symptoms_generation(symptoms)
+    return collect_symptoms_response(symptoms, stream, from_cache, start)
+
+def symptoms_batch_item(index, symptoms, triage=None, response=None):
+    """One entry of a batch response"""
+    if not symptoms:
+        return {"index": index, "error": "No symptoms provided"}
+    return {
+        "index": index,
+        "symptoms": symptoms,
+        **triage,
+        "response": response
+    }
+
+def run_symptoms_batch(texts):
+    """Yield the result for every item of a batch as soon as it is ready.
+
+    Explanations start first (identical texts share one). Meanwhile every
+    text is scored and the doctors for all distinct specializations are
+    fetched at once. Items without text come back first, the others in
+    completion order; each result carries its index in the request.
+    """
+    distinct = [text for text in dict.fromkeys(texts) if text]
+    explanations = {}
+    for text in distinct:
+        explanations[_batch_executor.submit(explain_symptoms, text)] = text
+    try:
+        rankings = dict(zip(distinct, specializations_for_batch(distinct)))
+        doctors = resolve_batch_doctors({specialization for ranked in rankings.values()
+                                         for specialization, _ in ranked})
+
+        indexes = {}
+        for index, text in enumerate(texts):
+            if text:
+                indexes.setdefault(text, []).append(index)
+            else:
+                yield symptoms_batch_item(index, text)
+
+        for future in as_completed(explanations):
+            text = explanations[future]
+            triage = symptoms_triage(rankings[text], doctors)
+            for index in indexes[text]:
+                yield symptoms_batch_item(index, text, triage, future.result())
+    finally:
+        # Client went away: drop the explanations that have not started yet
+        for future in explanations:
+            future.cancel()
+
+def wants_ndjson(data):
+    """Whether the client asked for batch results as NDJSON, one line per item"""
+    return bool(data.get("stream")) or request.accept_mimetypes.best == 'application/x-ndjson'
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """Count the request and time it until its body has been sent, so
+    streamed answers are measured in full"""
+    start = g.get('request_start')
+    if start is None:
+        return response
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    method = request.method
+    status = response.status_code
+    response.call_on_close(
+        lambda: metrics.observe_request(endpoint, method, status, time.perf_counter() - start))
+    return response
+
 @app.route('/')
 def index():
     """Serve the main HTML page"""
@@ -209,34 +949,26 @@ def upload_pdf():
             return jsonify({"error": "Only PDF files are allowed"}), 400
         
         try:
-            file_content = file.read()
-            if not file_content:
-                return jsonify({"error": "File is empty"}), 400
+            upload = spool_upload(file.stream)
+        except upload_spool.UploadTooLarge:
+            return too_large(None)
         except Exception as e:
             return jsonify({"error": f"Failed to read file: {str(e)}"}), 400
-        
-        try:
-            text = extract_text_from_pdf_bytes(file_content)
-        except Exception as e:
-            return jsonify({"error": f"Failed to process PDF: {str(e)}"}), 400
-        
-        if not text:
-            return jsonify({"error": "No text could be extracted from the PDF"}), 400
+        if not upload.size:
+            upload.remove()
+            return jsonify({"error": "File is empty"}), 400
         
         session_id = str(uuid.uuid4())
+        filename = secure_filename(file.filename)
         
-        session_data[session_id] = {
-            'text': text,
-            'filename': secure_filename(file.filename),
-            'timestamp': datetime.now()
-        }
+        try:
+            body, status_code = start_upload(session_id, filename, upload)
+        except UploadQueueFull:
+            response = jsonify({"error": "Too many reports are being processed. Please try again shortly."})
+            response.headers['Retry-After'] = str(UPLOAD_RETRY_AFTER_SECONDS)
+            return response, 429
         
-        return jsonify({
-            "message": "PDF uploaded and processed successfully",
-            "session_id": session_id,
-            "filename": secure_filename(file.filename),
-            "text_length": len(text)
-        })
+        return jsonify(body), status_code
     
     except Exception as e:
         return jsonify({"error": f"Upload failed: {str(e)}"}), 500
@@ -269,113 +1001,54 @@ def smart_query():
             })
         
         # Handle lab report questions if session exists
-        if session_id and session_id in session_data:
-            session_info = session_data[session_id]
-            session_info['timestamp'] = datetime.now()
-            
-            context = session_info['text']
-            full_prompt = f"""Here is a medical lab report:
-
-{context}
-
-User's question: {query}
-
-Please analyze this lab report and answer the user's question. Remember to:
-- Explain medical terms in simple language
-- Mention normal ranges when discussing lab values
-- Be reassuring and educational
-- Always recommend consulting with a healthcare provider
-- Never provide specific medical diagnoses or treatment recommendations"""
-            
-            try:
-                response = ""
-                for chunk in lab_agent.run(full_prompt, stream=True):
-                    response += chunk.content
-                
-                if not response.strip():
-                    response = "I apologize, but I couldn't generate a response. Please try rephrasing your question."
-            
-            except Exception as e:
-                print(f"Agent error: {e}")
-                response = "I'm sorry, but I encountered an error while processing your question. Please try again."
+        session_info = upload_jobs.wait(session_id) if session_id else None
+        if session_info:
+            not_ready = session_not_ready(session_info)
+            if not_ready:
+                payload, status_code = not_ready
+                return jsonify({**payload, "query_type": "lab_report"}), status_code
             
-            return jsonify({
-                "response": response,
+            agent, full_prompt = lab_request(session_id, session_info, query)
+            metadata = {
                 "query_type": "lab_report",
                 "filename": session_info['filename']
-            })
+            }
+            remember = remember_turn(session_id, query)
+            
+            if wants_stream(data):
+                return stream_agent(agent, full_prompt, metadata, LAB_MESSAGES, on_response=remember)
+            
+            response = run_agent(agent, full_prompt, LAB_MESSAGES, on_response=remember)
+            return jsonify({"response": response, **metadata})
         
         # Handle symptoms
         elif query_type == 'symptoms':
-            # Analyze symptoms to determine specialization
-            specialization = analyze_symptoms_for_specialization(query)
-            
-            # Get doctors for the specialization
-            recommended_doctors = get_doctors_by_specialization(specialization)
-            
-            # Prepare prompt for symptoms analysis
-            full_prompt = f"""User is experiencing these symptoms: {query}
-
-Please provide educational information about these symptoms. Remember to:
-- Explain what these symptoms might indicate in general terms
-- Mention possible common causes (without diagnosing)
-- Suggest when to seek immediate medical attention (red flags)
-- Provide general self-care tips where appropriate
-- Always emphasize that symptoms require professional medical evaluation
-- Never provide specific diagnoses or treatment recommendations
-- Be reassuring while being informative
-- Use bullet points and clear formatting for better readability
-- Include disclaimer about not replacing professional medical advice"""
-            
-            try:
-                response = ""
-                for chunk in symptoms_agent.run(full_prompt, stream=True):
-                    response += chunk.content
-                
-                if not response.strip():
-                    response = "I apologize, but I couldn't generate a response. Please try describing your symptoms differently."
+            metadata = {
+                "query_type": "symptoms",
+                "symptoms": query
+            }
             
-            except Exception as e:
-                print(f"Symptoms agent error: {e}")
-                response = "I'm sorry, but I encountered an error while analyzing your symptoms. Please try again."
+            if wants_stream(data):
+                return stream_symptoms_pipeline(query, metadata)
             
+            # Doctor lookup and LLM generation run concurrently
+            response, triage = run_symptoms_pipeline(query)
             return jsonify({
                 "response": response,
-                "query_type": "symptoms",
-                "symptoms": query,
-                "specialization": specialization,
-                "recommended_doctors": recommended_doctors[:1]  # Return top 3 doctors
+                **metadata,
+                **triage
             })
         
         # Handle general questions
         else:
-            full_prompt = f"""User's general medical question: {query}
-
-Please provide helpful, educational information about this health topic. Remember to:
-- Explain medical terms and concepts in simple language
-- Provide accurate, general health information
-- Be reassuring and educational
-- Always emphasize the importance of consulting healthcare professionals
-- Never provide specific diagnoses, prescriptions, or critical medical decisions
-- Stay within the bounds of general health education
-- Use bullet points and clear formatting for better readability"""
-            
-            try:
-                response = ""
-                for chunk in general_agent.run(full_prompt, stream=True):
-                    response += chunk.content
-                
-                if not response.strip():
-                    response = "I apologize, but I couldn't generate a response. Please try rephrasing your question."
+            full_prompt = build_general_prompt(query)
+            metadata = {"query_type": "general"}
             
-            except Exception as e:
-                print(f"General agent error: {e}")
-                response = "I'm sorry, but I encountered an error while processing your question. Please try again."
+            if wants_stream(data):
+                return stream_agent(choose_agent(general_agent, query), full_prompt, metadata, GENERAL_MESSAGES, ('general', query))
             
-            return jsonify({
-                "response": response,
-                "query_type": "general"
-            })
+            response = run_agent(choose_agent(general_agent, query), full_prompt, GENERAL_MESSAGES, ('general', query))
+            return jsonify({"response": response, **metadata})
     
     except Exception as e:
         return jsonify({"error": f"Failed to process question: {str(e)}"}), 500
@@ -400,42 +1073,24 @@ def ask_question():
         if not session_id:
             return jsonify({"error": "No session ID provided"}), 400
         
-        if session_id not in session_data:
+        session_info = upload_jobs.wait(session_id)
+        if session_info is None:
             return jsonify({"error": "Session not found or expired. Please upload your PDF again."}), 400
         
-        session_info = session_data[session_id]
-        session_info['timestamp'] = datetime.now()
-        
-        context = session_info['text']
-        full_prompt = f"""Here is a medical lab report:
-
-{context}
-
-User's question: {query}
-
-Please analyze this lab report and answer the user's question. Remember to:
-- Explain medical terms in simple language
-- Mention normal ranges when discussing lab values
-- Be reassuring and educational
-- Always recommend consulting with a healthcare provider
-- Never provide specific medical diagnoses or treatment recommendations"""
+        not_ready = session_not_ready(session_info)
+        if not_ready:
+            payload, status_code = not_ready
+            return jsonify(payload), status_code
         
-        try:
-            response = ""
-            for chunk in lab_agent.run(full_prompt, stream=True):
-                response += chunk.content
-            
-            if not response.strip():
-                response = "I apologize, but I couldn't generate a response. Please try rephrasing your question."
+        agent, full_prompt = lab_request(session_id, session_info, query)
+        metadata = {"filename": session_info['filename']}
+        remember = remember_turn(session_id, query)
         
-        except Exception as e:
-            print(f"Agent error: {e}")
-            response = "I'm sorry, but I encountered an error while processing your question. Please try again."
+        if wants_stream(data):
+            return stream_agent(agent, full_prompt, metadata, LAB_MESSAGES, on_response=remember)
         
-        return jsonify({
-            "response": response,
-            "filename": session_info['filename']
-        })
+        response = run_agent(agent, full_prompt, LAB_MESSAGES, on_response=remember)
+        return jsonify({"response": response, **metadata})
     
     except Exception as e:
         return jsonify({"error": f"Failed to process question: {str(e)}"}), 500
@@ -453,29 +1108,12 @@ def ask_general_question():
         if not query:
             return jsonify({"error": "No question provided"}), 400
         
-        full_prompt = f"""User's general medical question: {query}
-
-Please provide helpful, educational information about this health topic. Remember to:
-- Explain medical terms and concepts in simple language
-- Provide accurate, general health information
-- Be reassuring and educational
-- Always emphasize the importance of consulting healthcare professionals
-- Never provide specific diagnoses, prescriptions, or critical medical decisions
-- Stay within the bounds of general health education
-- Use bullet points and clear formatting for better readability"""
+        full_prompt = build_general_prompt(query)
         
-        try:
-            response = ""
-            for chunk in general_agent.run(full_prompt, stream=True):
-                response += chunk.content
-            
-            if not response.strip():
-                response = "I apologize, but I couldn't generate a response. Please try rephrasing your question."
-        
-        except Exception as e:
-            print(f"General agent error: {e}")
-            response = "I'm sorry, but I encountered an error while processing your question. Please try again."
+        if wants_stream(data):
+            return stream_agent(choose_agent(general_agent, query), full_prompt, {}, GENERAL_MESSAGES, ('general', query))
         
+        response = run_agent(choose_agent(general_agent, query), full_prompt, GENERAL_MESSAGES, ('general', query))
         return jsonify({
             "response": response
         })
@@ -496,62 +1134,109 @@ def analyze_symptoms():
         if not symptoms:
             return jsonify({"error": "No symptoms provided"}), 400
         
-        # Analyze symptoms to determine specialization
-        specialization = analyze_symptoms_for_specialization(symptoms)
-        
-        # Get doctors for the specialization
-        recommended_doctors = get_doctors_by_specialization(specialization)
-        
-        # Prepare prompt for symptoms analysis
-        full_prompt = f"""User is experiencing these symptoms: {symptoms}
-
-Please provide educational information about these symptoms. Remember to:
-- Explain what these symptoms might indicate in general terms
-- Mention possible common causes (without diagnosing)
-- Suggest when to seek immediate medical attention (red flags)
-- Provide general self-care tips where appropriate
-- Always emphasize that symptoms require professional medical evaluation
-- Never provide specific diagnoses or treatment recommendations
-- Be reassuring while being informative
-- Use bullet points and clear formatting for better readability
-- Include disclaimer about not replacing professional medical advice"""
-
-        try:
-            response = ""
-            for chunk in symptoms_agent.run(full_prompt, stream=True):
-                response += chunk.content
-            
-            if not response.strip():
-                response = "I apologize, but I couldn't generate a response. Please try describing your symptoms differently."
-        
-        except Exception as e:
-            print(f"Symptoms agent error: {e}")
-            response = "I'm sorry, but I encountered an error while analyzing your symptoms. Please try again."
+        if wants_stream(data):
+            return stream_symptoms_pipeline(symptoms, {"symptoms": symptoms})
         
+        # Doctor lookup and LLM generation run concurrently
+        response, triage = run_symptoms_pipeline(symptoms)
         return jsonify({
             "response": response,
             "symptoms": symptoms,
-            "specialization": specialization,
-            "recommended_doctors": recommended_doctors[:1]  # Return top 3 doctors
+            **triage
         })
     
     except Exception as e:
         return jsonify({"error": f"Failed to analyze symptoms: {str(e)}"}), 500
 
+@app.route('/symptoms/batch', methods=['POST'])
+def analyze_symptoms_batch():
+    """Triage several symptom descriptions at once.
+
+    Returns {"results": [...]} in request order, or with "stream": true one
+    NDJSON line per item as each one completes.
+    """
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({"error": "No JSON data provided"}), 400
+
+        texts, error = parse_symptoms_batch(data)
+        if error:
+            return jsonify({"error": error}), 400
+
+        if wants_ndjson(data):
+            lines = (json.dumps(item) + "\n" for item in run_symptoms_batch(texts))
+            return Response(lines, mimetype='application/x-ndjson', headers={
+                'Cache-Control': 'no-cache',
+                'X-Accel-Buffering': 'no'
+            })
+
+        results = sorted(run_symptoms_batch(texts), key=lambda item: item["index"])
+        return jsonify({"results": results})
+
+    except Exception as e:
+        return jsonify({"error": f"Failed to analyze symptoms: {str(e)}"}), 500
+
 @app.route('/session/<session_id>')
 def get_session_info(session_id):
     """Get session information"""
     cleanup_expired_sessions()
     
-    if session_id not in session_data:
+    session_info = session_store.get(session_id, touch=False)
+    if session_info is None:
         return jsonify({"error": "Session not found"}), 404
     
-    session_info = session_data[session_id]
-    return jsonify({
-        "filename": session_info['filename'],
-        "text_length": len(session_info['text']),
-        "upload_time": session_info['timestamp'].isoformat()
-    })
+    return jsonify(describe_session(session_info))
+
+@app.route('/session/<session_id>/values')
+def get_session_values(session_id):
+    """Look up parsed lab values (no LLM call); ?q=<test name>&flagged=true"""
+    session_info = upload_jobs.wait(session_id)
+    if session_info is None:
+        return jsonify({"error": "Session not found"}), 404
+    
+    not_ready = session_not_ready(session_info)
+    if not_ready:
+        payload, status_code = not_ready
+        return jsonify(payload), status_code
+    
+    flagged_only = request.args.get('flagged', '').lower() == 'true'
+    return jsonify(describe_values(session_info, request.args.get('q'), flagged_only))
+
+@app.route('/uploads/cache')
+def get_extraction_cache_stats():
+    """Get uploaded-PDF extraction cache counters"""
+    return jsonify(extraction_cache.cache_stats())
+
+@app.route('/metrics')
+def get_metrics():
+    """Request, stage and model timings in the Prometheus text format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/llm/gateway')
+def get_llm_gateway_stats():
+    """Get model gateway counters and circuit state"""
+    return jsonify(model_gateway.stats())
+
+@app.route('/llm/context_cache')
+def get_context_cache_stats():
+    """Get counters of report prefixes cached with the model"""
+    return jsonify(report_context_cache.stats() if report_context_cache else {"backend": "off"})
+
+@app.route('/search/cache')
+def get_search_cache_stats():
+    """Get web search routing and cache counters"""
+    return jsonify(search_tools.cache_stats())
+
+@app.route('/doctors/cache')
+def get_doctor_cache_stats():
+    """Get doctor directory cache counters"""
+    return jsonify(doctor_cache.cache_stats())
+
+@app.route('/responses/cache')
+def get_response_cache_stats():
+    """Get response cache counters"""
+    return jsonify(response_cache.cache_stats())
 
 
 # Error handlers
@@ -0,0 +1,714 @@
+"""ASGI serving mode for the chat server.
+
+Serves the same routes as the Flask app in app.py, reusing its prompts, query
+detection, session storage and agents, but on an event loop:
+
+    uvicorn asgi:app --host 0.0.0.0 --port 8000
+
+phi's Gemini model only has a blocking streaming API, so agent runs are moved
+to a dedicated pool of I/O threads (ASGI_AGENT_THREADS) and their chunks are
+handed back to the loop as they arrive. A slow generation then costs one idle
+thread instead of a whole request worker, and one process can keep hundreds of
+chats in flight. Doctor lookups await the shared DB loop directly and PDF
+extraction runs off the loop as well.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+from werkzeug.utils import secure_filename
+import app as core
+import doctor_cache
+import extraction_cache
+import metrics
+import response_cache
+import search_tools
+from upload_jobs import UploadQueueFull
+from upload_spool import UploadTooLarge
+
+ASGI_AGENT_THREADS = int(os.getenv("ASGI_AGENT_THREADS", "256"))
+
+_agent_executor = ThreadPoolExecutor(max_workers=ASGI_AGENT_THREADS, thread_name_prefix="agent")
+
+_DONE = object()
+
+
+def iterate_agent(agent, prompt):
+    """Start an agent generation and return an async iterator over its text.
+
+    The blocking phi generator starts running in the agent thread pool right
+    away. Closing the iterator (e.g. because the client disconnected) stops
+    the producer at the next chunk and closes the upstream generation.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    cancelled = threading.Event()
+
+    def put(item):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            # Event loop already closed; nobody is listening any more
+            pass
+
+    def produce():
+        upstream = None
+        try:
+            upstream = core.run_model(agent, prompt)
+            for chunk in upstream:
+                if cancelled.is_set():
+                    break
+                if chunk.content:
+                    put(chunk.content)
+        except Exception as e:
+            put(e)
+        finally:
+            if upstream is not None and hasattr(upstream, 'close'):
+                upstream.close()
+            put(_DONE)
+
+    async def consume():
+        try:
+            while True:
+                item = await queue.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            cancelled.set()
+
+    loop.run_in_executor(_agent_executor, produce)
+    return consume()
+
+
+async def cached_chunks(text):
+    yield text
+
+
+async def run_agent(agent, prompt, messages, cache_key=None, on_response=None):
+    """Async counterpart of app.run_agent(); on_response runs off the loop"""
+    label, empty_message, error_message = messages
+    if cache_key:
+        cached = response_cache.get(*cache_key)
+        if cached is not None:
+            if on_response:
+                await asyncio.to_thread(on_response, cached)
+            return cached
+
+    start = time.perf_counter()
+    try:
+        chunks = []
+        async for content in iterate_agent(agent, prompt):
+            chunks.append(content)
+        response = "".join(chunks)
+
+        if not response.strip():
+            return empty_message
+        if cache_key:
+            response_cache.put(*cache_key, response, time.perf_counter() - start)
+
+    except Exception as e:
+        print(f"{label} error: {e}")
+        return core.failure_message(e, error_message)
+
+    if on_response:
+        await asyncio.to_thread(on_response, response)
+    return response
+
+
+def stream_agent(agent, prompt, metadata, messages, cache_key=None, on_response=None):
+    """Async counterpart of app.stream_agent(); same SSE event sequence"""
+    label, empty_message, error_message = messages
+
+    async def generate():
+        yield core.sse_event('metadata', metadata)
+        cached = response_cache.get(*cache_key) if cache_key else None
+        if cached is not None:
+            yield core.sse_event('chunk', {"content": cached})
+            if on_response:
+                await asyncio.to_thread(on_response, cached)
+            yield core.sse_event('done', {})
+            return
+
+        pieces = []
+        start = time.perf_counter()
+        try:
+            async for content in iterate_agent(agent, prompt):
+                pieces.append(content)
+                yield core.sse_event('chunk', {"content": content})
+
+            if not pieces:
+                yield core.sse_event('chunk', {"content": empty_message})
+            else:
+                if cache_key:
+                    response_cache.put(*cache_key, "".join(pieces), time.perf_counter() - start)
+                if on_response:
+                    await asyncio.to_thread(on_response, "".join(pieces))
+        except Exception as e:
+            print(f"{label} error: {e}")
+            yield core.sse_event('error', {"error": core.failure_message(e, error_message)})
+        yield core.sse_event('done', {})
+
+    return StreamingResponse(generate(), media_type='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
+def wants_stream(request, data):
+    return bool(data.get("stream")) or 'text/event-stream' in request.headers.get('accept', '')
+
+
+def wants_ndjson(request, data):
+    return bool(data.get("stream")) or 'application/x-ndjson' in request.headers.get('accept', '')
+
+
+async def read_json(request):
+    try:
+        return await request.json()
+    except Exception:
+        return None
+
+
+async def get_doctors_for_specializations(specializations, limit=10):
+    """Async counterpart of app.get_doctors_for_specializations()"""
+    found = await doctor_cache.get_doctors_many_async(specializations, limit)
+    return {specialization: core.format_doctors(doctors) for specialization, doctors in found.items()}
+
+
+async def find_doctors_for_symptoms(symptoms):
+    """Async counterpart of app.find_doctors_for_symptoms()"""
+    ranked = core.analyze_symptoms_for_specialization(symptoms)
+    doctors = await get_doctors_for_specializations([specialization for specialization, _ in ranked]) if ranked else {}
+    return core.symptoms_triage(ranked, doctors)
+
+
+async def resolve_doctor_lookup(symptoms, lookup):
+    """Wait for the doctor stage; on timeout or error return no doctors"""
+    try:
+        return await asyncio.wait_for(lookup, core.SYMPTOMS_DOCTORS_TIMEOUT)
+    except asyncio.TimeoutError:
+        print("Doctor lookup timed out")
+    except Exception as e:
+        print(f"Doctor lookup error: {e}")
+    return core.symptoms_triage(core.analyze_symptoms_for_specialization(symptoms), {})
+
+
+async def collect(chunks):
+    return "".join([content async for content in chunks])
+
+
+def start_symptoms_pipeline(symptoms):
+    """Async counterpart of app.start_symptoms_pipeline()"""
+    chunks, from_cache = start_symptoms_generation(symptoms)
+    lookup = asyncio.ensure_future(find_doctors_for_symptoms(symptoms))
+    return chunks, lookup, from_cache
+
+
+def start_symptoms_generation(symptoms):
+    """Async counterpart of app.start_symptoms_generation()"""
+    cached = response_cache.get('symptoms', symptoms)
+    if cached is not None:
+        return cached_chunks(cached), True
+    return iterate_agent(core.choose_agent(core.symptoms_agent, symptoms), core.build_symptoms_prompt(symptoms)), False
+
+
+async def run_symptoms_pipeline(symptoms):
+    """Async counterpart of app.run_symptoms_pipeline()"""
+    start = time.perf_counter()
+    deadline = time.monotonic() + core.SYMPTOMS_GENERATION_TIMEOUT
+    chunks, lookup, from_cache = start_symptoms_pipeline(symptoms)
+    triage = await resolve_doctor_lookup(symptoms, lookup)
+    response = await collect_symptoms_response(symptoms, chunks, from_cache, start, deadline)
+    return response, triage
+
+
+async def collect_symptoms_response(symptoms, chunks, from_cache, start, deadline):
+    """Async counterpart of app.collect_symptoms_response()"""
+    label, empty_message, error_message = core.SYMPTOMS_MESSAGES
+    try:
+        response = await asyncio.wait_for(collect(chunks), max(0, deadline - time.monotonic()))
+        if not response.strip():
+            response = empty_message
+        elif not from_cache:
+            response_cache.put('symptoms', symptoms, response, time.perf_counter() - start)
+    except asyncio.TimeoutError:
+        print(f"{label} timed out")
+        response = core.SYMPTOMS_TIMEOUT_MESSAGE
+    except Exception as e:
+        print(f"{label} error: {e}")
+        response = core.failure_message(e, error_message)
+    finally:
+        await chunks.aclose()
+    return response
+
+
+def stream_symptoms_pipeline(symptoms, metadata):
+    """Async counterpart of app.stream_symptoms_pipeline()"""
+    label, empty_message, error_message = core.SYMPTOMS_MESSAGES
+    start = time.perf_counter()
+    deadline = time.monotonic() + core.SYMPTOMS_GENERATION_TIMEOUT
+    chunks, lookup, from_cache = start_symptoms_pipeline(symptoms)
+
+    async def generate():
+        pieces = []
+        try:
+            triage = await resolve_doctor_lookup(symptoms, lookup)
+            yield core.sse_event('metadata', {**metadata, **triage})
+
+            while True:
+                try:
+                    content = await asyncio.wait_for(chunks.__anext__(), max(0, deadline - time.monotonic()))
+                except StopAsyncIteration:
+                    break
+                pieces.append(content)
+                yield core.sse_event('chunk', {"content": content})
+
+            if not pieces:
+                yield core.sse_event('chunk', {"content": empty_message})
+            elif not from_cache:
+                response_cache.put('symptoms', symptoms, "".join(pieces), time.perf_counter() - start)
+        except asyncio.TimeoutError:
+            print(f"{label} timed out")
+            yield core.sse_event('error', {"error": core.SYMPTOMS_TIMEOUT_MESSAGE})
+        except Exception as e:
+            print(f"{label} error: {e}")
+            yield core.sse_event('error', {"error": core.failure_message(e, error_message)})
+        finally:
+            await chunks.aclose()
+        yield core.sse_event('done', {})
+
+    return StreamingResponse(generate(), media_type='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
+# Shared by all batches, like app._batch_executor
+_batch_slots = asyncio.Semaphore(core.SYMPTOMS_BATCH_CONCURRENCY)
+
+
+async def explain_symptoms(symptoms):
+    """Async counterpart of app.explain_symptoms(), bounded by _batch_slots"""
+    async with _batch_slots:
+        start = time.perf_counter()
+        deadline = time.monotonic() + core.SYMPTOMS_GENERATION_TIMEOUT
+        chunks, from_cache = start_symptoms_generation(symptoms)
+        return symptoms, await collect_symptoms_response(symptoms, chunks, from_cache, start, deadline)
+
+
+async def resolve_batch_doctors(specializations):
+    """Async counterpart of app.resolve_batch_doctors()"""
+    try:
+        return await asyncio.wait_for(get_doctors_for_specializations(specializations), core.SYMPTOMS_DOCTORS_TIMEOUT)
+    except Exception as e:
+        print(f"Batch doctor lookup error: {e!r}")
+        return {}
+
+
+async def run_symptoms_batch(texts):
+    """Async counterpart of app.run_symptoms_batch()"""
+    distinct = [text for text in dict.fromkeys(texts) if text]
+    tasks = [asyncio.ensure_future(explain_symptoms(text)) for text in distinct]
+    try:
+        rankings = dict(zip(distinct, core.specializations_for_batch(distinct)))
+        doctors = await resolve_batch_doctors({specialization for ranked in rankings.values()
+                                               for specialization, _ in ranked})
+
+        indexes = {}
+        for index, text in enumerate(texts):
+            if text:
+                indexes.setdefault(text, []).append(index)
+            else:
+                yield core.symptoms_batch_item(index, text)
+
+        for next_done in asyncio.as_completed(tasks):
+            text, response = await next_done
+            triage = core.symptoms_triage(rankings[text], doctors)
+            for index in indexes[text]:
+                yield core.symptoms_batch_item(index, text, triage, response)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def upload_pdf(request: Request):
+    """Handle PDF upload"""
+    try:
+        core.cleanup_expired_sessions()
+
+        content_length = int(request.headers.get('content-length') or 0)
+        if content_length > core.app.config['MAX_CONTENT_LENGTH']:
+            return JSONResponse({"error": "File too large. Maximum size is 16MB."}, status_code=413)
+
+        form = await request.form()
+        file = form.get('pdf')
+        if file is None or not hasattr(file, 'filename'):
+            return JSONResponse({"error": "No file provided"}, status_code=400)
+
+        if file.filename == '':
+            return JSONResponse({"error": "No file selected"}, status_code=400)
+
+        if not core.allowed_file(file.filename):
+            return JSONResponse({"error": "Only PDF files are allowed"}, status_code=400)
+
+        # Copying and hashing the file happen off the event loop
+        try:
+            upload = await asyncio.to_thread(core.spool_upload, file.file)
+        except UploadTooLarge:
+            return JSONResponse({"error": "File too large. Maximum size is 16MB."}, status_code=413)
+        except Exception as e:
+            return JSONResponse({"error": f"Failed to read file: {str(e)}"}, status_code=400)
+        if not upload.size:
+            upload.remove()
+            return JSONResponse({"error": "File is empty"}, status_code=400)
+
+        session_id = str(uuid.uuid4())
+        filename = secure_filename(file.filename)
+
+        # Writing the session may go over the network (Redis backend)
+        try:
+            body, status_code = await asyncio.to_thread(core.start_upload, session_id, filename, upload)
+        except UploadQueueFull:
+            return JSONResponse({"error": "Too many reports are being processed. Please try again shortly."},
+                                status_code=429,
+                                headers={"Retry-After": str(core.UPLOAD_RETRY_AFTER_SECONDS)})
+
+        return JSONResponse(body, status_code=status_code)
+
+    except Exception as e:
+        return JSONResponse({"error": f"Upload failed: {str(e)}"}, status_code=500)
+
+
+async def smart_query(request: Request):
+    """Handle smart query that determines the type automatically"""
+    try:
+        core.cleanup_expired_sessions()
+
+        data = await read_json(request)
+        if not data:
+            return JSONResponse({"error": "No JSON data provided"}, status_code=400)
+
+        query = data.get("query", "").strip()
+        session_id = data.get("session_id", "").strip()
+
+        if not query:
+            return JSONResponse({"error": "No question provided"}, status_code=400)
+
+        query_type = core.detect_query_type(query)
+
+        if query_type == 'upload_request':
+            return JSONResponse({
+                "response": "To upload a lab report, please use the upload button above or drag and drop a PDF file. I'll be able to analyze your lab results once you upload the file.",
+                "query_type": "upload_request",
+                "action_needed": "upload_file"
+            })
+
+        session_info = await core.upload_jobs.wait_async(session_id) if session_id else None
+        if session_info:
+            not_ready = core.session_not_ready(session_info)
+            if not_ready:
+                payload, status_code = not_ready
+                return JSONResponse({**payload, "query_type": "lab_report"}, status_code=status_code)
+
+            agent, full_prompt = core.lab_request(session_id, session_info, query)
+            messages = core.LAB_MESSAGES
+            cache_key = None
+            on_response = core.remember_turn(session_id, query)
+            metadata = {
+                "query_type": "lab_report",
+                "filename": session_info['filename']
+            }
+
+        elif query_type == 'symptoms':
+            metadata = {
+                "query_type": "symptoms",
+                "symptoms": query
+            }
+
+            if wants_stream(request, data):
+                return stream_symptoms_pipeline(query, metadata)
+
+            response, triage = await run_symptoms_pipeline(query)
+            return JSONResponse({
+                "response": response,
+                **metadata,
+                **triage
+            })
+
+        else:
+            agent = core.choose_agent(core.general_agent, query)
+            messages = core.GENERAL_MESSAGES
+            cache_key = ('general', query)
+            on_response = None
+            full_prompt = core.build_general_prompt(query)
+            metadata = {"query_type": "general"}
+
+        if wants_stream(request, data):
+            return stream_agent(agent, full_prompt, metadata, messages, cache_key, on_response)
+
+        response = await run_agent(agent, full_prompt, messages, cache_key, on_response)
+        return JSONResponse({"response": response, **metadata})
+
+    except Exception as e:
+        return JSONResponse({"error": f"Failed to process question: {str(e)}"}, status_code=500)
+
+
+async def ask_question(request: Request):
+    """Handle question about uploaded report"""
+    try:
+        core.cleanup_expired_sessions()
+
+        data = await read_json(request)
+        if not data:
+            return JSONResponse({"error": "No JSON data provided"}, status_code=400)
+
+        query = data.get("query", "").strip()
+        session_id = data.get("session_id", "").strip()
+
+        if not query:
+            return JSONResponse({"error": "No question provided"}, status_code=400)
+
+        if not session_id:
+            return JSONResponse({"error": "No session ID provided"}, status_code=400)
+
+        session_info = await core.upload_jobs.wait_async(session_id)
+        if session_info is None:
+            return JSONResponse({"error": "Session not found or expired. Please upload your PDF again."}, status_code=400)
+
+        not_ready = core.session_not_ready(session_info)
+        if not_ready:
+            payload, status_code = not_ready
+            return JSONResponse(payload, status_code=status_code)
+
+        agent, full_prompt = core.lab_request(session_id, session_info, query)
+        metadata = {"filename": session_info['filename']}
+        remember = core.remember_turn(session_id, query)
+
+        if wants_stream(request, data):
+            return stream_agent(agent, full_prompt, metadata, core.LAB_MESSAGES, on_response=remember)
+
+        response = await run_agent(agent, full_prompt, core.LAB_MESSAGES, on_response=remember)
+        return JSONResponse({"response": response, **metadata})
+
+    except Exception as e:
+        return JSONResponse({"error": f"Failed to process question: {str(e)}"}, status_code=500)
+
+
+async def ask_general_question(request: Request):
+    """Handle general medical questions"""
+    try:
+        data = await read_json(request)
+        if not data:
+            return JSONResponse({"error": "No JSON data provided"}, status_code=400)
+
+        query = data.get("query", "").strip()
+
+        if not query:
+            return JSONResponse({"error": "No question provided"}, status_code=400)
+
+        full_prompt = core.build_general_prompt(query)
+
+        if wants_stream(request, data):
+            return stream_agent(core.choose_agent(core.general_agent, query), full_prompt, {}, core.GENERAL_MESSAGES, ('general', query))
+
+        response = await run_agent(core.choose_agent(core.general_agent, query), full_prompt, core.GENERAL_MESSAGES, ('general', query))
+        return JSONResponse({"response": response})
+
+    except Exception as e:
+        return JSONResponse({"error": f"Failed to process question: {str(e)}"}, status_code=500)
+
+
+async def analyze_symptoms(request: Request):
+    """Handle symptoms analysis and doctor recommendations"""
+    try:
+        data = await read_json(request)
+        if not data:
+            return JSONResponse({"error": "No JSON data provided"}, status_code=400)
+
+        symptoms = data.get("symptoms", "").strip()
+
+        if not symptoms:
+            return JSONResponse({"error": "No symptoms provided"}, status_code=400)
+
+        if wants_stream(request, data):
+            return stream_symptoms_pipeline(symptoms, {"symptoms": symptoms})
+
+        response, triage = await run_symptoms_pipeline(symptoms)
+        return JSONResponse({
+            "response": response,
+            "symptoms": symptoms,
+            **triage
+        })
+
+    except Exception as e:
+        return JSONResponse({"error": f"Failed to analyze symptoms: {str(e)}"}, status_code=500)
+
+
+async def analyze_symptoms_batch(request: Request):
+    """Triage several symptom descriptions at once (see app.analyze_symptoms_batch)"""
+    try:
+        data = await read_json(request)
+        if not data:
+            return JSONResponse({"error": "No JSON data provided"}, status_code=400)
+
+        texts, error = core.parse_symptoms_batch(data)
+        if error:
+            return JSONResponse({"error": error}, status_code=400)
+
+        if wants_ndjson(request, data):
+            async def lines():
+                async for item in run_symptoms_batch(texts):
+                    yield json.dumps(item) + "\n"
+
+            return StreamingResponse(lines(), media_type='application/x-ndjson', headers={
+                'Cache-Control': 'no-cache',
+                'X-Accel-Buffering': 'no'
+            })
+
+        results = [item async for item in run_symptoms_batch(texts)]
+        return JSONResponse({"results": sorted(results, key=lambda item: item["index"])})
+
+    except Exception as e:
+        return JSONResponse({"error": f"Failed to analyze symptoms: {str(e)}"}, status_code=500)
+
+
+async def get_session_info(request: Request):
+    """Get session information"""
+    core.cleanup_expired_sessions()
+
+    session_id = request.path_params['session_id']
+    session_info = await asyncio.to_thread(core.session_store.get, session_id, False)
+    if session_info is None:
+        return JSONResponse({"error": "Session not found"}, status_code=404)
+
+    return JSONResponse(core.describe_session(session_info))
+
+
+async def get_session_values(request: Request):
+    """Look up parsed lab values (no LLM call); ?q=<test name>&flagged=true"""
+    session_id = request.path_params['session_id']
+    session_info = await core.upload_jobs.wait_async(session_id)
+    if session_info is None:
+        return JSONResponse({"error": "Session not found"}, status_code=404)
+
+    not_ready = core.session_not_ready(session_info)
+    if not_ready:
+        payload, status_code = not_ready
+        return JSONResponse(payload, status_code=status_code)
+
+    flagged_only = request.query_params.get('flagged', '').lower() == 'true'
+    return JSONResponse(core.describe_values(session_info, request.query_params.get('q'), flagged_only))
+
+
+async def get_doctor_cache_stats(request: Request):
+    """Get doctor directory cache counters"""
+    return JSONResponse(doctor_cache.cache_stats())
+
+
+async def get_extraction_cache_stats(request: Request):
+    """Get uploaded-PDF extraction cache counters"""
+    return JSONResponse(extraction_cache.cache_stats())
+
+
+async def get_llm_gateway_stats(request: Request):
+    """Get model gateway counters and circuit state"""
+    return JSONResponse(core.model_gateway.stats())
+
+
+async def get_context_cache_stats(request: Request):
+    """Get counters of report prefixes cached with the model"""
+    cache = core.report_context_cache
+    return JSONResponse(cache.stats() if cache else {"backend": "off"})
+
+
+async def get_search_cache_stats(request: Request):
+    """Get web search routing and cache counters"""
+    return JSONResponse(search_tools.cache_stats())
+
+
+async def get_response_cache_stats(request: Request):
+    """Get response cache counters"""
+    return JSONResponse(response_cache.cache_stats())
+
+
+async def get_metrics(request: Request):
+    """Request, stage and model timings in the Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type='text/plain; version=0.0.4')
+
+
+class MetricsMiddleware:
+    """Counts requests per route and times them until the last body chunk
+    has been sent, so streamed answers are measured in full"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched endpoint in the (shared) scope
+            endpoint = ROUTE_PATHS.get(scope.get("endpoint"), "unmatched")
+            metrics.observe_request(endpoint, scope["method"], status, time.perf_counter() - start)
+
+
+async def not_found(request, exc):
+    return JSONResponse({"error": "Endpoint not found"}, status_code=404)
+
+
+async def internal_error(request, exc):
+    return JSONResponse({"error": "Internal server error"}, status_code=500)
+
+
+app = Starlette(
+    routes=[
+        Route('/upload', upload_pdf, methods=['POST']),
+        Route('/smart_query', smart_query, methods=['POST']),
+        Route('/ask', ask_question, methods=['POST']),
+        Route('/ask_general', ask_general_question, methods=['POST']),
+        Route('/symptoms', analyze_symptoms, methods=['POST']),
+        Route('/symptoms/batch', analyze_symptoms_batch, methods=['POST']),
+        Route('/session/{session_id}', get_session_info),
+        Route('/session/{session_id}/values', get_session_values),
+        Route('/doctors/cache', get_doctor_cache_stats),
+        Route('/responses/cache', get_response_cache_stats),
+        Route('/uploads/cache', get_extraction_cache_stats),
+        Route('/llm/gateway', get_llm_gateway_stats),
+        Route('/llm/context_cache', get_context_cache_stats),
+        Route('/search/cache', get_search_cache_stats),
+        Route('/metrics', get_metrics),
+    ],
+    middleware=[
+        Middleware(MetricsMiddleware),
+        Middleware(CORSMiddleware, allow_origins=['http://localhost:3000'], allow_methods=['*'], allow_headers=['*'])
+    ],
+    exception_handlers={404: not_found, 500: internal_error},
+)
+
+# Route templates (e.g. /session/{session_id}) by endpoint, for metric labels
+ROUTE_PATHS = {route.endpoint: route.path for route in app.routes}
@@ -0,0 +1,161 @@
+"""Process memory and answer isolation over many model requests.
+
+Sends --requests general questions through app.run_model, the way the
+routes do, from --threads threads at once. The real phi Agent and Gemini
+model classes are used; only the Gemini client is a stand-in that echoes
+the request's number back in a few streamed chunks. Two modes, each in a
+fresh interpreter:
+
+  per-run   LazyAgent as deployed: a new Agent for every run around one
+            shared client
+  shared    one Agent for every run (what LazyAgent used to forward to)
+
+RSS is sampled (after a gc) every --every requests. An answer that holds
+another request's number, or no number, counts as leaked. Fails (exit 1)
+when the per-run mode grows by more than --max-growth-mb after warm-up,
+or leaks an answer.
+
+Usage (from server/python-server):
+    python -m benchmarks.bench_agent_soak [--requests 10000] [--threads 8]
+"""
+import argparse
+import gc
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Measure the agents, not the gateway's rate limit; phi reports every run
+# to its API unless told not to
+os.environ.setdefault("LLM_RATE_PER_SECOND", "0")
+os.environ.setdefault("PHI_TELEMETRY", "false")
+
+from benchmarks.bench_upload_memory import memory_mb
+
+# Lab-prompt sized padding, so whatever is kept per request shows in RSS
+PADDING = " ".join(["Hemoglobin 13.2 g/dL (12.0-15.5), LDL cholesterol 128 mg/dL (<100)."] * 30)
+MARKER = re.compile(r"request-(\d+)")
+WARMUP = 200
+
+
+def fake_client(chunks=4):
+    """A google.generativeai GenerativeModel (phi checks the type) whose
+    generate_content streams a short answer naming the request found in the
+    last user turn"""
+    import google.generativeai as genai
+    from google.generativeai import protos
+
+    def response(text):
+        content = protos.Content(role="model", parts=[protos.Part(text=text)])
+        return type("FakeResponse", (), {"candidates": [type("Candidate", (), {"content": content})],
+                                         "usage_metadata": None})
+
+    def generate_content(contents, stream=False):
+        user_text = "".join(part.text for part in contents[-1]["parts"])
+        number = MARKER.findall(user_text)[-1]
+        return (response(f"Answer to request-{number}, part {i}. ") for i in range(chunks))
+
+    client = genai.GenerativeModel(model_name="gemini-1.5-flash")
+    client.generate_content = generate_content
+    return client
+
+
+class SharedAgent:
+    """One phi Agent answering every request"""
+
+    def __init__(self, lazy_agent, client):
+        self.agent = lazy_agent._build(client=client, **lazy_agent._options)
+
+    def run(self, prompt, stream=True):
+        return self.agent.run(prompt, stream=stream)
+
+
+def run_one(mode, requests, threads, every):
+    """Child process: soak one mode and print its samples as JSON"""
+    import app
+    from lazy_agent import LazyAgent
+
+    client = fake_client()
+    LazyAgent._build_client = staticmethod(lambda **options: client)
+    agent = app.general_agent if mode == "per-run" else SharedAgent(app.general_agent, client)
+    leaks = []
+    errors = []
+
+    def ask(number):
+        prompt = app.build_general_prompt(f"Question request-{number}: what do these results mean? {PADDING}")
+        try:
+            answer = "".join(chunk.content for chunk in app.run_model(agent, prompt) if chunk.content)
+        except Exception as e:
+            errors.append(repr(e))
+            return
+        if set(MARKER.findall(answer)) != {str(number)}:
+            leaks.append(number)
+
+    samples = []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(ask, range(WARMUP)))
+        for done in range(0, requests, every):
+            gc.collect()
+            samples.append((done, round(memory_mb(os.getpid(), "VmRSS"), 1)))
+            list(executor.map(ask, range(WARMUP + done, WARMUP + min(done + every, requests))))
+    gc.collect()
+    samples.append((requests, round(memory_mb(os.getpid(), "VmRSS"), 1)))
+
+    kept_runs = len(agent.agent.memory.runs) if mode == "shared" else 0
+    print(json.dumps({
+        "samples": samples,
+        "leaks": len(leaks),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "kept_runs": kept_runs,
+        "ms_per_request": (time.perf_counter() - start) * 1000 / (requests + WARMUP),
+    }))
+
+
+def measure(mode, args):
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_agent_soak", "--run", mode, "--requests", str(args.requests),
+         "--threads", str(args.threads), "--every", str(args.every)],
+        capture_output=True, text=True, check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=10000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--every", type=int, default=1000, help="requests between RSS samples")
+    parser.add_argument("--max-growth-mb", type=float, default=10.0)
+    parser.add_argument("--run", choices=("per-run", "shared"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_one(args.run, args.requests, args.threads, args.every)
+        return
+
+    results = {mode: measure(mode, args) for mode in ("per-run", "shared")}
+    print(f"{args.requests} requests from {args.threads} threads, RSS in MB after each {args.every}")
+    print(f"{'requests':>8} {'per-run':>8} {'shared':>8}")
+    for (done, per_run), (_, shared) in zip(results["per-run"]["samples"], results["shared"]["samples"]):
+        print(f"{done:>8} {per_run:>8} {shared:>8}")
+    for mode, result in results.items():
+        growth = result["samples"][-1][1] - result["samples"][0][1]
+        print(f"{mode:>8}: +{growth:.1f} MB, {result['leaks']} leaked answers, {result['errors']} errors, "
+              f"{result['kept_runs']} runs kept, {result['ms_per_request']:.2f} ms/request")
+        if result["first_error"]:
+            print(f"          first error: {result['first_error']}")
+
+    per_run = results["per-run"]
+    growth = per_run["samples"][-1][1] - per_run["samples"][0][1]
+    if growth > args.max_growth_mb or per_run["leaks"] or per_run["errors"]:
+        print(f"FAIL: per-run agents grew by {growth:.1f} MB (limit {args.max_growth_mb}) "
+              f"or leaked/failed answers")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Prompt tokens and latency per follow-up with the report cached with the model.
+
+Uploads one large generated lab report and asks --turns questions about
+it through /ask, twice:
+
+  inline   CONTEXT_CACHE_BACKEND=off: every prompt carries the report
+           chunks relevant to the question (REPORT_CONTEXT_TOKENS)
+  cached   the whole report is registered once as the session's prefix
+           (FakeContextBackend standing in for Gemini's cached content);
+           later prompts only carry the conversation and the question
+
+The FakeAgent's time to first token grows with the tokens it is sent
+(--prefill-ms-per-1k), the way Gemini's does; cached tokens are not
+re-processed. The first cached turn is answered inline while the prefix
+is registered.
+
+Usage (from server/python-server):
+    python -m benchmarks.bench_context_cache [--pages 100] [--turns 8]
+"""
+import argparse
+import time
+import uuid
+
+import app
+import context_cache
+import report_index
+from benchmarks.bench_conversation import QUESTIONS, RecordingAgent
+from benchmarks.bench_pdf_extract import make_lab_pdf
+from benchmarks.fakes import FakeAgent, FakeContextBackend
+
+
+def run(fields, turns, cache, lab_agent):
+    """Ask `turns` questions on a new session -> [(tokens sent, ms)]"""
+    app.report_context_cache = cache
+    app.lab_agent = lab_agent
+    client = app.app.test_client()
+    session_id = str(uuid.uuid4())
+    app.session_store.put(session_id, {'filename': "report.pdf", **fields})
+
+    rows = []
+    for turn in range(turns):
+        start = time.perf_counter()
+        response = client.post('/ask', json={'session_id': session_id, 'query': QUESTIONS[turn % len(QUESTIONS)]})
+        assert response.status_code == 200, response.json
+        rows.append((lab_agent.prompt_tokens[-1], (time.perf_counter() - start) * 1000))
+        # Registration and summaries finish between questions, as they would while the user reads
+        time.sleep(0.3)
+    app.session_store.delete(session_id)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--turns", type=int, default=8)
+    parser.add_argument("--prefill-ms-per-1k", type=float, default=20.0)
+    args = parser.parse_args()
+
+    fields = app.process_uploaded_pdf(make_lab_pdf(args.pages))
+    prefix_tokens = report_index.estimate_tokens(app.build_lab_prefix(fields['text']))
+    app.summary_agent = FakeAgent(latency=0.01, chunks=1, text="The user asked about their lab results.")
+    prefill = args.prefill_ms_per_1k / 1000
+
+    backend = FakeContextBackend()
+    cache = context_cache.ContextCache(app.session_store, backend, app.SESSION_TIMEOUT_MINUTES * 60)
+    inline = run(fields, args.turns, None, RecordingAgent(latency=0.1, chunks=5, prefill_seconds_per_1k_tokens=prefill))
+    cached = run(fields, args.turns, cache, RecordingAgent(latency=0.1, chunks=5, prefill_seconds_per_1k_tokens=prefill))
+
+    print(f"{args.pages}-page report, prefix {prefix_tokens} tokens "
+          f"(cached when >= {cache.min_tokens}), prefill {args.prefill_ms_per_1k:.0f} ms/1k tokens")
+    print(f"{'turn':>4} {'inline tokens':>13} {'cached tokens':>13} {'inline ms':>9} {'cached ms':>9}")
+    for turn, ((inline_tokens, inline_ms), (cached_tokens, cached_ms)) in enumerate(zip(inline, cached), start=1):
+        print(f"{turn:>4} {inline_tokens:>13} {cached_tokens:>13} {inline_ms:>9.0f} {cached_ms:>9.0f}")
+    print(f"\ntotal tokens sent: inline {sum(t for t, _ in inline)}, cached {sum(t for t, _ in cached)} "
+          f"(+ {prefix_tokens} registered once, {backend.uses} answers on the cached prefix)")
+    print(f"context cache: {cache.stats()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Prompt size per turn of a long conversation about one report.
+
+Asks --turns questions in a row on the same session through /ask, with
+FakeAgents for the lab answers and the summaries, and compares the prompt
+sent to the model on each turn for:
+
+  single-shot   no history at all (the old behaviour; follow-ups lose context)
+  pasted back   every earlier question and answer repeated in the prompt
+                (what users did by hand)
+  memory        the session's conversation memory: recent turns plus a
+                rolling summary, within CONVERSATION_HISTORY_TOKENS
+
+Fails when the memory prompt keeps growing with the number of turns.
+
+Usage (from server/python-server):
+    python -m benchmarks.bench_conversation [--turns 30] [--pages 10]
+"""
+import argparse
+import sys
+import time
+import uuid
+
+import app
+import conversation
+import report_index
+from benchmarks.bench_pdf_extract import make_lab_pdf
+from benchmarks.fakes import FakeAgent
+
+QUESTIONS = [
+    "What is my hemoglobin?",
+    "Is that low for a woman?",
+    "What could cause it?",
+    "Is my vitamin D low?",
+    "Should I take supplements for that?",
+    "Explain my LDL cholesterol result",
+    "And my HDL?",
+    "What does my TSH mean for my thyroid?",
+    "Is that related to feeling tired?",
+    "Can you summarize my report?",
+]
+
+ANSWER = " ".join(["Your result is slightly outside the usual reference range, which is common and "
+                   "often not a concern on its own; please discuss it with your healthcare provider."] * 8)
+SUMMARY = ("The user asked about hemoglobin, vitamin D, cholesterol and thyroid results; "
+           "values were mildly outside reference ranges and a doctor visit was recommended.")
+
+
+class RecordingAgent(FakeAgent):
+    """FakeAgent that remembers the size of every prompt it is given"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prompt_tokens = []
+
+    def run(self, prompt, stream=True):
+        self.prompt_tokens.append(report_index.estimate_tokens(prompt))
+        return super().run(prompt, stream)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--think-ms", type=float, default=50, help="pause between questions")
+    args = parser.parse_args()
+
+    app.lab_agent = RecordingAgent(latency=0.01, chunks=5, text=ANSWER)
+    app.summary_agent = RecordingAgent(latency=0.01, chunks=2, text=SUMMARY)
+    client = app.app.test_client()
+
+    session_id = str(uuid.uuid4())
+    app.session_store.put(session_id, {'filename': "report.pdf", **app.process_uploaded_pdf(make_lab_pdf(args.pages))})
+
+    pasted = []
+    rows = []
+    for turn in range(args.turns):
+        question = QUESTIONS[turn % len(QUESTIONS)]
+        session_info = app.session_store.get(session_id)
+        context = report_index.select_context(session_info['report_index'], question)
+        single = report_index.estimate_tokens(app.build_lab_prompt(context, question))
+        pasted_history = "\n\n".join(conversation.turn_text(q, a) for q, a in pasted)
+        pasted_tokens = report_index.estimate_tokens(app.build_lab_prompt(context, question, pasted_history))
+
+        response = client.post('/ask', json={'session_id': session_id, 'query': question})
+        assert response.status_code == 200, response.json
+        pasted.append((question, response.json['response']))
+        rows.append((turn + 1, single, pasted_tokens, app.lab_agent.prompt_tokens[-1]))
+        time.sleep(args.think_ms / 1000)
+
+    print(f"history budget={conversation.CONVERSATION_HISTORY_TOKENS} tokens, "
+          f"report budget={report_index.REPORT_CONTEXT_TOKENS} tokens")
+    print(f"{'turn':>4} {'single-shot':>11} {'pasted back':>11} {'memory':>8}")
+    for turn, single, pasted_tokens, memory in rows:
+        if turn <= 5 or turn % 5 == 0:
+            print(f"{turn:>4} {single:>11} {pasted_tokens:>11} {memory:>8}")
+
+    stats = app.conversation_memory.stats(app.session_store.get(session_id))
+    print(f"\nstored: {stats['turns']} turns, summary={'yes' if stats['summarized'] else 'no'}, "
+          f"{stats['history_tokens']} history tokens")
+    print(f"summary calls: {len(app.summary_agent.prompt_tokens)} for {args.turns} turns")
+
+    # The report context varies with the question; the history part must not grow
+    limit = max(single for _, single, _, _ in rows) + conversation.CONVERSATION_HISTORY_TOKENS + 100
+    worst = max(memory for _, _, _, memory in rows)
+    if worst > limit:
+        print(f"FAIL: a memory prompt had {worst} tokens, more than {limit}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""Benchmark the doctor-by-specialization lookup against a scratch schema.
+
+Seeds a throwaway "bench_doctors" schema with synthetic doctors and compares:
+  legacy     - LIMIT 10 arbitrary rows + Python-side filtering (old app.py path)
+  sql        - fetch_doctors_by_specializations query without the GIN index
+  sql_gin    - same query after creating the migration's GIN index
+
+Usage (from server/python-server):
+    BENCH_DATABASE_URL=postgresql://... python -m benchmarks.bench_doctor_query
+"""
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+
+import asyncpg
+
+from connection import doctors_by_specializations_query
+from data import SYMPTOM_SPECIALIZATION_MAP
+
+SCHEMA = "bench_doctors"
+SIZES = [int(n) for n in os.getenv("BENCH_SIZES", "10000,100000").split(",")]
+ITERATIONS = int(os.getenv("BENCH_ITERATIONS", "200"))
+LIMIT = 10
+
+SPECIALIZATIONS = sorted(set(SYMPTOM_SPECIALIZATION_MAP.values()))
+
+LEGACY_QUERY = """
+SELECT u.name AS doctor_name, d.id as id, d.ratings AS rating, d.specialization
+FROM "Doctor" d
+JOIN "User" u ON d."userId" = u.id
+LIMIT 10;
+"""
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+async def setup_schema(conn, size):
+    await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    await conn.execute(f"CREATE SCHEMA {SCHEMA}")
+    await conn.execute("""
+        CREATE FUNCTION lower_text_array(text[]) RETURNS text[]
+            LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE
+            AS $$ SELECT array_agg(lower(s)) FROM unnest($1) AS s $$;
+        CREATE TABLE "User" (id text PRIMARY KEY, name text NOT NULL);
+        CREATE TABLE "Doctor" (
+            id text PRIMARY KEY,
+            "userId" text NOT NULL UNIQUE REFERENCES "User"(id),
+            specialization text[] NOT NULL,
+            ratings double precision,
+            "noOfPatients" integer NOT NULL DEFAULT 0
+        );
+    """)
+
+    rng = random.Random(42)
+    users = []
+    doctors = []
+    for i in range(size):
+        user_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        specs = rng.sample(SPECIALIZATIONS, rng.randint(1, 3))
+        # Mixed casing, as entered through the doctor profile form
+        specs = [s if rng.random() < 0.5 else s.lower() for s in specs]
+        users.append((user_id, f"Doctor {i}"))
+        doctors.append((
+            str(uuid.UUID(int=rng.getrandbits(128))),
+            user_id,
+            specs,
+            round(rng.uniform(1, 5), 1) if rng.random() < 0.9 else None,
+            rng.randint(0, 5000),
+        ))
+
+    await conn.copy_records_to_table("User", records=users, schema_name=SCHEMA)
+    await conn.copy_records_to_table(
+        "Doctor", records=doctors, schema_name=SCHEMA,
+        columns=["id", "userId", "specialization", "ratings", "noOfPatients"],
+    )
+    await conn.execute('ANALYZE "User"; ANALYZE "Doctor";')
+
+
+async def create_indexes(conn):
+    await conn.execute("""
+        CREATE INDEX ON "Doctor" USING GIN (lower_text_array(specialization));
+        CREATE INDEX ON "Doctor" (ratings DESC NULLS LAST, "noOfPatients" DESC);
+        ANALYZE "Doctor";
+    """)
+
+
+async def run_legacy(conn, spec):
+    rows = await conn.fetch(LEGACY_QUERY)
+    return [row for row in rows if spec.lower() in [s.lower() for s in row['specialization']]]
+
+
+async def run_sql(conn, spec):
+    return await conn.fetch(doctors_by_specializations_query("rating"), [spec], LIMIT)
+
+
+async def measure(conn, runner, specs):
+    timings = []
+    matches = 0
+    for spec in specs:
+        start = time.perf_counter()
+        rows = await runner(conn, spec)
+        timings.append((time.perf_counter() - start) * 1000)
+        matches += len(rows)
+    return {
+        "p50_ms": statistics.median(timings),
+        "p95_ms": percentile(timings, 95),
+        "p99_ms": percentile(timings, 99),
+        "avg_matches": matches / len(specs),
+    }
+
+
+def report(size, mode, stats):
+    print(f"{size:>8} {mode:<8} p50={stats['p50_ms']:7.2f}ms p95={stats['p95_ms']:7.2f}ms "
+          f"p99={stats['p99_ms']:7.2f}ms matches/query={stats['avg_matches']:.1f}")
+
+
+async def main():
+    url = os.getenv("BENCH_DATABASE_URL") or os.getenv("DATABASE_URL")
+    if not url:
+        print("Set BENCH_DATABASE_URL to a scratch Postgres database")
+        sys.exit(1)
+
+    conn = await asyncpg.connect(url, server_settings={"search_path": SCHEMA})
+    rng = random.Random(7)
+    specs = [rng.choice(SPECIALIZATIONS) for _ in range(ITERATIONS)]
+
+    try:
+        for size in SIZES:
+            await setup_schema(conn, size)
+            # Warm up the statement cache and buffers
+            await measure(conn, run_sql, specs[:10])
+
+            report(size, "legacy", await measure(conn, run_legacy, specs))
+            report(size, "sql", await measure(conn, run_sql, specs))
+            await create_indexes(conn)
+            report(size, "sql_gin", await measure(conn, run_sql, specs))
+    finally:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await conn.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,80 @@
+"""Prompt size and /ask latency with and without report retrieval.
+
+Uploads generated multi-page lab reports, then asks the same questions
+with the whole report inlined (REPORT_CONTEXT_TOKENS=0, the old
+behaviour) and with BM25-selected chunks. Generation uses a FakeAgent
+whose time to first token grows with the prompt (--prefill-ms-per-1k),
+so the latency column shows the effect of prompt size, not Gemini's.
+"hit" is whether the context still contains the test the question asks
+about.
+
+Usage (from server/python-server):
+    python -m benchmarks.bench_lab_context [--pages 2 10 50]
+"""
+import argparse
+import time
+import uuid
+
+import app
+import report_index
+from benchmarks.bench_pdf_extract import make_lab_pdf
+from benchmarks.fakes import FakeAgent
+
+QUESTIONS = [
+    ("What is my hemoglobin?", "Hemoglobin"),
+    ("Is my vitamin D low?", "Vitamin D"),
+    ("Explain my LDL cholesterol result", "LDL Cholesterol"),
+    ("What does my TSH mean for my thyroid?", "TSH"),
+    ("Can you summarize my report?", None),
+]
+
+
+def upload(pages):
+    fields = app.process_uploaded_pdf(make_lab_pdf(pages))
+    session_id = str(uuid.uuid4())
+    app.session_store.put(session_id, {'filename': f"report-{pages}.pdf", **fields})
+    return session_id
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, nargs="+", default=[2, 10, 50])
+    parser.add_argument("--prefill-ms-per-1k", type=float, default=50.0)
+    parser.add_argument("--latency", type=float, default=0.2, help="generation time after the first token")
+    args = parser.parse_args()
+
+    app.lab_agent = FakeAgent(latency=args.latency, chunks=5,
+                              prefill_seconds_per_1k_tokens=args.prefill_ms_per_1k / 1000)
+    client = app.app.test_client()
+    budget = report_index.REPORT_CONTEXT_TOKENS
+
+    print(f"budget={budget} tokens, top_k={report_index.REPORT_TOP_K}, "
+          f"prefill={args.prefill_ms_per_1k:.0f}ms/1k tokens")
+    print(f"{'pages':>5} {'question':<40} {'tokens before':>13} {'tokens after':>12} "
+          f"{'ms before':>9} {'ms after':>8} {'select ms':>9} {'hit':>4}")
+    for pages in args.pages:
+        session_id = upload(pages)
+        session_info = app.session_store.get(session_id)
+        for question, test_name in QUESTIONS:
+            results = {}
+            for label, context_tokens in (("before", 0), ("after", budget)):
+                report_index.REPORT_CONTEXT_TOKENS = context_tokens
+                start = time.perf_counter()
+                context = app.lab_context(session_info, question)
+                select_ms = (time.perf_counter() - start) * 1000
+                prompt_tokens = report_index.estimate_tokens(app.build_lab_prompt(context, question))
+
+                start = time.perf_counter()
+                response = client.post('/ask', json={'session_id': session_id, 'query': question})
+                assert response.status_code == 200, response.json
+                results[label] = (prompt_tokens, (time.perf_counter() - start) * 1000, select_ms, context)
+            report_index.REPORT_CONTEXT_TOKENS = budget
+
+            hit = "-" if test_name is None else "yes" if test_name in results["after"][3] else "NO"
+            print(f"{pages:>5} {question:<40} {results['before'][0]:>13} {results['after'][0]:>12} "
+                  f"{results['before'][1]:>9.0f} {results['after'][1]:>8.0f} "
+                  f"{results['after'][2]:>9.2f} {hit:>4}")
+
+
+if __name__ == '__main__':
+    main()
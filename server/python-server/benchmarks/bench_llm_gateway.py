@@ -0,0 +1,96 @@
+"""Burst and outage behaviour of the LLM gateway against a rate-limited fake model.
+
+The fake model (RateLimitedFakeAgent) answers at most --model-concurrency
+generations at once and fails anything beyond that with a 429, like Gemini's
+per-project quota. Scenarios:
+  burst   - --requests callers at once, --distinct different prompts, sent
+            directly (the old behaviour) and through the gateway with and
+            without coalescing; reports answers vs errors, upstream calls,
+            429s and latency percentiles
+  outage  - the model rejects everything; shows the circuit breaker cutting
+            off upstream calls and failing fast
+
+Usage (from server/python-server):
+    python -m benchmarks.bench_llm_gateway [--requests 40] [--distinct 10]
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fakes import RateLimitedFakeAgent
+from llm_gateway import LLMGateway
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def ask(agent, gateway, prompt):
+    """One caller: (answered, seconds)"""
+    start = time.perf_counter()
+    try:
+        if gateway is None:
+            chunks = list(agent.run(prompt, stream=True))
+        else:
+            chunks = list(gateway.stream(lambda: agent.run(prompt, stream=True), key=prompt))
+        answered = bool(chunks)
+    except Exception:
+        answered = False
+    return answered, time.perf_counter() - start
+
+
+def burst(args, mode):
+    agent = RateLimitedFakeAgent(max_concurrency=args.model_concurrency, latency=args.latency, chunks=5)
+    gateway = None
+    if mode != "direct":
+        gateway = LLMGateway(max_concurrency=args.model_concurrency, rate_per_second=0,
+                             acquire_timeout=60, retry_base_seconds=0.05, coalesce=(mode == "gateway"))
+    prompts = [f"question {i % args.distinct}" for i in range(args.requests)]
+    with ThreadPoolExecutor(max_workers=args.requests) as pool:
+        results = list(pool.map(lambda prompt: ask(agent, gateway, prompt), prompts))
+
+    latencies = [seconds for _, seconds in results]
+    answered = sum(1 for ok, _ in results if ok)
+    stats = gateway.stats() if gateway else {}
+    print(f"{mode:<20} {answered:>8} {args.requests - answered:>6} {agent.calls:>10} {agent.rejected:>5} "
+          f"{stats.get('coalesced', 0):>9} {stats.get('retries', 0):>7} "
+          f"{statistics.median(latencies):>7.2f} {percentile(latencies, 95):>7.2f}")
+
+
+def outage(args):
+    agent = RateLimitedFakeAgent(max_concurrency=0, latency=args.latency)
+    gateway = LLMGateway(rate_per_second=0, max_retries=2, retry_base_seconds=0.05,
+                         breaker_failures=5, breaker_reset_seconds=60)
+    latencies = []
+    for i in range(args.outage_requests):
+        latencies.append(ask(agent, gateway, f"question {i}")[1])
+    stats = gateway.stats()
+    print(f"outage: {args.outage_requests} requests, {agent.calls} upstream calls, "
+          f"{stats['rejected_open']} rejected by the open circuit (state: {stats['circuit']})")
+    print(f"        first request {latencies[0] * 1000:.0f} ms, "
+          f"median after opening {statistics.median(latencies[5:]) * 1000:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--distinct", type=int, default=10)
+    parser.add_argument("--model-concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--outage-requests", type=int, default=30)
+    args = parser.parse_args()
+
+    print(f"{args.requests} concurrent requests, {args.distinct} distinct prompts, "
+          f"model allows {args.model_concurrency} at once, {args.latency}s per answer")
+    print(f"{'mode':<20} {'answered':>8} {'errors':>6} {'model calls':>10} {'429s':>5} "
+          f"{'coalesced':>9} {'retries':>7} {'p50 s':>7} {'p95 s':>7}")
+    for mode in ("direct", "gateway_no_coalesce", "gateway"):
+        burst(args, mode)
+    print()
+    outage(args)
+
+
+if __name__ == '__main__':
+    main()
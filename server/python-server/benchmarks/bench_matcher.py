@@ -0,0 +1,57 @@
+"""Compare the shared phrase matcher with the old per-keyword substring loops
+of query type detection (specializations are ranked by specialization_scorer,
+see bench_specialization).
+
+Usage (from server/python-server):
+    python -m benchmarks.bench_matcher
+"""
+import random
+import timeit
+
+from data import SYMPTOM_KEYWORDS, UPLOAD_KEYWORDS
+from matcher import scan_text
+
+SHORT_QUERIES = [
+    "I have a headache and fever since yesterday",
+    "what is a normal blood sugar level?",
+    "my back hurts and I feel dizziness when standing up",
+    "chest pain and shortness of breath after climbing stairs",
+    "is it safe to take ibuprofen with coffee",
+]
+
+LAB_LINES = [
+    "Hemoglobin 13.5 g/dL 13.0 - 17.0",
+    "Total Leucocyte Count 7800 /cumm 4000 - 10000",
+    "Fasting Blood Sugar 112 mg/dL 70 - 100 H",
+    "Serum Creatinine 0.9 mg/dL 0.7 - 1.3",
+    "TSH 3.2 uIU/mL 0.4 - 4.0",
+    "Patient reports mild headache and nausea, no chest pain.",
+    "Clinical notes: dry skin, joint pain in the mornings.",
+]
+
+
+def make_lab_report(lines, seed=1):
+    rng = random.Random(seed)
+    return "\n".join(rng.choice(LAB_LINES) for _ in range(lines))
+
+
+def legacy_detect(query):
+    query_lower = query.lower()
+    if any(keyword in query_lower for keyword in UPLOAD_KEYWORDS):
+        return 'upload_request'
+    symptom_count = sum(1 for keyword in SYMPTOM_KEYWORDS if keyword in query_lower)
+    return symptom_count
+
+
+def bench(name, texts, number):
+    for label, fn in (("legacy loops", legacy_detect), ("phrase matcher", scan_text)):
+        seconds = timeit.timeit(lambda: [fn(t) for t in texts], number=number)
+        per_call_us = seconds / (number * len(texts)) * 1e6
+        print(f"{name:<22} {label:<15} {per_call_us:10.1f} us/text")
+
+
+if __name__ == '__main__':
+    bench("short queries", SHORT_QUERIES, 2000)
+    for lines in (200, 2000):
+        report = make_lab_report(lines)
+        bench(f"lab report {len(report) // 1024}KB", [report], 50)
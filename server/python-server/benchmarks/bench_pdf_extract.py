@@ -0,0 +1,197 @@
+"""Measure PDF extraction throughput (pages/sec) and peak RSS.
+
+Generates multi-page lab reports (table pages with ruling lines plus
+text-only notes pages), then times the original sequential pdfplumber loop
+against pdf_extract with each engine and worker count. Every configuration
+runs in a fresh interpreter so peak RSS is not polluted by earlier runs.
+
+Usage (from server/python-server):
+    python -m benchmarks.bench_pdf_extract [--pages 20 100]
+"""
+import argparse
+import io
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+
+LAB_TESTS = [
+    ("Hemoglobin", "g/dL", 13.0, 17.0),
+    ("Total Leucocyte Count", "/cumm", 4000, 10000),
+    ("Platelet Count", "lakh/cumm", 1.5, 4.1),
+    ("Fasting Blood Sugar", "mg/dL", 70, 100),
+    ("HbA1c", "%", 4.0, 5.6),
+    ("Serum Creatinine", "mg/dL", 0.7, 1.3),
+    ("Blood Urea", "mg/dL", 15, 40),
+    ("Total Cholesterol", "mg/dL", 0, 200),
+    ("HDL Cholesterol", "mg/dL", 40, 60),
+    ("LDL Cholesterol", "mg/dL", 0, 100),
+    ("Triglycerides", "mg/dL", 0, 150),
+    ("TSH", "uIU/mL", 0.4, 4.0),
+    ("SGPT (ALT)", "U/L", 7, 56),
+    ("SGOT (AST)", "U/L", 5, 40),
+    ("Vitamin D", "ng/mL", 30, 100),
+    ("Vitamin B12", "pg/mL", 200, 900),
+]
+
+NOTES = (
+    "Interpretation: values outside the reference range are flagged. Results "
+    "should be correlated clinically. Fasting samples were collected after ten "
+    "hours. Repeat testing is advised for borderline values."
+)
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _table_page(rng, page_number):
+    ops = ["BT /F1 14 Tf 50 800 Td (City Diagnostics - Laboratory Report) Tj ET",
+           f"BT /F1 9 Tf 50 784 Td (Patient: Test Patient   Page {page_number}) Tj ET"]
+    columns = (52, 250, 330, 420, 530)
+    for x, heading in zip(columns, ("Test", "Result", "Unit", "Reference Range", "Flag")):
+        ops.append(f"BT /F1 9 Tf {x} 764 Td ({heading}) Tj ET")
+    ops.append("50 760 m 560 760 l S")
+    y = 745
+    for _ in range(3):
+        for name, unit, low, high in LAB_TESTS:
+            value = round(rng.uniform(low * 0.7, high * 1.3), 1)
+            flag = "H" if value > high else "L" if value < low else ""
+            for x, cell in zip(columns, (name, str(value), unit, f"{low} - {high}", flag)):
+                ops.append(f"BT /F1 9 Tf {x} {y} Td ({_escape(cell)}) Tj ET")
+            ops.append(f"50 {y - 4} m 560 {y - 4} l S")
+            y -= 15
+    for x in (245, 325, 415, 525):
+        ops.append(f"{x} {y + 11} m {x} 775 l S")
+    ops.append(f"50 {y + 11} 510 {775 - y - 11} re S")
+    return "\n".join(ops)
+
+
+def _notes_page(page_number):
+    ops = [f"BT /F1 12 Tf 50 800 Td (Clinical notes - page {page_number}) Tj ET"]
+    y = 780
+    for i in range(40):
+        ops.append(f"BT /F1 10 Tf 50 {y} Td ({_escape(NOTES[:90])} {i}) Tj ET")
+        y -= 18
+    return "\n".join(ops)
+
+
+def make_lab_pdf(pages, seed=1, image_kb=0):
+    """Build a PDF where every third page is text-only and the rest are tables.
+
+    With image_kb, every page also carries a scanned-looking grayscale image
+    of about that size (random pixels, so it does not compress), the way
+    scanned reports make PDFs large.
+    """
+    rng = random.Random(seed)
+    streams = [_notes_page(n) if n % 3 == 0 else _table_page(rng, n) for n in range(1, pages + 1)]
+
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    side = int((image_kb * 1024) ** 0.5)
+    for stream in streams:
+        resources = "/Font << /F1 3 0 R >>"
+        if side:
+            pixels = rng.randbytes(side * side)
+            objects.append((f"<< /Type /XObject /Subtype /Image /Width {side} /Height {side} "
+                            f"/ColorSpace /DeviceGray /BitsPerComponent 8 /Length {len(pixels)} >>\nstream\n")
+                           .encode("latin-1") + pixels + b"\nendstream")
+            resources += f" /XObject << /Im1 {len(objects)} 0 R >>"
+            stream = f"q 120 0 0 120 440 20 cm /Im1 Do Q\n{stream}"
+        data = stream.encode("latin-1")
+        objects.append(f"<< /Length {len(data)} >>\nstream\n{stream}\nendstream")
+        content_id = len(objects)
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       f"/Resources << {resources} >> /Contents {content_id} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        if isinstance(body, str):
+            body = body.encode("latin-1")
+        out.write(f"{number} 0 obj\n".encode() + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    for offset in offsets:
+        out.write(f"{offset:010d} 00000 n \n".encode())
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return out.getvalue()
+
+
+def legacy_extract(pdf_bytes):
+    import pdfplumber
+    text = ""
+    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        for page in pdf.pages:
+            page_text = page.extract_text()
+            if page_text:
+                text += page_text + "\n"
+    return text.strip()
+
+
+def run_one(mode, workers, pages):
+    """Child process: extract once (after a warm-up for the pool) and report"""
+    os.environ["PDF_EXTRACT_WORKERS"] = str(workers)
+    import pdf_extract
+
+    pdf_bytes = make_lab_pdf(pages)
+    if mode == "legacy":
+        extract = legacy_extract
+    else:
+        def extract(data):
+            return pdf_extract.extract_text(data, engine=mode)
+        # Start the pool's worker processes outside the timed run
+        extract(make_lab_pdf(pdf_extract.PDF_PARALLEL_MIN_PAGES))
+
+    start = time.perf_counter()
+    text = extract(pdf_bytes)
+    elapsed = time.perf_counter() - start
+
+    # Reap the workers so RUSAGE_CHILDREN includes them
+    pdf_extract.shutdown(wait=True)
+    print(json.dumps({
+        "elapsed": elapsed,
+        "chars": len(text),
+        "parent_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "worker_rss_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, nargs="+", default=[20, 100])
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, min(4, os.cpu_count() or 1)}))
+    parser.add_argument("--run", nargs=3, metavar=("MODE", "WORKERS", "PAGES"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_one(args.run[0], int(args.run[1]), int(args.run[2]))
+        return
+
+    configs = [("legacy", 1)] + [(engine, workers) for engine in ("pdfplumber", "auto", "pdfium")
+                                 for workers in args.workers]
+    print(f"cpus={os.cpu_count()}")
+    print(f"{'pages':>5} {'mode':<10} {'workers':>7} {'seconds':>8} {'pages/s':>8} "
+          f"{'chars':>8} {'parent MB':>9} {'worker MB':>9}")
+    for pages in args.pages:
+        for mode, workers in configs:
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_pdf_extract", "--run", mode, str(workers), str(pages)],
+                capture_output=True, text=True, check=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{pages:>5} {mode:<10} {workers:>7} {result['elapsed']:>8.2f} "
+                  f"{pages / result['elapsed']:>8.1f} {result['chars']:>8} "
+                  f"{result['parent_rss_mb']:>9.1f} {result['worker_rss_mb']:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
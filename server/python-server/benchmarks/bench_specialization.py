@@ -0,0 +1,92 @@
+"""Accuracy and throughput of the specialization scorer.
+
+Accuracy is measured on the labeled corpus in benchmarks/symptom_corpus.py,
+against the old scorer (raw substring counts, single max) for reference.
+Throughput is measured per text and for whole batches through rank_many().
+
+Exits non-zero when top-1 accuracy drops below --min-accuracy, so it can
+double as a check after editing the phrase tables in data.py.
+
+Usage (from server/python-server):
+    python -m benchmarks.bench_specialization [--batch 1000] [--min-accuracy 0.9]
+"""
+import argparse
+import sys
+import time
+
+from benchmarks.symptom_corpus import LABELED_SYMPTOMS
+from data import SYMPTOM_SPECIALIZATION_MAP
+from specialization_scorer import SpecializationScorer, phrase_weights
+
+
+def legacy_specialization(text):
+    """The scorer before weights and negation: substring counts, one winner"""
+    text_lower = text.lower()
+    scores = {}
+    for symptom, specialization in SYMPTOM_SPECIALIZATION_MAP.items():
+        if symptom in text_lower:
+            scores[specialization] = scores.get(specialization, 0) + 1
+    return [max(scores, key=scores.get)] if scores else []
+
+
+def accuracy(rank):
+    """(top-1 accuracy, top-k recall, misses) of rank(text) -> [specialization, ...]"""
+    top1 = topk = 0
+    misses = []
+    for text, expected in LABELED_SYMPTOMS:
+        ranked = rank(text)
+        got = ranked[0] if ranked else None
+        if got == expected:
+            top1 += 1
+        else:
+            misses.append((text, expected, ranked))
+        if got == expected or expected in ranked:
+            topk += 1
+    return top1 / len(LABELED_SYMPTOMS), topk / len(LABELED_SYMPTOMS), misses
+
+
+def per_second(fn, texts, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(texts)
+    return len(texts) * repeat / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-accuracy", type=float, default=0.9)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    scorer = SpecializationScorer(phrase_weights())
+    build_ms = (time.perf_counter() - start) * 1000
+    print(f"scorer: {len(scorer.phrases)} phrases x {len(scorer.specializations)} specializations, "
+          f"built in {build_ms:.1f} ms (including the NumPy import)")
+
+    def ranked_names(text):
+        return [specialization for specialization, _ in scorer.rank(text)]
+
+    legacy_top1, legacy_topk, _ = accuracy(legacy_specialization)
+    top1, topk, misses = accuracy(ranked_names)
+    print(f"\n{len(LABELED_SYMPTOMS)} labeled texts   top-1    top-k")
+    print(f"{'old scorer':<20} {legacy_top1:>7.0%} {legacy_topk:>8.0%}")
+    print(f"{'weighted scorer':<20} {top1:>7.0%} {topk:>8.0%}")
+    for text, expected, ranked in misses:
+        print(f"  miss: {text!r}: expected {expected}, got {ranked}")
+
+    texts = [text for text, _ in LABELED_SYMPTOMS]
+    batch = (texts * (args.batch // len(texts) + 1))[:args.batch]
+    print(f"\nthroughput, texts/s ({args.batch} texts)")
+    print(f"{'old scorer':<28} {per_second(lambda b: [legacy_specialization(t) for t in b], batch, args.repeat):>10,.0f}")
+    print(f"{'rank() one text at a time':<28} {per_second(lambda b: [scorer.rank(t) for t in b], batch, args.repeat):>10,.0f}")
+    print(f"{'rank_many() whole batch':<28} {per_second(scorer.rank_many, batch, args.repeat):>10,.0f}")
+
+    if top1 < args.min_accuracy:
+        print(f"\nFAIL: top-1 accuracy {top1:.0%} is below {args.min_accuracy:.0%}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
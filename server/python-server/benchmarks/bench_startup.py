@@ -0,0 +1,118 @@
+"""Measure cold-start time of the Flask app.
+
+Every run is a fresh interpreter started with `python -X importtime`:
+  lazy   - `import app` as deployed (agents and PDF libraries load on demand)
+  eager  - `import app`, then build all three agents and import pdf_extract,
+           which is what every cold start used to pay
+For each mode it reports the median import time, the time to answer a first
+request that does not need the model (GET /session/<id>), and the slowest
+imports. Pass --max-ms to fail (exit 1) when the lazy import gets slower
+than a budget, e.g. in CI.
+
+Usage (from server/python-server):
+    python -m benchmarks.bench_startup [--runs 5] [--max-ms 600]
+"""
+import argparse
+import json
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+# "import time: self [us] | cumulative | imported package" lines
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+HEAVY_MODULES = ("phi", "google.generativeai", "pdfplumber", "pypdfium2")
+
+
+def run_one(mode):
+    """Child process: import the app, answer one request and report"""
+    start = time.perf_counter()
+    import app
+    if mode == "eager":
+        for agent in (app.lab_agent, app.general_agent, app.symptoms_agent):
+            agent.get()
+        import pdf_extract  # noqa: F401
+    imported = time.perf_counter()
+
+    response = app.app.test_client().get('/session/does-not-exist')
+    response.close()
+    first_request = time.perf_counter()
+
+    print(json.dumps({
+        "import_ms": (imported - start) * 1000,
+        "first_request_ms": (first_request - start) * 1000,
+        "status": response.status_code,
+        "heavy_loaded": [name for name in HEAVY_MODULES if name in sys.modules],
+    }))
+
+
+def parse_importtime(stderr):
+    """Cumulative ms of each module imported by app, plus the top-level
+    imports made after it (the agents and pdf_extract in eager mode)"""
+    modules = {}
+    children = []
+    after_app = False
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        depth, name, ms = len(match.group(3)), match.group(4), int(match.group(2)) / 1000
+        if depth == 3:
+            children.append((name, ms))
+        elif depth == 1:
+            if name == "app":
+                modules.update(children)
+                after_app = True
+            elif after_app:
+                modules[name] = ms
+            children = []
+    return modules
+
+
+def measure(mode):
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "benchmarks.bench_startup", "--run", mode],
+        capture_output=True, text=True, check=True)
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["modules"] = parse_importtime(completed.stderr)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument("--max-ms", type=float, help="fail if the lazy median import exceeds this")
+    parser.add_argument("--run", choices=("lazy", "eager"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_one(args.run)
+        return
+
+    medians = {}
+    print(f"{'mode':<6} {'import ms':>10} {'first req ms':>13}  heavy modules loaded")
+    for mode in ("lazy", "eager"):
+        results = [measure(mode) for _ in range(args.runs)]
+        medians[mode] = statistics.median(result["import_ms"] for result in results)
+        first_request = statistics.median(result["first_request_ms"] for result in results)
+        heavy = ", ".join(results[-1]["heavy_loaded"]) or "-"
+        print(f"{mode:<6} {medians[mode]:>10.1f} {first_request:>13.1f}  {heavy}")
+
+        modules = {}
+        for result in results:
+            for name, ms in result["modules"].items():
+                modules.setdefault(name, []).append(ms)
+        slowest = sorted(modules.items(), key=lambda item: -statistics.median(item[1]))[:args.top]
+        for name, times in slowest:
+            print(f"       {statistics.median(times):>8.1f} ms  {name}")
+
+    if args.max_ms is not None and medians["lazy"] > args.max_ms:
+        print(f"lazy import took {medians['lazy']:.1f} ms, over the {args.max_ms:.0f} ms budget")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
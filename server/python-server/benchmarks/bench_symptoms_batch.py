@@ -0,0 +1,92 @@
+"""Compare triaging N complaints one /symptoms request at a time with one
+/symptoms/batch request.
+
+The doctor directory is a cold cache in front of a fake database that
+charges --db-latency per query, and the model is a FakeAgent taking
+--latency per answer, so the table shows both the round-trips saved and the
+effect of generating with bounded parallelism.
+
+Usage (from server/python-server):
+    python -m benchmarks.bench_symptoms_batch [--items 24] [--latency 1.0]
+"""
+import argparse
+import os
+import time
+
+# Measure batching, not the caches or the gateway limits
+os.environ.setdefault("RESPONSE_CACHE_ENABLED", "false")
+os.environ.setdefault("LLM_RATE_PER_SECOND", "0")
+
+import app
+import doctor_cache
+from benchmarks.fakes import FAKE_DOCTORS, FakeAgent
+
+COMPLAINTS = [
+    "chest pain and palpitations", "skin rash and itching", "headache and dizziness",
+    "stomach pain and acidity", "joint pain and back pain", "cough and breathlessness",
+    "irregular periods", "child has fever and cough",
+]
+
+
+def install(args):
+    """Fake model and a fake database behind a cold doctor cache; returns the query log"""
+    queries = []
+
+    def doctors_for(specialization):
+        return [doc for doc in FAKE_DOCTORS if specialization in doc["Specialization"]]
+
+    def fake_run_sync(coro, timeout=None):
+        coro.close()
+        time.sleep(args.db_latency)
+        queries.append(1)
+        return fake_run_sync.result
+
+    def get_doctors_many(specializations, limit=10, timeout=None):
+        fake_run_sync.result = {spec: doctors_for(spec)[:limit] for spec in specializations}
+        return fake_run_sync(doctor_cache.fetch_doctors_by_specializations(list(specializations), limit))
+
+    doctor_cache.get_doctors_many = get_doctors_many
+    app.symptoms_agent = FakeAgent(latency=args.latency, chunks=5)
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=24)
+    parser.add_argument("--latency", type=float, default=1.0, help="fake model answer time")
+    parser.add_argument("--db-latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    queries = install(args)
+    client = app.app.test_client()
+    texts = [f"{COMPLAINTS[i % len(COMPLAINTS)]} (patient {i})" for i in range(args.items)]
+
+    print(f"{args.items} complaints, model {args.latency}s per answer, DB {args.db_latency * 1000:.0f} ms "
+          f"per query, batch concurrency {app.SYMPTOMS_BATCH_CONCURRENCY}")
+    print(f"{'mode':<22} {'seconds':>8} {'DB queries':>10} {'items':>6}")
+
+    start = time.perf_counter()
+    for text in texts:
+        response = client.post('/symptoms', json={"symptoms": text})
+        assert response.status_code == 200
+    print(f"{'one by one':<22} {time.perf_counter() - start:>8.2f} {len(queries):>10} {args.items:>6}")
+
+    del queries[:]
+    start = time.perf_counter()
+    response = client.post('/symptoms/batch', json={"symptoms": texts})
+    results = response.get_json()["results"]
+    print(f"{'/symptoms/batch':<22} {time.perf_counter() - start:>8.2f} {len(queries):>10} {len(results):>6}")
+
+    del queries[:]
+    start = time.perf_counter()
+    response = client.post('/symptoms/batch', json={"symptoms": texts, "stream": True}, buffered=False)
+    lines = iter(response.response)
+    next(lines)
+    first = time.perf_counter() - start
+    count = 1 + sum(1 for _ in lines)
+    print(f"{'/symptoms/batch NDJSON':<22} {time.perf_counter() - start:>8.2f} {len(queries):>10} {count:>6}"
+          f"  (first item after {first:.2f}s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Check that the symptoms pipeline costs max(stages), not sum(stages).
+
+Injects delays into the doctor stage and the (fake) LLM stage and runs the
+Flask and ASGI pipelines, including the cases where one stage times out and
+the other's result must still come back.
+
+Usage (from server/python-server):
+    python -m benchmarks.bench_symptoms_pipeline
+"""
+import asyncio
+import time
+
+import app
+import asgi
+import doctor_cache
+import response_cache
+from benchmarks.fakes import FAKE_DOCTORS, FakeAgent
+
+SYMPTOMS = "I have chest pain and shortness of breath since yesterday"
+
+
+def install_delays(generation_delay, doctors_delay):
+    app.symptoms_agent = FakeAgent(latency=generation_delay)
+
+    def doctors_for(specializations, limit):
+        return {spec: [doc for doc in FAKE_DOCTORS if spec in doc["Specialization"]][:limit]
+                for spec in specializations}
+
+    def slow_get_doctors_many(specializations, limit=10, timeout=None):
+        time.sleep(doctors_delay)
+        return doctors_for(specializations, limit)
+
+    async def slow_get_doctors_many_async(specializations, limit=10):
+        await asyncio.sleep(doctors_delay)
+        return doctors_for(specializations, limit)
+
+    doctor_cache.get_doctors_many = slow_get_doctors_many
+    doctor_cache.get_doctors_many_async = slow_get_doctors_many_async
+
+
+def run_case(name, generation_delay, doctors_delay, doctors_timeout, generation_timeout,
+             expect_doctors, expect_timeout_message):
+    install_delays(generation_delay, doctors_delay)
+    app.SYMPTOMS_DOCTORS_TIMEOUT = doctors_timeout
+    app.SYMPTOMS_GENERATION_TIMEOUT = generation_timeout
+    expected = min(max(generation_delay, doctors_delay),
+                   max(min(generation_delay, generation_timeout), min(doctors_delay, doctors_timeout)))
+
+    for mode, runner in (("flask", app.run_symptoms_pipeline),
+                         ("asgi", lambda s: asyncio.run(asgi.run_symptoms_pipeline(s)))):
+        response_cache.clear()
+        start = time.perf_counter()
+        response, triage = runner(SYMPTOMS)
+        doctors = triage["recommended_doctors"]
+        elapsed = time.perf_counter() - start
+
+        assert bool(doctors) == expect_doctors, (name, mode, doctors)
+        assert (response == app.SYMPTOMS_TIMEOUT_MESSAGE) == expect_timeout_message, (name, mode, response)
+        assert elapsed < expected + 0.25, (name, mode, elapsed, expected)
+        print(f"{name:<28} {mode:<6} elapsed={elapsed:5.2f}s expected~{expected:4.2f}s "
+              f"sequential={generation_delay + doctors_delay:4.2f}s doctors={len(doctors)} "
+              f"specialization={triage['specialization']}")
+
+
+if __name__ == '__main__':
+    run_case("both stages succeed", 1.0, 0.6, 3.0, 60.0, True, False)
+    run_case("doctor lookup times out", 1.0, 2.0, 0.3, 60.0, False, False)
+    run_case("generation times out", 2.0, 0.3, 3.0, 0.5, True, True)
+    print("OK")
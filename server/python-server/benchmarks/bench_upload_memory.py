@@ -0,0 +1,150 @@
+"""Peak server memory while many large PDFs are uploaded at once.
+
+Starts the server (WSGI and/or ASGI, as in load_test) in a subprocess,
+uploads --uploads different scanned-looking PDFs of about --mb MB each, all
+at the same time, and waits until every one has been extracted. The
+server's peak RSS (VmHWM) above its warmed-up RSS is the number that
+matters; the run fails when it goes over --max-mb.
+
+Peak RSS includes pages of memory-mapped PDFs, which the kernel can drop
+at any time, so the peak of anonymous memory (RssAnon, sampled every
+50 ms) is reported next to it.
+
+Linux only (reads /proc).
+
+Usage (from server/python-server):
+    python -m benchmarks.bench_upload_memory [--uploads 12] [--mb 12] [--max-mb 150]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from benchmarks.bench_pdf_extract import make_lab_pdf
+from benchmarks.load_test import free_port, wait_for_port
+
+PAGES = 40
+
+
+def memory_mb(pid, field):
+    """VmRSS / VmHWM of a process, in MB"""
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    raise RuntimeError(f"{field} not found")
+
+
+def sample_peak(pid, field, stop):
+    """Highest value of a /proc status field until stop is set"""
+    peak = 0.0
+    while not stop.wait(0.05):
+        peak = max(peak, memory_mb(pid, field))
+    return peak
+
+
+def reset_peak(pid):
+    """Start VmHWM again from the current RSS (Linux 4.0+)"""
+    try:
+        with open(f"/proc/{pid}/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def upload(port, path):
+    """Upload one PDF and wait until the server has extracted it"""
+    with open(path, "rb") as pdf:
+        response = httpx.post(f"http://127.0.0.1:{port}/upload",
+                              files={"pdf": (os.path.basename(path), pdf, "application/pdf")}, timeout=120)
+    body = response.json()
+    if response.status_code not in (200, 202):
+        return body.get("error", response.status_code)
+    session_id = body.get("session_id")
+    while body.get("status") == "processing":
+        time.sleep(0.2)
+        body = httpx.get(f"http://127.0.0.1:{port}/session/{session_id}", timeout=30).json()
+    return body.get("error") or body.get("status")
+
+
+def run_mode(mode, paths, workers):
+    # Memory is the question here; on a small machine a dozen concurrent
+    # extractions can take longer than the production time budget
+    os.environ.setdefault("PDF_TOTAL_TIMEOUT", "900")
+    port = free_port()
+    server = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.load_test", "--serve", mode,
+        "--port", str(port), "--workers", str(workers), "--latency", "0",
+    ])
+    try:
+        wait_for_port(port)
+        # Warm up: imports, extraction code paths and (if any) the worker pool
+        upload(port, paths[0])
+        baseline = memory_mb(server.pid, "VmRSS")
+        anon_baseline = memory_mb(server.pid, "RssAnon")
+        peak_reset = reset_peak(server.pid)
+
+        stop = threading.Event()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(paths)) as pool:
+            anon_peak = pool.submit(sample_peak, server.pid, "RssAnon", stop)
+            statuses = list(pool.map(lambda path: upload(port, path), paths[1:]))
+            stop.set()
+        elapsed = time.perf_counter() - start
+        peak = memory_mb(server.pid, "VmHWM")
+        if not peak_reset:
+            print("  (could not reset VmHWM; peak includes warm-up)")
+        return baseline, peak, anon_peak.result() - anon_baseline, elapsed, statuses
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uploads", type=int, default=12)
+    parser.add_argument("--mb", type=float, default=12, help="size of each PDF")
+    parser.add_argument("--max-mb", type=float, default=150, help="allowed peak RSS growth")
+    parser.add_argument("--workers", type=int, default=32, help="WSGI worker threads")
+    parser.add_argument("--modes", nargs="+", default=["wsgi", "asgi"])
+    args = parser.parse_args()
+
+    image_kb = int(args.mb * 1024 / PAGES)
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        # One extra for the warm-up; each file is different so the extraction
+        # cache cannot share work between them
+        paths = []
+        for seed in range(args.uploads + 1):
+            path = os.path.join(tmp, f"report-{seed}.pdf")
+            with open(path, "wb") as pdf:
+                pdf.write(make_lab_pdf(PAGES, seed=seed, image_kb=image_kb))
+            paths.append(path)
+        size_mb = os.path.getsize(paths[0]) / 1024 / 1024
+
+        print(f"{args.uploads} concurrent uploads of {size_mb:.1f} MB ({PAGES} pages), limit +{args.max_mb:.0f} MB")
+        print(f"{'mode':<6} {'base MB':>8} {'peak MB':>8} {'growth':>8} {'per upload':>10} "
+              f"{'anon growth':>11} {'seconds':>8}  statuses")
+        for mode in args.modes:
+            baseline, peak, anon_growth, elapsed, statuses = run_mode(mode, paths, args.workers)
+            growth = peak - baseline
+            counts = {status: statuses.count(status) for status in set(statuses)}
+            print(f"{mode:<6} {baseline:>8.1f} {peak:>8.1f} {growth:>8.1f} {growth / args.uploads:>10.1f} "
+                  f"{anon_growth:>11.1f} {elapsed:>8.1f}  {counts}")
+            if growth > args.max_mb or set(statuses) != {"ready"}:
+                failed = True
+
+    if failed:
+        print(f"FAIL: peak memory grew by more than {args.max_mb:.0f} MB or an upload did not finish")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""Latency of lab, general and symptom questions with and without web search.
+
+The real Gemini model decides for itself whether to call a tool, so the
+worst case is assumed: a fake model that, whenever it has the search tools,
+issues one search for the question before answering. The search backend is
+a stub that sleeps --search-latency seconds. Everything else is the app's
+own path: LazyAgent twins, choose_agent(), the search policy and the search
+result cache.
+
+Each policy runs the question set twice: the first pass starts with an empty
+search cache, the second pass shows the cache at work.
+
+Usage (from server/python-server):
+    python -m benchmarks.bench_web_search [--search-latency 1.5] [--latency 0.3]
+"""
+import argparse
+import os
+import statistics
+import time
+from datetime import datetime
+
+# Measure routing and search, not the response cache or the gateway limits
+os.environ.setdefault("RESPONSE_CACHE_ENABLED", "false")
+os.environ.setdefault("LLM_RATE_PER_SECOND", "0")
+
+import app
+import search_tools
+from benchmarks.fakes import FAKE_DOCTORS, FakeAgent
+from lazy_agent import LazyAgent
+
+REPORT_TEXT = """Hemoglobin 11.2 g/dL 13.0 - 17.0 L
+LDL Cholesterol 162 mg/dL < 100 H
+Fasting Glucose 96 mg/dL 70 - 100
+TSH 2.1 uIU/mL 0.4 - 4.0"""
+
+QUESTIONS = [
+    ('/ask', "Is my hemoglobin normal?"),
+    ('/ask', "What does a high LDL mean?"),
+    ('/ask', "What are the latest guidelines for LDL targets?"),
+    ('/ask_general', "What is a normal blood pressure?"),
+    ('/ask_general', "How much water should I drink every day?"),
+    ('/ask_general', "Were any new diabetes drugs approved in 2024?"),
+    ('/symptoms', "I have a headache and fever"),
+    ('/symptoms', "cough and sore throat for three days"),
+]
+
+
+class SearchingFakeAgent(FakeAgent):
+    """A FakeAgent that searches for the question before answering whenever it
+    has the search tools"""
+
+    def __init__(self, tools, **kwargs):
+        super().__init__(**kwargs)
+        self.tools = tools
+
+    def run(self, prompt, stream=True):
+        upstream = super().run(prompt, stream)
+
+        def generate():
+            if self.tools:
+                self.tools[0](next(question for _, question in QUESTIONS if question in prompt))
+            yield from upstream
+
+        return generate()
+
+
+def install(args):
+    calls = []
+
+    def fake_fetch(kind, query, max_results):
+        calls.append(query)
+        time.sleep(args.search_latency)
+        return "[]"
+
+    def build(description, instructions, model_id, web_search, markdown, cached_content, client=None):
+        tools = list(search_tools.SEARCH_TOOLS) if web_search else []
+        return SearchingFakeAgent(tools, latency=args.latency, chunks=5)
+
+    search_tools._fetch = fake_fetch
+    LazyAgent._build = staticmethod(build)
+    LazyAgent._build_client = staticmethod(lambda **options: None)
+    for name in ('lab_agent', 'general_agent', 'symptoms_agent'):
+        agent = getattr(app, name)
+        setattr(app, name, LazyAgent(agent._options['description'], agent._options['instructions']))
+    app.get_doctors_for_specializations = lambda specializations, limit=10: {
+        specialization: app.format_doctors(FAKE_DOCTORS[:limit]) for specialization in specializations}
+    app.session_store.put('bench', {
+        'text': REPORT_TEXT,
+        'filename': 'report.pdf',
+        'timestamp': datetime.now()
+    })
+    return calls
+
+
+def run_pass(client, policy):
+    search_tools.SEARCH_POLICY = policy
+    latencies = {}
+    for path, question in QUESTIONS:
+        body = {'symptoms': question} if path == '/symptoms' else {'query': question, 'session_id': 'bench'}
+        start = time.perf_counter()
+        response = client.post(path, json=body)
+        response.close()
+        assert response.status_code == 200, response.get_json()
+        latencies.setdefault(path, []).append(time.perf_counter() - start)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--search-latency", type=float, default=1.5)
+    parser.add_argument("--latency", type=float, default=0.3, help="fake model generation time")
+    args = parser.parse_args()
+
+    calls = install(args)
+    client = app.app.test_client()
+    paths = sorted({path for path, _ in QUESTIONS})
+
+    print(f"{len(QUESTIONS)} questions, search {args.search_latency}s, generation {args.latency}s; "
+          f"mean latency in ms")
+    print(f"{'policy':<7} {'pass':<5} {'searches':>8} " + " ".join(f"{path:>12}" for path in paths)
+          + f" {'all':>8}")
+    for policy in ("always", "auto", "never"):
+        search_tools.clear()
+        for label in ("cold", "warm"):
+            before = len(calls)
+            latencies = run_pass(client, policy)
+            everything = [seconds for values in latencies.values() for seconds in values]
+            print(f"{policy:<7} {label:<5} {len(calls) - before:>8} "
+                  + " ".join(f"{statistics.mean(latencies[path]) * 1000:>12.0f}" for path in paths)
+                  + f" {statistics.mean(everything) * 1000:>8.0f}")
+
+    stats = search_tools.cache_stats()
+    print(f"search cache: {stats['hits']} hits, {stats['misses']} misses, "
+          f"{stats['saved_seconds']:.1f}s of searching saved")
+
+
+if __name__ == '__main__':
+    main()
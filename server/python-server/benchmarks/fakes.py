@@ -0,0 +1,223 @@
+"""Offline stand-ins for Gemini and the doctor table, shared by the benchmarks."""
+import asyncio
+import threading
+import time
+
+FAKE_RESPONSE = (
+    "Here is some general information. These values are usually within the "
+    "normal range, but please consult your healthcare provider for advice."
+)
+
+FAKE_DOCTORS = [
+    {"id": f"doc-{i}", "name": f"Doctor {i}", "rating": 5 - (i % 5) * 0.5,
+     "Specialization": [spec], "noOfPatients": 100 - i}
+    for i, spec in enumerate([
+        "Cardiology", "Neurology", "Gastroenterology", "Dermatology",
+        "Orthopedics", "Pulmonology", "Gynecology", "Pediatrics",
+    ] * 3)
+]
+
+
+class FakeChunk:
+    def __init__(self, content):
+        self.content = content
+
+
+class FakeAgent:
+    """Mimics phi's Agent.run(stream=True): yields `chunks` pieces of text
+    spread evenly over `latency` seconds. With prefill_seconds_per_1k_tokens,
+    the first chunk is further delayed in proportion to the prompt size, the
+    way a real model's time to first token grows with the prompt."""
+
+    def __init__(self, latency=1.0, chunks=10, text=FAKE_RESPONSE, prefill_seconds_per_1k_tokens=0.0):
+        self.latency = latency
+        self.chunks = chunks
+        self.text = text
+        self.prefill_seconds_per_1k_tokens = prefill_seconds_per_1k_tokens
+
+    def run(self, prompt, stream=True):
+        words = self.text.split(" ")
+        step = max(1, len(words) // self.chunks)
+        pieces = [" ".join(words[i:i + step]) + " " for i in range(0, len(words), step)]
+        delay = self.latency / len(pieces)
+        prefill = self.prefill_seconds_per_1k_tokens * (len(prompt) / 4) / 1000
+
+        def generate():
+            time.sleep(prefill)
+            for piece in pieces:
+                time.sleep(delay)
+                yield FakeChunk(piece)
+
+        return generate()
+
+
+class FakeRateLimitError(Exception):
+    """Looks like google.api_core's ResourceExhausted to the gateway"""
+    code = 429
+
+
+class RateLimitedFakeAgent(FakeAgent):
+    """A FakeAgent behind a quota, like the Gemini API: more than
+    `max_concurrency` generations at once, or more than `rate_per_second`
+    starts in any one-second window, fail with a 429 before the first chunk.
+    `calls` counts every generation that was started."""
+
+    def __init__(self, max_concurrency=4, rate_per_second=None, **kwargs):
+        super().__init__(**kwargs)
+        self.max_concurrency = max_concurrency
+        self.rate_per_second = rate_per_second
+        self.calls = 0
+        self.rejected = 0
+        self._running = 0
+        self._starts = []
+        self._lock = threading.Lock()
+
+    def _admit(self):
+        with self._lock:
+            self.calls += 1
+            now = time.monotonic()
+            self._starts = [t for t in self._starts if now - t < 1.0]
+            if (self._running >= self.max_concurrency
+                    or (self.rate_per_second and len(self._starts) >= self.rate_per_second)):
+                self.rejected += 1
+                raise FakeRateLimitError("429 Resource has been exhausted (e.g. check quota).")
+            self._running += 1
+            self._starts.append(now)
+
+    def run(self, prompt, stream=True):
+        upstream = super().run(prompt, stream)
+
+        def generate():
+            self._admit()
+            try:
+                yield from upstream
+            finally:
+                with self._lock:
+                    self._running -= 1
+
+        return generate()
+
+
+class FakeDoctorTable:
+    """Stand-in for connection.fetch() over FAKE_DOCTORS.
+
+    Answers the doctor queries in connection.py (one specialization, many
+    specializations, the whole directory) after `latency` seconds, the way
+    a local Postgres would, so code above fetch() runs unchanged.
+    """
+
+    def __init__(self, doctors=FAKE_DOCTORS, latency=0.002):
+        self.doctors = sorted(doctors, key=lambda doc: (-doc["rating"], -doc["noOfPatients"]))
+        self.latency = latency
+        self.queries = 0
+
+    def _rows(self, spec=None):
+        return [{
+            "doctor_name": doc["name"],
+            "id": doc["id"],
+            "rating": doc["rating"],
+            "specialization": doc["Specialization"],
+            "no_of_patients": doc["noOfPatients"],
+        } for doc in self.doctors
+            if spec is None or spec.lower() in (s.lower() for s in doc["Specialization"])]
+
+    async def fetch(self, query, *args):
+        self.queries += 1
+        await asyncio.sleep(self.latency)
+        if "unnest" in query:
+            specs, limit = args
+            return [{"spec": spec, **row} for spec in specs for row in self._rows(spec)[:limit]]
+        if args:
+            spec, limit = args
+            return self._rows(spec)[:limit]
+        return self._rows()
+
+
+class FakeCacheGone(Exception):
+    """Looks like google.api_core's NotFound for a dropped cached content"""
+    code = 404
+
+
+class FakeCachedAgent:
+    """A FakeAgent answering on top of a cached prefix: only the prompt it
+    is given (the part after the prefix) costs prefill time"""
+
+    def __init__(self, backend, base_agent, name):
+        self.backend = backend
+        self.base_agent = base_agent
+        self.name = name
+        self.plain = base_agent
+
+    def run(self, prompt, stream=True):
+        if not self.backend.alive(self.name):
+            raise FakeCacheGone(f"404 Cached content {self.name} not found or expired")
+        self.backend.uses += 1
+        return self.base_agent.run(prompt, stream)
+
+
+class FakeContextBackend:
+    """Local stand-in for Gemini's cached content (context_cache backend),
+    with the same TTL behaviour: a prefix is gone once its TTL runs out
+    unless it was extended."""
+
+    name = "fake"
+
+    def __init__(self, create_latency=0.0):
+        self.create_latency = create_latency
+        self.prefixes = {}  # name -> (prefix, expires at)
+        self.created = 0
+        self.deleted = 0
+        self.uses = 0
+        self._lock = threading.Lock()
+
+    def create(self, prefix, ttl_seconds):
+        time.sleep(self.create_latency)
+        with self._lock:
+            self.created += 1
+            name = f"cachedContents/fake-{self.created}"
+            self.prefixes[name] = (prefix, time.time() + ttl_seconds)
+        return name
+
+    def extend(self, name, ttl_seconds):
+        with self._lock:
+            if name not in self.prefixes:
+                raise RuntimeError(f"403 Cached content {name} not found")
+            self.prefixes[name] = (self.prefixes[name][0], time.time() + ttl_seconds)
+
+    def delete(self, name):
+        with self._lock:
+            if self.prefixes.pop(name, None) is not None:
+                self.deleted += 1
+
+    def alive(self, name):
+        with self._lock:
+            entry = self.prefixes.get(name)
+            return entry is not None and entry[1] > time.time()
+
+    def agent(self, base_agent, name):
+        return FakeCachedAgent(self, base_agent, name)
+
+
+def install_fakes(latency=1.0, chunks=10, doctors="preload", db_latency=0.002):
+    """Swap app.py's agents for FakeAgents (and Gemini's context cache for a
+    FakeContextBackend) and provide the doctor directory.
+
+    doctors: "preload" fills the doctor cache up front, "fake-db" leaves it
+    cold in front of a FakeDoctorTable, "real-db" uses DATABASE_URL as is.
+    """
+    import app
+    import connection
+    import doctor_cache
+
+    agent = FakeAgent(latency=latency, chunks=chunks)
+    app.lab_agent = agent
+    app.general_agent = agent
+    app.symptoms_agent = agent
+    app.summary_agent = agent
+    if app.report_context_cache is not None:
+        app.report_context_cache.backend = FakeContextBackend()
+    if doctors == "preload":
+        doctor_cache.load(FAKE_DOCTORS)
+    elif doctors == "fake-db":
+        connection.fetch = FakeDoctorTable(latency=db_latency).fetch
+    return agent
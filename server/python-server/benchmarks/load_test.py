@@ -0,0 +1,183 @@
+"""Load test the Flask (WSGI) and Starlette (ASGI) serving modes with a mocked agent.
+
+Each mode is started in a subprocess with FakeAgents (no Gemini, no database),
+then driven by N concurrent clients posting to /ask_general for a fixed time.
+The WSGI server gets a fixed pool of worker threads, like gunicorn sync workers.
+
+Usage (from server/python-server):
+    python -m benchmarks.load_test
+    python -m benchmarks.load_test --latency 2 --concurrency 10 100 500 --duration 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def serve(mode, port, workers, latency, chunks=10, doctors="preload", db_latency=0.002):
+    os.environ.setdefault("DOCTOR_CACHE_TTL_SECONDS", "86400")
+    # Every client asks the same question; measure the serving path, not the cache
+    os.environ.setdefault("RESPONSE_CACHE_ENABLED", "false")
+    # ...nor the model gateway's coalescing and limits (see bench_llm_gateway)
+    os.environ.setdefault("LLM_COALESCE", "false")
+    os.environ.setdefault("LLM_RATE_PER_SECOND", "0")
+    os.environ.setdefault("LLM_MAX_CONCURRENCY", "100000")
+    from benchmarks.fakes import install_fakes
+    install_fakes(latency=latency, chunks=chunks, doctors=doctors, db_latency=db_latency)
+
+    if mode == "wsgi":
+        import logging
+        from werkzeug.serving import BaseWSGIServer
+        import app as core
+
+        class PooledWSGIServer(BaseWSGIServer):
+            """Werkzeug server that handles requests on a fixed number of threads"""
+            request_queue_size = 1024
+
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                self.pool = ThreadPoolExecutor(max_workers=workers)
+
+            def process_request(self, request, client_address):
+                self.pool.submit(self._handle, request, client_address)
+
+            def _handle(self, request, client_address):
+                try:
+                    self.finish_request(request, client_address)
+                except Exception:
+                    self.handle_error(request, client_address)
+                finally:
+                    self.shutdown_request(request)
+
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+        PooledWSGIServer("127.0.0.1", port, core.app).serve_forever()
+    else:
+        import uvicorn
+        import asgi
+        uvicorn.run(asgi.app, host="127.0.0.1", port=port, log_level="warning", backlog=2048)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+async def post_json(port, path, body):
+    """Minimal HTTP/1.1 POST over a fresh connection.
+
+    Deliberately not httpx: its connection pool becomes the bottleneck well
+    before the servers do at a few hundred concurrent clients.
+    """
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        payload = json.dumps(body).encode()
+        writer.write(
+            f"POST {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode() + payload
+        )
+        await writer.drain()
+        response = await reader.read()
+    finally:
+        writer.close()
+    head, _, content = response.partition(b"\r\n\r\n")
+    return int(head.split(b" ", 2)[1]), content
+
+
+async def drive(port, concurrency, duration):
+    latencies = []
+    errors = 0
+    deadline = time.monotonic() + duration
+
+    async def worker():
+        nonlocal errors
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                status, _ = await post_json(port, "/ask_general", {"query": "what is a normal blood sugar level"})
+            except (OSError, IndexError, ValueError):
+                errors += 1
+                continue
+            if status != 200:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    return latencies, errors, elapsed
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return float("nan")
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=1.0, help="fake generation time (s)")
+    parser.add_argument("--workers", type=int, default=8, help="WSGI worker threads")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per run")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--modes", nargs="+", default=["wsgi", "asgi"])
+    args = parser.parse_args()
+
+    print(f"{'mode':<6} {'clients':>7} {'req/s':>8} {'p50 s':>7} {'p99 s':>7} {'errors':>6}")
+    for mode in args.modes:
+        port = free_port()
+        server = subprocess.Popen([
+            sys.executable, "-m", "benchmarks.load_test", "--serve", mode,
+            "--port", str(port), "--workers", str(args.workers), "--latency", str(args.latency),
+        ])
+        try:
+            wait_for_port(port)
+            for concurrency in args.concurrency:
+                latencies, errors, elapsed = asyncio.run(
+                    drive(port, concurrency, args.duration)
+                )
+                rps = len(latencies) / elapsed
+                p50 = statistics.median(latencies) if latencies else float("nan")
+                print(f"{mode:<6} {concurrency:>7} {rps:>8.1f} {p50:>7.2f} "
+                      f"{percentile(latencies, 99):>7.2f} {errors:>6}")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    if "--serve" in sys.argv:
+        parser = argparse.ArgumentParser()
+        parser.add_argument("--serve", choices=["wsgi", "asgi"])
+        parser.add_argument("--port", type=int)
+        parser.add_argument("--workers", type=int, default=8)
+        parser.add_argument("--latency", type=float, default=1.0)
+        parser.add_argument("--chunks", type=int, default=10)
+        parser.add_argument("--doctors", choices=["preload", "fake-db", "real-db"], default="preload")
+        parser.add_argument("--db-latency-ms", type=float, default=2.0)
+        serve_args = parser.parse_args()
+        serve(serve_args.serve, serve_args.port, serve_args.workers, serve_args.latency,
+              serve_args.chunks, serve_args.doctors, serve_args.db_latency_ms / 1000)
+    else:
+        main()
@@ -0,0 +1,388 @@
+"""Offline benchmark of every chat server route, with JSON results.
+
+Starts the server (WSGI and/or ASGI, see load_test) with FakeAgents
+(--latency seconds per answer in --chunks pieces) and a doctor directory
+that is either preloaded, a FakeDoctorTable behind connection.fetch(), or
+a real local Postgres (--doctors real-db, using DATABASE_URL). No network
+access, Gemini key or database is needed by default.
+
+Each mode runs:
+
+  upload         --uploads generated lab PDFs (benchmarks.bench_pdf_extract),
+                 all different, posted --upload-concurrency at a time;
+                 "upload" is the time to the 202, "upload_ready" the time
+                 until /session/<id> reports the report as ready
+  then, each for --duration seconds at --concurrency clients:
+  session        GET /session/<id>
+  ask            POST /ask, and ask_stream with "stream": true
+  smart_query    POST /smart_query, cycling lab, symptom and general questions
+  ask_general    POST /ask_general, and ask_general_stream
+  symptoms       POST /symptoms, and symptoms_stream
+
+For every scenario it reports requests, errors, throughput, p50/p95/p99
+latency, time to the first streamed chunk and the server's peak RSS
+(Linux only). Results go to benchmarks/results/<commit>.json;
+--compare OLD.json prints the change against an earlier run and exits 1
+when a scenario got slower, lost throughput or used more memory by more
+than --tolerance.
+
+Usage (from server/python-server):
+    python -m benchmarks.suite
+    python -m benchmarks.suite --modes asgi --duration 10 --compare benchmarks/results/abc1234.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+
+from benchmarks.bench_pdf_extract import make_lab_pdf
+from benchmarks.bench_upload_memory import memory_mb, reset_peak
+from benchmarks.load_test import free_port, percentile, wait_for_port
+from benchmarks.symptom_corpus import LABELED_SYMPTOMS
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+LAB_QUESTIONS = [
+    "What is my hemoglobin?",
+    "Is my vitamin D low?",
+    "Explain my LDL cholesterol result",
+    "What does my TSH mean for my thyroid?",
+    "Can you summarize my report?",
+]
+GENERAL_QUESTIONS = [
+    "what is a normal blood sugar level",
+    "how much water should I drink every day",
+    "what does cholesterol do in the body",
+    "how many hours of sleep do adults need",
+    "is it safe to take ibuprofen with food",
+]
+SYMPTOMS = [text for text, specialization in LABELED_SYMPTOMS if specialization]
+
+# Lower is better for these, higher for throughput
+COMPARED = {"p95_ms": "lower", "p50_ms": "lower", "rps": "higher", "peak_rss_mb": "lower"}
+# Latency changes smaller than this are noise, whatever the percentage
+NOISE_MS = 50
+# Settings that change the numbers; runs that differ in them are not comparable
+WORKLOAD = ("latency", "chunks", "doctors", "db_latency_ms", "workers", "concurrency", "uploads",
+            "upload_concurrency", "pages")
+
+
+def decode_chunked(body):
+    """Body of a response sent with Transfer-Encoding: chunked"""
+    out = bytearray()
+    while body:
+        size_line, _, rest = body.partition(b"\r\n")
+        size = int(size_line.split(b";")[0], 16)
+        if size == 0:
+            break
+        out += rest[:size]
+        body = rest[size + 2:]
+    return bytes(out)
+
+
+async def http(port, method, path, body=b"", content_type="application/json"):
+    """One request over a fresh connection -> (status, body, seconds until
+    the first SSE chunk or None). Raw asyncio for the same reason as
+    load_test.post_json."""
+    start = time.perf_counter()
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        head = f"{method} {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n"
+        if method == "POST":
+            head += f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+        writer.write(head.encode() + b"\r\n" + body)
+        await writer.drain()
+
+        response = bytearray()
+        first_chunk = None
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            response += data
+            if first_chunk is None and b"event: chunk" in response:
+                first_chunk = time.perf_counter() - start
+    finally:
+        writer.close()
+
+    head, _, content = bytes(response).partition(b"\r\n\r\n")
+    if b"transfer-encoding: chunked" in head.lower():
+        content = decode_chunked(content)
+    return int(head.split(b" ", 2)[1]), content, first_chunk
+
+
+def multipart(filename, data):
+    boundary = uuid.uuid4().hex
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"pdf\"; filename=\"{filename}\"\r\n"
+            f"Content-Type: application/pdf\r\n\r\n").encode() + data + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def summarize(latencies, first_chunks, errors, elapsed):
+    """Numbers reported for one scenario (times in ms)"""
+    ms = [latency * 1000 for latency in latencies]
+    stats = {
+        "requests": len(ms) + errors,
+        "errors": errors,
+        "rps": round(len(ms) / elapsed, 2) if elapsed else None,
+        "p50_ms": round(percentile(ms, 50), 1) if ms else None,
+        "p95_ms": round(percentile(ms, 95), 1) if ms else None,
+        "p99_ms": round(percentile(ms, 99), 1) if ms else None,
+    }
+    if first_chunks:
+        stats["first_chunk_p50_ms"] = round(percentile([t * 1000 for t in first_chunks], 50), 1)
+    return stats
+
+
+async def run_uploads(port, pdfs, concurrency):
+    """Upload every PDF and wait until each is extracted -> (stats, session ids)"""
+    accept, ready, sessions = [], [], []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(index, data):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            body, content_type = multipart(f"report-{index}.pdf", data)
+            try:
+                status, content, _ = await http(port, "POST", "/upload", body, content_type)
+                if status not in (200, 202):
+                    errors += 1
+                    return
+                accept.append(time.perf_counter() - start)
+                session_id = json.loads(content)["session_id"]
+                info = json.loads(content)
+                while info.get("status") == "processing":
+                    await asyncio.sleep(0.1)
+                    status, content, _ = await http(port, "GET", f"/session/{session_id}")
+                    info = json.loads(content)
+            except (OSError, ValueError, KeyError, IndexError):
+                errors += 1
+                return
+            if info.get("status") != "ready":
+                errors += 1
+                return
+            ready.append(time.perf_counter() - start)
+            sessions.append(session_id)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i, data) for i, data in enumerate(pdfs)))
+    elapsed = time.perf_counter() - start
+    return {
+        "upload": summarize(accept, [], errors, elapsed),
+        "upload_ready": summarize(ready, [], errors, elapsed),
+    }, sessions
+
+
+def scenarios(sessions):
+    """name -> request(i) returning (method, path, json body or None)"""
+    def session(i):
+        return sessions[i % len(sessions)]
+
+    def smart_query(i):
+        kind = i % 3
+        if kind == 0:
+            return "POST", "/smart_query", {"query": LAB_QUESTIONS[i % len(LAB_QUESTIONS)], "session_id": session(i)}
+        if kind == 1:
+            return "POST", "/smart_query", {"query": SYMPTOMS[i % len(SYMPTOMS)]}
+        return "POST", "/smart_query", {"query": GENERAL_QUESTIONS[i % len(GENERAL_QUESTIONS)]}
+
+    return {
+        "session": lambda i: ("GET", f"/session/{session(i)}", None),
+        "ask": lambda i: ("POST", "/ask", {"query": LAB_QUESTIONS[i % len(LAB_QUESTIONS)], "session_id": session(i)}),
+        "ask_stream": lambda i: ("POST", "/ask", {"query": LAB_QUESTIONS[i % len(LAB_QUESTIONS)],
+                                                  "session_id": session(i), "stream": True}),
+        "smart_query": smart_query,
+        "ask_general": lambda i: ("POST", "/ask_general", {"query": GENERAL_QUESTIONS[i % len(GENERAL_QUESTIONS)]}),
+        "ask_general_stream": lambda i: ("POST", "/ask_general", {"query": GENERAL_QUESTIONS[i % len(GENERAL_QUESTIONS)],
+                                                                  "stream": True}),
+        "symptoms": lambda i: ("POST", "/symptoms", {"symptoms": SYMPTOMS[i % len(SYMPTOMS)]}),
+        "symptoms_stream": lambda i: ("POST", "/symptoms", {"symptoms": SYMPTOMS[i % len(SYMPTOMS)], "stream": True}),
+    }
+
+
+async def drive(port, request, concurrency, duration):
+    """Send request(i) from `concurrency` clients for `duration` seconds"""
+    latencies, first_chunks = [], []
+    errors = 0
+    counter = iter(range(10 ** 9))
+    deadline = time.monotonic() + duration
+
+    async def client():
+        nonlocal errors
+        while time.monotonic() < deadline:
+            method, path, body = request(next(counter))
+            start = time.perf_counter()
+            try:
+                status, content, first_chunk = await http(port, method, path, json.dumps(body).encode() if body else b"")
+            except (OSError, IndexError, ValueError):
+                errors += 1
+                continue
+            if status != 200 or b"event: error" in content:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+            if first_chunk is not None:
+                first_chunks.append(first_chunk)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return summarize(latencies, first_chunks, errors, time.perf_counter() - start)
+
+
+def peak_since_reset(pid):
+    try:
+        return round(memory_mb(pid, "VmHWM"), 1)
+    except (OSError, RuntimeError):
+        return None
+
+
+def run_mode(mode, args, pdfs):
+    port = free_port()
+    env = {**os.environ, "SESSION_BACKEND": "memory"}
+    server = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.load_test", "--serve", mode, "--port", str(port),
+        "--workers", str(args.workers), "--latency", str(args.latency), "--chunks", str(args.chunks),
+        "--doctors", args.doctors, "--db-latency-ms", str(args.db_latency_ms),
+    ], env=env)
+    results = {}
+    try:
+        wait_for_port(port)
+        try:
+            base_rss = round(memory_mb(server.pid, "VmRSS"), 1)
+        except (OSError, RuntimeError):
+            base_rss = None
+
+        reset_peak(server.pid)
+        upload_stats, sessions = asyncio.run(run_uploads(port, pdfs, args.upload_concurrency))
+        peak = peak_since_reset(server.pid)
+        for name, stats in upload_stats.items():
+            results[name] = {**stats, "peak_rss_mb": peak}
+        if not sessions:
+            raise RuntimeError("no upload finished; cannot run the session scenarios")
+
+        for name, request in scenarios(sessions).items():
+            if args.scenarios and name not in args.scenarios:
+                continue
+            # Warm up imports and caches outside the measurement
+            asyncio.run(drive(port, request, 1, 0.01))
+            reset_peak(server.pid)
+            stats = asyncio.run(drive(port, request, args.concurrency, args.duration))
+            results[name] = {**stats, "peak_rss_mb": peak_since_reset(server.pid)}
+    finally:
+        server.terminate()
+        server.wait()
+    return {"base_rss_mb": base_rss, "scenarios": results}
+
+
+def print_results(mode, result):
+    print(f"\n{mode} (base RSS {result['base_rss_mb']} MB)")
+    print(f"{'scenario':<20} {'requests':>8} {'errors':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'1st chunk':>9} {'peak MB':>8}")
+    for name, stats in result["scenarios"].items():
+        print(f"{name:<20} {stats['requests']:>8} {stats['errors']:>6} {stats['rps'] or 0:>8.1f} "
+              f"{stats['p50_ms'] or 0:>8.1f} {stats['p95_ms'] or 0:>8.1f} {stats['p99_ms'] or 0:>8.1f} "
+              f"{stats.get('first_chunk_p50_ms', '-'):>9} {stats['peak_rss_mb'] or '-':>8}")
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+    return commit, dirty
+
+
+def compare(old, new, tolerance):
+    """Print the change of every compared number; returns the regressions"""
+    regressions = []
+    print(f"\ncompared with {old['commit']} ({old['timestamp']}), tolerance {tolerance:.0%}")
+    different = [key for key in WORKLOAD if old["config"].get(key) != new["config"].get(key)]
+    if different:
+        print(f"warning: the runs used different settings: {', '.join(different)}")
+    for mode, result in new["results"].items():
+        old_scenarios = old["results"].get(mode, {}).get("scenarios", {})
+        for name, stats in result["scenarios"].items():
+            before = old_scenarios.get(name)
+            if before is None:
+                continue
+            changes = []
+            for key, better in COMPARED.items():
+                if not before.get(key) or stats.get(key) is None:
+                    continue
+                change = stats[key] / before[key] - 1
+                changes.append(f"{key} {change:+.0%}")
+                worse = change > tolerance if better == "lower" else change < -tolerance
+                if key.endswith("_ms") and abs(stats[key] - before[key]) < NOISE_MS:
+                    worse = False
+                if worse:
+                    regressions.append(f"{mode} {name}: {key} {before[key]} -> {stats[key]}")
+            print(f"{mode:<5} {name:<20} " + "  ".join(changes))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modes", nargs="+", default=["wsgi", "asgi"])
+    parser.add_argument("--scenarios", nargs="+", help="only these (uploads always run)")
+    parser.add_argument("--latency", type=float, default=0.2, help="fake generation time (s)")
+    parser.add_argument("--chunks", type=int, default=10, help="streamed pieces per fake answer")
+    parser.add_argument("--doctors", choices=["preload", "fake-db", "real-db"], default="fake-db")
+    parser.add_argument("--db-latency-ms", type=float, default=2.0, help="fake DB query time")
+    parser.add_argument("--workers", type=int, default=32, help="WSGI worker threads")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per scenario")
+    parser.add_argument("--uploads", type=int, default=6)
+    parser.add_argument("--upload-concurrency", type=int, default=3)
+    parser.add_argument("--pages", type=int, nargs="+", default=[2, 10, 30], help="PDF sizes to cycle through")
+    parser.add_argument("--out", help="JSON results file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative change")
+    args = parser.parse_args()
+
+    # Every upload is a different file, so the extraction cache cannot help
+    pdfs = [make_lab_pdf(args.pages[i % len(args.pages)], seed=i) for i in range(args.uploads)]
+    commit, dirty = git_commit()
+    report = {
+        "commit": commit + ("-dirty" if dirty else ""),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": vars(args),
+        "results": {},
+    }
+    for mode in args.modes:
+        report["results"][mode] = run_mode(mode, args, pdfs)
+        print_results(mode, report["results"][mode])
+
+    out = args.out or os.path.join(RESULTS_DIR, f"{report['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as results_file:
+        json.dump(report, results_file, indent=2)
+    print(f"\nresults written to {out}")
+
+    failed = any(stats["errors"] for result in report["results"].values()
+                 for stats in result["scenarios"].values())
+    if args.compare:
+        with open(args.compare) as old_file:
+            regressions = compare(json.load(old_file), report, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        failed = failed or bool(regressions)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
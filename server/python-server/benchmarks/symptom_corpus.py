@@ -0,0 +1,104 @@
+"""Hand-labeled symptom descriptions for checking the specialization scorer.
+
+Each entry is (text, expected top specialization). None means no specialist
+should be suggested: nothing in the text is a symptom we route, or every
+symptom in it is negated.
+"""
+
+LABELED_SYMPTOMS = [
+    # Cardiology
+    ("I have chest pain when I climb stairs", "Cardiology"),
+    ("chest pain and shortness of breath since yesterday", "Cardiology"),
+    ("my heart is racing, I get palpitations at night", "Cardiology"),
+    ("irregular heartbeat and swelling in legs", "Cardiology"),
+    ("my high blood pressure is not coming down with medicine", "Cardiology"),
+    ("I fainted twice this week and have palpitations", "Cardiology"),
+
+    # Neurology
+    ("I have a headache and fever", "Neurology"),
+    ("severe migraine with numbness in my hand", "Neurology"),
+    ("my father had a seizure and now has memory loss", "Neurology"),
+    ("tremors in both hands and difficulty speaking", "Neurology"),
+    ("constant dizziness and a tingling sensation in my feet", "Neurology"),
+
+    # Gastroenterology
+    ("stomach pain and vomiting after eating", "Gastroenterology"),
+    ("nausea, bloating and acid reflux every night", "Gastroenterology"),
+    ("I have diarrhea for 3 days and loss of appetite", "Gastroenterology"),
+    ("there is blood in stool and constipation", "Gastroenterology"),
+    ("heartburn and indigestion after meals", "Gastroenterology"),
+    ("abdominal pain on the right side", "Gastroenterology"),
+
+    # Dermatology
+    ("skin rash and itching on my arms", "Dermatology"),
+    ("acne on my face is getting worse", "Dermatology"),
+    ("dry skin and eczema on my hands", "Dermatology"),
+    ("I am losing a lot of hair, hair loss since two months", "Dermatology"),
+    ("psoriasis patches and nail discoloration", "Dermatology"),
+
+    # Orthopedics
+    ("joint pain and swollen joints in the morning", "Orthopedics"),
+    ("lower back pain after lifting something heavy", "Orthopedics"),
+    ("knee pain when walking and difficulty walking up stairs", "Orthopedics"),
+    ("I think I have a fracture in my wrist", "Orthopedics"),
+    ("shoulder pain and neck pain from working at a desk", "Orthopedics"),
+
+    # Pulmonology
+    ("chronic cough and wheezing at night", "Pulmonology"),
+    ("difficulty breathing and asthma symptoms", "Pulmonology"),
+    ("cough with blood for a week", "Pulmonology"),
+
+    # Endocrinology
+    ("excessive thirst, frequent urination and weight loss", "Endocrinology"),
+    ("fatigue, weight gain and feeling cold", "Endocrinology"),
+    ("heat intolerance and sweating all the time", "Endocrinology"),
+
+    # Psychiatry
+    ("I feel depression and anxiety most days", "Psychiatry"),
+    ("insomnia and mood swings for months", "Psychiatry"),
+    ("panic attacks at work", "Psychiatry"),
+    ("feeling sad and stress at home", "Psychiatry"),
+
+    # Ophthalmology
+    ("blurred vision and eye pain", "Ophthalmology"),
+    ("red eyes and watery eyes since morning", "Ophthalmology"),
+    ("I see double vision when reading", "Ophthalmology"),
+
+    # ENT
+    ("ear pain and hearing loss in the left ear", "ENT"),
+    ("sore throat and runny nose", "ENT"),
+    ("nasal congestion, sneezing and loss of smell", "ENT"),
+    ("ringing in ears and vertigo", "ENT"),
+
+    # Urology
+    ("painful urination and blood in urine", "Urology"),
+    ("burning while urinating and difficulty urinating", "Urology"),
+    ("urinary incontinence when I cough", "Urology"),
+
+    # Gynecology
+    ("irregular periods and pelvic pain", "Gynecology"),
+    ("missed period and vaginal discharge", "Gynecology"),
+    ("pain during intercourse", "Gynecology"),
+
+    # Pediatrics
+    ("my child has fever in child and is crying excessively", "Pediatrics"),
+    ("my baby has fever and is crying excessively", "Pediatrics"),
+    ("toddler with delayed milestones", "Pediatrics"),
+
+    # Negation
+    ("no chest pain but I have a bad headache", "Neurology"),
+    ("I don't have a headache, only stomach pain", "Gastroenterology"),
+    ("denies chest pain or palpitations; complains of skin rash", "Dermatology"),
+    ("knee pain, no swelling in legs and no palpitations", "Orthopedics"),
+    ("without any fever or cough, just ear pain", "ENT"),
+    ("no chest pain and no shortness of breath", None),
+    ("I do not have anxiety or depression", None),
+    ("no idea what is wrong, chest pain since morning", "Cardiology"),
+    ("Never had this before, severe headache", "Neurology"),
+    ("no, I have a headache", "Neurology"),
+
+    # Nothing to route
+    ("what is a normal blood sugar level?", None),
+    ("how much water should I drink", None),
+    ("hello", None),
+]
@@ -0,0 +1,230 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from report_index import estimate_tokens
+
+# Context cache configuration
+CONTEXT_CACHE_BACKEND = os.getenv("CONTEXT_CACHE_BACKEND", "gemini")  # gemini | off
+# Gemini only caches prefixes of at least this many tokens (32k for 1.5 Flash)
+CONTEXT_CACHE_MIN_TOKENS = int(os.getenv("CONTEXT_CACHE_MIN_TOKENS", "32768"))
+# Caches belong to one model version; aliases like gemini-1.5-flash are not accepted
+CONTEXT_CACHE_MODEL_ID = os.getenv("CONTEXT_CACHE_MODEL_ID", "gemini-1.5-flash-002")
+CONTEXT_CACHE_AGENTS = int(os.getenv("CONTEXT_CACHE_AGENTS", "256"))  # agents kept for cached contexts
+CONTEXT_CACHE_THREADS = int(os.getenv("CONTEXT_CACHE_THREADS", "4"))
+
+# Error codes meaning the provider no longer has the cached content
+GONE_CODES = (403, 404)
+
+LOOKUPS = metrics.Counter("context_cache_lookups_total",
+                          "Lab questions by whether their report prefix was cached with the model", ("result",))
+
+
+class GeminiContextBackend:
+    """Gemini's cached content (google.generativeai.caching).
+
+    The report prefix is stored with the model once; requests made through
+    agent(base_agent, name) only send the rest of the prompt and pay the
+    cached-token rate for the prefix.
+    """
+
+    name = "gemini"
+
+    def __init__(self, model_id=CONTEXT_CACHE_MODEL_ID):
+        self.model_id = model_id
+
+    @staticmethod
+    def _genai():
+        import google.generativeai as genai
+        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+        return genai
+
+    def create(self, prefix, ttl_seconds):
+        cached = self._genai().caching.CachedContent.create(
+            model=f"models/{self.model_id}",
+            display_name="lab-report",
+            contents=[prefix],
+            ttl=ttl_seconds
+        )
+        return cached.name
+
+    def extend(self, name, ttl_seconds):
+        self._genai().caching.CachedContent.get(name).update(ttl=ttl_seconds)
+
+    def delete(self, name):
+        self._genai().caching.CachedContent.get(name).delete()
+
+    def agent(self, base_agent, name):
+        return base_agent.with_cached_content(name, self.model_id)
+
+
+class CachedContextAgent:
+    """An agent on a cached context that reports when the provider no longer
+    has it, so the next question registers the prefix again"""
+
+    def __init__(self, agent, on_gone):
+        self.agent = agent
+        self.on_gone = on_gone
+        self.plain = getattr(agent, 'plain', agent)
+
+    def run(self, prompt, stream=True):
+        def generate():
+            try:
+                yield from self.agent.run(prompt, stream=stream)
+            except Exception as e:
+                if getattr(e, 'code', None) in GONE_CODES:
+                    self.on_gone()
+                raise
+
+        return generate()
+
+
+class ContextCache:
+    """Stable prompt prefixes (instructions and report) registered with the
+    model once per session, so follow-up questions only send the question.
+
+    The handle lives in the session itself (field 'context_cache'), so every
+    worker sharing the session store reuses it and it goes away with the
+    session. The provider-side cache gets the session's timeout as its TTL
+    and is extended on use once half of it has passed. Reports under
+    CONTEXT_CACHE_MIN_TOKENS, and failed registrations, are remembered as
+    not cacheable and keep the inline prompt.
+
+    Registration and deletion run in the background: the question that
+    starts a registration is answered with the inline prompt.
+    """
+
+    def __init__(self, store, backend, ttl_seconds, min_tokens=CONTEXT_CACHE_MIN_TOKENS,
+                 max_agents=CONTEXT_CACHE_AGENTS, threads=CONTEXT_CACHE_THREADS):
+        self.store = store
+        self.backend = backend
+        self.ttl_seconds = int(ttl_seconds)
+        self.min_tokens = min_tokens
+        self.max_agents = max_agents
+        self._agents = OrderedDict()  # handle name -> agent, least recently used first
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="context-cache")
+        self._stats = {"hits": 0, "misses": 0, "skipped": 0, "registered": 0, "extended": 0,
+                       "deleted": 0, "errors": 0}
+
+    def _count(self, name, result=None):
+        with self._lock:
+            self._stats[name] += 1
+        if result:
+            LOOKUPS.inc(result=result)
+
+    def agent_for(self, session_id, session_info, base_agent, build_prefix):
+        """The agent to use with a prompt that leaves out the prefix, or None
+        (use the full prompt). build_prefix() is only called to register."""
+        entry = session_info.get('context_cache')
+        now = time.time()
+        if entry is None or (entry['name'] and entry['expires_at'] <= now):
+            self._count("misses", "miss")
+            self._submit(session_id, self._register, session_id, build_prefix)
+            return None
+        if not entry['name']:
+            self._count("skipped", "skipped")
+            return None
+
+        if entry['expires_at'] - now < self.ttl_seconds / 2:
+            self._submit(session_id, self._extend, session_id, entry['name'])
+        self._count("hits", "hit")
+        name = entry['name']
+        return CachedContextAgent(self._agent(base_agent, name), lambda: self.invalidate(session_id, name))
+
+    def _agent(self, base_agent, name):
+        with self._lock:
+            agent = self._agents.get(name)
+            if agent is not None:
+                self._agents.move_to_end(name)
+                return agent
+        agent = self.backend.agent(base_agent, name)
+        with self._lock:
+            self._agents[name] = agent
+            while len(self._agents) > self.max_agents:
+                self._agents.popitem(last=False)
+        return agent
+
+    def _submit(self, session_id, function, *args):
+        """Run function in the background unless this session already has a call queued"""
+        with self._lock:
+            if session_id in self._pending:
+                return
+            self._pending.add(session_id)
+
+        def run():
+            try:
+                function(*args)
+            except Exception as e:
+                self._count("errors")
+                print(f"Context cache error: {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(session_id)
+
+        self._executor.submit(run)
+
+    def _register(self, session_id, build_prefix):
+        prefix = build_prefix()
+        if estimate_tokens(prefix) < self.min_tokens:
+            self.store.update(session_id, {'context_cache': {"name": None, "expires_at": 0}})
+            return
+        try:
+            name = self.backend.create(prefix, self.ttl_seconds)
+        except Exception:
+            # Do not retry on every question; the inline prompt still works
+            self.store.update(session_id, {'context_cache': {"name": None, "expires_at": 0}})
+            raise
+        entry = {"name": name, "expires_at": time.time() + self.ttl_seconds}
+        if not self.store.update(session_id, {'context_cache': entry}):
+            # The session expired while the prefix was uploaded
+            self.backend.delete(name)
+            return
+        self._count("registered")
+
+    def _extend(self, session_id, name):
+        self.backend.extend(name, self.ttl_seconds)
+        self.store.update(session_id, {'context_cache': {"name": name, "expires_at": time.time() + self.ttl_seconds}})
+        self._count("extended")
+
+    def invalidate(self, session_id, name):
+        """Forget a handle the provider has dropped; the next lookup registers again"""
+        with self._lock:
+            self._agents.pop(name, None)
+        self.store.update(session_id, {'context_cache': {"name": name, "expires_at": 0}})
+
+    def release(self, session):
+        """Delete the cached prefix of a removed session (stores that report
+        removals; elsewhere the provider's TTL runs out with the session)"""
+        entry = session.get('context_cache')
+        if not entry or not entry['name']:
+            return
+        name = entry['name']
+        with self._lock:
+            self._agents.pop(name, None)
+
+        def delete():
+            try:
+                self.backend.delete(name)
+                self._count("deleted")
+            except Exception as e:
+                self._count("errors")
+                print(f"Context cache delete error: {e}")
+
+        self._executor.submit(delete)
+
+    def stats(self):
+        with self._lock:
+            return {"backend": self.backend.name, **self._stats, "agents": len(self._agents),
+                    "min_tokens": self.min_tokens}
+
+
+def create_context_backend():
+    """The backend selected by CONTEXT_CACHE_BACKEND, or None when off"""
+    if CONTEXT_CACHE_BACKEND == "gemini":
+        return GeminiContextBackend()
+    return None
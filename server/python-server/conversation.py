@@ -0,0 +1,180 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from report_index import estimate_tokens
+
+# Conversation memory configuration
+CONVERSATION_HISTORY_TOKENS = int(os.getenv("CONVERSATION_HISTORY_TOKENS", "1200"))  # 0 turns memory off
+CONVERSATION_SUMMARY_TOKENS = int(os.getenv("CONVERSATION_SUMMARY_TOKENS", "200"))
+CONVERSATION_ANSWER_TOKENS = int(os.getenv("CONVERSATION_ANSWER_TOKENS", "200"))  # stored answers are clipped
+CONVERSATION_KEEP_TURNS = int(os.getenv("CONVERSATION_KEEP_TURNS", "2"))  # newest turns are never summarized
+CONVERSATION_SUMMARY_THREADS = int(os.getenv("CONVERSATION_SUMMARY_THREADS", "2"))
+
+HISTORY_TOKENS = metrics.Histogram("conversation_history_tokens",
+                                   "Estimated tokens of earlier turns included in a prompt", (),
+                                   metrics.TOKEN_BUCKETS)
+SUMMARIES = metrics.Counter("conversation_summaries_total",
+                            "Older turns folded into a session's summary, by outcome", ("outcome",))
+
+
+def clip(text, tokens):
+    """text cut to about `tokens` tokens, at a word boundary"""
+    limit = tokens * 4
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(" ", 1)[0] + " ..."
+
+
+def empty_conversation():
+    return {"summary": "", "turns": []}
+
+
+def turn_text(question, answer):
+    return f"User: {question}\nAssistant: {answer}"
+
+
+def turns_tokens(turns):
+    return sum(estimate_tokens(turn_text(question, answer)) for question, answer in turns)
+
+
+def over_budget(conversation, budget=None):
+    """Whether older turns should be folded into the summary"""
+    budget = CONVERSATION_HISTORY_TOKENS if budget is None else budget
+    turns = conversation["turns"]
+    if len(turns) <= CONVERSATION_KEEP_TURNS:
+        return False
+    return estimate_tokens(conversation["summary"]) + turns_tokens(turns) > budget
+
+
+def history_text(conversation, budget=None):
+    """The conversation so far as prompt text, within budget tokens: the
+    summary of older turns, then as many of the newest turns as fit"""
+    budget = CONVERSATION_HISTORY_TOKENS if budget is None else budget
+    if not conversation or budget <= 0:
+        return ""
+
+    summary = conversation["summary"]
+    used = estimate_tokens(summary)
+    recent = []
+    for question, answer in reversed(conversation["turns"]):
+        turn = turn_text(question, answer)
+        tokens = estimate_tokens(turn)
+        if used + tokens > budget:
+            break
+        recent.append(turn)
+        used += tokens
+
+    parts = [f"Summary of the earlier conversation: {summary}"] if summary else []
+    parts.extend(reversed(recent))
+    text = "\n\n".join(parts)
+    if text:
+        HISTORY_TOKENS.observe(estimate_tokens(text))
+    return text
+
+
+def fallback_summary(summary, turns):
+    """Summary without the model: the questions asked so far"""
+    questions = "; ".join(question for question, _ in turns)
+    text = f"{summary} The user also asked: {questions}" if summary else f"The user asked: {questions}"
+    # Keep the most recent part when it no longer fits
+    limit = CONVERSATION_SUMMARY_TOKENS * 4
+    return text if len(text) <= limit else "... " + text[-limit:].split(" ", 1)[-1]
+
+
+class ConversationMemory:
+    """Earlier questions and answers about a report, for follow-ups.
+
+    The history lives in the session itself (field 'conversation': a summary
+    and a list of [question, answer] turns), so it expires with the report
+    and works with every session store. Answers are clipped before they are
+    stored. Once the turns outgrow CONVERSATION_HISTORY_TOKENS, all but the
+    newest CONVERSATION_KEEP_TURNS are folded into the summary on a
+    background thread by summarize(summary, turns) -> text; if that fails
+    the questions alone are kept.
+
+    Updates are serialized per process; with Redis and several workers the
+    last writer of a session wins.
+    """
+
+    def __init__(self, store, summarize, threads=CONVERSATION_SUMMARY_THREADS):
+        self.store = store
+        self.summarize = summarize
+        self._lock = threading.Lock()
+        self._folding = set()
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="summary")
+
+    def history(self, session_info):
+        """Prompt text for the conversation stored in session_info"""
+        return history_text(session_info.get('conversation'))
+
+    def last_question(self, session_info):
+        turns = (session_info.get('conversation') or empty_conversation())["turns"]
+        return turns[-1][0] if turns else None
+
+    def add_turn(self, session_id, question, answer):
+        """Remember a question and its answer; returns False if the session is gone"""
+        if CONVERSATION_HISTORY_TOKENS <= 0:
+            return False
+        turn = [question, clip(answer, CONVERSATION_ANSWER_TOKENS)]
+        with self._lock:
+            session = self.store.get(session_id, touch=False)
+            if session is None:
+                return False
+            conversation = session.get('conversation') or empty_conversation()
+            conversation = {**conversation, "turns": conversation["turns"] + [turn]}
+            if not self.store.update(session_id, {'conversation': conversation}):
+                return False
+            fold = over_budget(conversation) and session_id not in self._folding
+            if fold:
+                self._folding.add(session_id)
+        if fold:
+            self._executor.submit(self._fold, session_id)
+        return True
+
+    def _fold(self, session_id):
+        try:
+            session = self.store.get(session_id, touch=False)
+            if session is None:
+                return
+            conversation = session.get('conversation') or empty_conversation()
+            old = conversation["turns"][:-CONVERSATION_KEEP_TURNS] if CONVERSATION_KEEP_TURNS else conversation["turns"]
+            if not old:
+                return
+
+            try:
+                summary = self.summarize(conversation["summary"], old)
+                SUMMARIES.inc(outcome="ok")
+            except Exception as e:
+                print(f"Conversation summary error: {e}")
+                summary = fallback_summary(conversation["summary"], old)
+                SUMMARIES.inc(outcome="fallback")
+            summary = clip(summary, CONVERSATION_SUMMARY_TOKENS)
+
+            with self._lock:
+                session = self.store.get(session_id, touch=False)
+                if session is None:
+                    return
+                current = session.get('conversation') or empty_conversation()
+                # Turns added while the summary was written are kept
+                if current["turns"][:len(old)] != old:
+                    return
+                self.store.update(session_id, {'conversation': {
+                    "summary": summary,
+                    "turns": current["turns"][len(old):]
+                }})
+        except Exception as e:
+            print(f"Conversation memory error: {e}")
+        finally:
+            with self._lock:
+                self._folding.discard(session_id)
+
+    def stats(self, session_info):
+        """Turn and token counts of a session's conversation"""
+        conversation = session_info.get('conversation') or empty_conversation()
+        return {
+            "turns": len(conversation["turns"]),
+            "summarized": bool(conversation["summary"]),
+            "history_tokens": estimate_tokens(conversation["summary"]) + turns_tokens(conversation["turns"])
+        }
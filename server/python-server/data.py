@@ -64,7 +64,6 @@ SYMPTOM_SPECIALIZATION_MAP = {
     'weight gain': 'Endocrinology',
     'weight loss': 'Endocrinology',
     'excessive thirst': 'Endocrinology',
-    'frequent urination': 'Endocrinology',
     'sweating': 'Endocrinology',
     'heat intolerance': 'Endocrinology',
 
@@ -95,6 +94,7 @@ SYMPTOM_SPECIALIZATION_MAP = {
     'painful urination': 'Urology',
     'blood in urine': 'Urology',
     'urinary incontinence': 'Urology',
+    # Also an Endocrinology symptom (diabetes); see SPECIALIZATION_PHRASE_WEIGHTS
     'frequent urination': 'Urology',
     'difficulty urinating': 'Urology',
 
@@ -172,4 +172,80 @@ SYMPTOM_KEYWORDS = [
     'experiencing', 'feeling', 'having', 'suffering from', 'showing symptoms of',
     'dealing with', 'complaining of', 'symptoms', 'signs', 'issues',
     'problem', 'trouble', 'unwell', 'sick', 'not feeling well'
-]
\ No newline at end of file
+]
+
+
+# Keywords that mean the user wants to upload a report
+UPLOAD_KEYWORDS = ['upload', 'pdf', 'report', 'lab report', 'test results', 'file']
+
+
+# Weighted, multi-label phrases for the specialization scorer. Every phrase in
+# SYMPTOM_SPECIALIZATION_MAP counts 1.0 towards its specialization; the entries
+# below replace that for phrases that point to more than one specialist or are
+# weaker evidence, and add common phrasings the map does not have.
+SPECIALIZATION_PHRASE_WEIGHTS = {
+    # Symptoms shared between specializations
+    'chest pain': {'Cardiology': 1.0, 'Pulmonology': 0.3, 'Gastroenterology': 0.2},
+    'shortness of breath': {'Cardiology': 1.0, 'Pulmonology': 1.0},
+    'difficulty breathing': {'Pulmonology': 1.0, 'Cardiology': 0.6},
+    'dizziness': {'Neurology': 1.0, 'ENT': 0.4, 'Cardiology': 0.3},
+    'vision problems': {'Ophthalmology': 1.0, 'Neurology': 0.6},
+    'blurred vision': {'Ophthalmology': 1.0, 'Neurology': 0.3, 'Endocrinology': 0.2},
+    'frequent urination': {'Urology': 1.0, 'Endocrinology': 0.7},
+    'chronic cough': {'Pulmonology': 1.0, 'ENT': 0.3},
+    'hair loss': {'Dermatology': 1.0, 'Endocrinology': 0.4},
+    'pelvic pain': {'Gynecology': 1.0, 'Urology': 0.4},
+    'rashes in child': {'Pediatrics': 1.0, 'Dermatology': 0.5},
+    'fever in child': {'Pediatrics': 1.5},
+    'sweating': {'Endocrinology': 0.5, 'Cardiology': 0.3},
+
+    # Non-specific symptoms: weak evidence on their own
+    'fatigue': {'Endocrinology': 0.5},
+    'weight gain': {'Endocrinology': 0.8},
+    'weight loss': {'Endocrinology': 0.8, 'Gastroenterology': 0.3},
+    'nausea': {'Gastroenterology': 0.8},
+    'itching': {'Dermatology': 0.8},
+    'insomnia': {'Psychiatry': 0.8},
+
+    # Common phrasings
+    'palpitations': {'Cardiology': 1.0},
+    'breathlessness': {'Pulmonology': 0.8, 'Cardiology': 0.8},
+    'cough': {'Pulmonology': 0.6, 'ENT': 0.3},
+    'rash': {'Dermatology': 0.8},
+    'abdominal pain': {'Gastroenterology': 1.0, 'Gynecology': 0.2},
+    'stomach ache': {'Gastroenterology': 1.0},
+    'acidity': {'Gastroenterology': 0.8},
+    'heartburn': {'Gastroenterology': 1.0, 'Cardiology': 0.2},
+    'indigestion': {'Gastroenterology': 0.8},
+    'neck pain': {'Orthopedics': 0.8},
+    'vertigo': {'ENT': 0.8, 'Neurology': 0.6},
+    'fainting': {'Cardiology': 0.6, 'Neurology': 0.6},
+    'ringing in ears': {'ENT': 1.0},
+    'blocked nose': {'ENT': 0.8},
+    'sneezing': {'ENT': 0.6},
+    'difficulty swallowing': {'ENT': 0.8, 'Gastroenterology': 0.5},
+    'itchy eyes': {'Ophthalmology': 0.8},
+    'burning while urinating': {'Urology': 1.0},
+    'missed period': {'Gynecology': 1.0},
+    'feeling sad': {'Psychiatry': 0.8},
+    'stress': {'Psychiatry': 0.5},
+    'child': {'Pediatrics': 0.8},
+    'baby': {'Pediatrics': 0.8},
+    'infant': {'Pediatrics': 0.8},
+    'toddler': {'Pediatrics': 0.8},
+}
+
+# Words that negate the symptoms following them ("no chest pain", "denies
+# fever"), NegEx style. Apostrophes split words, so "don't" is "don t".
+NEGATION_CUES = [
+    'no', 'not', 'without', 'never', 'denies', 'denied', 'deny', 'negative for',
+    'free of', 'absence of', 'no sign of', 'no signs of', 'ruled out',
+    'don t', 'dont', 'doesn t', 'doesnt', 'didn t', 'didnt',
+    'haven t', 'havent', 'hasn t', 'hasnt', 'isn t', 'aren t', 'wasn t',
+]
+
+# Words that end a negation's scope: "no fever but a bad headache"
+NEGATION_SCOPE_BREAKS = [
+    'but', 'however', 'although', 'though', 'except', 'yet', 'apart', 'besides',
+    'instead', 'still', 'aside', 'only', 'just',
+]
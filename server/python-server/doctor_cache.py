@@ -0,0 +1,211 @@
+import os
+import time
+import threading
+from connection import (
+    fetch_all_doctors,
+    fetch_doctors_by_specializations,
+    listen,
+    run_async,
+    run_background,
+    run_sync,
+)
+
+# Doctor directory cache configuration
+DOCTOR_CACHE_TTL_SECONDS = float(os.getenv("DOCTOR_CACHE_TTL_SECONDS", "300"))
+# After a failed refresh, wait this long (doubling per failure, up to the TTL) before the next
+DOCTOR_CACHE_RETRY_SECONDS = float(os.getenv("DOCTOR_CACHE_RETRY_SECONDS", "5"))
+DOCTOR_CACHE_LISTEN = os.getenv("DOCTOR_CACHE_LISTEN", "false").lower() == "true"
+DOCTOR_CHANGE_CHANNEL = "doctor_changed"
+
+# normalized specialization -> doctors, best rated first. Replaced wholesale on
+# refresh so readers never see a half-built index.
+_index = None
+_loaded_at = 0.0
+_attempted_at = 0.0
+_failures = 0  # refreshes failed in a row
+_refreshing = False
+_listener = None
+_lock = threading.Lock()
+
+_stats = {
+    "hits": 0,
+    "misses": 0,
+    "refreshes": 0,
+    "refresh_errors": 0,
+    "invalidations": 0,
+    "last_refresh_ms": 0.0,
+    "total_refresh_ms": 0.0,
+}
+
+
+def normalize_specialization(specialization):
+    """Normalize a specialization name for use as a cache key"""
+    return specialization.strip().lower()
+
+
+def ranking_key(doc):
+    """Best first, as in SQL: rating descending with missing ratings last,
+    then number of patients descending"""
+    rating = doc.get('rating')
+    return (rating is None, -(rating or 0), -(doc.get('noOfPatients') or 0))
+
+
+def build_index(doctors):
+    """Group doctors by normalized specialization, each group ranked best first"""
+    index = {}
+    seen = set()
+    for doc in doctors:
+        for spec in doc.get('Specialization') or []:
+            key = normalize_specialization(spec)
+            # A doctor listing both "Cardiology" and "cardiology" appears once
+            if (key, doc['id']) in seen:
+                continue
+            seen.add((key, doc['id']))
+            index.setdefault(key, []).append(doc)
+    for bucket in index.values():
+        bucket.sort(key=ranking_key)
+    return index
+
+
+async def _refresh():
+    """Reload the whole directory and swap in the new index (runs on the DB loop)"""
+    global _index, _loaded_at, _failures, _refreshing
+    start = time.perf_counter()
+    try:
+        index = build_index(await fetch_all_doctors())
+        with _lock:
+            _index = index
+            _loaded_at = time.monotonic()
+            _failures = 0
+            _stats["refreshes"] += 1
+    except Exception as e:
+        print(f"Doctor cache refresh failed: {e}")
+        with _lock:
+            _failures += 1
+            _stats["refresh_errors"] += 1
+    finally:
+        duration_ms = (time.perf_counter() - start) * 1000
+        with _lock:
+            _refreshing = False
+            _stats["last_refresh_ms"] = duration_ms
+            _stats["total_refresh_ms"] += duration_ms
+
+    if DOCTOR_CACHE_LISTEN:
+        await _ensure_listener()
+
+
+async def _ensure_listener():
+    """Subscribe to "Doctor" change notifications if not already listening"""
+    global _listener
+    if _listener is not None and not _listener.is_closed():
+        return
+    try:
+        _listener = await listen(DOCTOR_CHANGE_CHANNEL, _on_doctor_changed)
+    except Exception as e:
+        _listener = None
+        print(f"Doctor cache listener failed: {e}")
+
+
+def _on_doctor_changed(payload):
+    """NOTIFY handler: treat the index as expired and reload it"""
+    global _loaded_at
+    with _lock:
+        _loaded_at = 0.0
+        _stats["invalidations"] += 1
+    schedule_refresh()
+
+
+def schedule_refresh():
+    """Start a background refresh unless one is already running"""
+    global _refreshing, _attempted_at
+    with _lock:
+        if _refreshing:
+            return
+        _refreshing = True
+        _attempted_at = time.monotonic()
+    run_background(_refresh())
+
+
+def _retry_delay():
+    """Seconds to wait after the last refresh attempt (caller holds the lock)"""
+    if not _failures:
+        return 0.0
+    return min(DOCTOR_CACHE_RETRY_SECONDS * 2 ** (_failures - 1), max(DOCTOR_CACHE_TTL_SECONDS, DOCTOR_CACHE_RETRY_SECONDS))
+
+
+def _refresh_due(now):
+    """Whether a lookup should start a refresh: the index is missing or
+    past its TTL, and the database is not backing off after failures"""
+    with _lock:
+        if now - _attempted_at < _retry_delay():
+            return False
+        return _index is None or now - _loaded_at > DOCTOR_CACHE_TTL_SECONDS
+
+
+def load(doctors):
+    """Install a directory snapshot directly (warm-up, benchmarks)"""
+    global _index, _loaded_at
+    index = build_index(doctors)
+    with _lock:
+        _index = index
+        _loaded_at = time.monotonic()
+
+
+def invalidate():
+    """Mark the cached directory as stale; the next lookup triggers a reload"""
+    global _loaded_at
+    with _lock:
+        _loaded_at = 0.0
+        _stats["invalidations"] += 1
+
+
+def _lookup_many(specializations, limit):
+    """Serve several lookups from one read of the index, or None when cold"""
+    index = _index
+    if _refresh_due(time.monotonic()):
+        schedule_refresh()
+    if index is None:
+        with _lock:
+            _stats["misses"] += 1
+        return None
+
+    with _lock:
+        _stats["hits"] += 1
+    return {spec: index.get(normalize_specialization(spec), [])[:limit] for spec in specializations}
+
+
+def get_doctors_many(specializations, limit=10, timeout=None):
+    """Up to `limit` doctors for each specialization, best rated first:
+    {spec: doctors}.
+
+    Lookups are served from the in-memory index. When it is older than the TTL
+    the stale copy is still returned while a refresh runs in the background;
+    only a cold cache falls through to SQL, one query for all of them.
+    """
+    specializations = list(dict.fromkeys(specializations))
+    doctors = _lookup_many(specializations, limit)
+    if doctors is None:
+        doctors = run_sync(fetch_doctors_by_specializations(specializations, limit), timeout)
+    return doctors
+
+
+async def get_doctors_many_async(specializations, limit=10):
+    """Same as get_doctors_many(), for callers running on an event loop"""
+    specializations = list(dict.fromkeys(specializations))
+    doctors = _lookup_many(specializations, limit)
+    if doctors is None:
+        doctors = await run_async(fetch_doctors_by_specializations(specializations, limit))
+    return doctors
+
+
+def cache_stats():
+    """Snapshot of the cache counters"""
+    with _lock:
+        stats = dict(_stats)
+        index = _index
+        age = time.monotonic() - _loaded_at if index is not None else None
+    stats["specializations"] = len(index) if index is not None else 0
+    stats["age_seconds"] = age
+    stats["failures"] = _failures
+    stats["listening"] = _listener is not None and not _listener.is_closed()
+    return stats
@@ -0,0 +1,135 @@
+import os
+import threading
+from collections import OrderedDict
+
+from session_store import field_size
+
+# Extraction cache configuration
+EXTRACTION_CACHE_MAX_BYTES = int(os.getenv("EXTRACTION_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+EXTRACTION_CACHE_MAX_ENTRIES = int(os.getenv("EXTRACTION_CACHE_MAX_ENTRIES", "256"))
+
+_entries = OrderedDict()  # digest -> {'fields', 'size', 'refs'}, least recently used first
+_session_refs = {}        # session_id -> digest
+_in_flight = {}           # digest -> Event while the first upload is being extracted
+_bytes = 0
+_lock = threading.Lock()
+
+_stats = {
+    "hits": 0,
+    "misses": 0,
+    "waits": 0,
+    "evictions": 0,
+}
+
+
+def _acquire(entry, digest, session_id):
+    """Record that a session uses an entry (caller holds the lock)"""
+    if session_id is not None:
+        entry['refs'].add(session_id)
+        _session_refs[session_id] = digest
+
+
+def _evict():
+    """Drop least recently used unreferenced entries while over the limits
+    (caller holds the lock). Entries still used by a session stay: their
+    memory is held by the sessions anyway."""
+    global _bytes
+    for digest in list(_entries):
+        if _bytes <= EXTRACTION_CACHE_MAX_BYTES and len(_entries) <= EXTRACTION_CACHE_MAX_ENTRIES:
+            break
+        entry = _entries[digest]
+        if not entry['refs']:
+            del _entries[digest]
+            _bytes -= entry['size']
+            _stats["evictions"] += 1
+
+
+def get(digest, session_id=None):
+    """Cached extraction fields for this content, or None. With a
+    session_id, the session's reference is taken in the same step, so the
+    entry cannot be evicted before it is pinned.
+
+    Misses are counted by get_or_create, which runs the extraction.
+    """
+    with _lock:
+        entry = _entries.get(digest)
+        if entry is None:
+            return None
+        _entries.move_to_end(digest)
+        _stats["hits"] += 1
+        _acquire(entry, digest, session_id)
+        return entry['fields']
+
+
+def get_or_create(digest, create, session_id=None):
+    """Cached fields for this content, running create() on a miss. A
+    session_id is recorded as a reference as the fields are handed out,
+    and a new entry is created already holding it.
+
+    Concurrent uploads of the same file wait for the first one's extraction
+    instead of repeating it. The fields include 'content_size', their size
+    as measured once here (see session_store.field_size), which stores can
+    use instead of measuring the content again.
+    """
+    global _bytes
+    while True:
+        with _lock:
+            entry = _entries.get(digest)
+            if entry is not None:
+                _entries.move_to_end(digest)
+                _stats["hits"] += 1
+                _acquire(entry, digest, session_id)
+                return entry['fields']
+            pending = _in_flight.get(digest)
+            if pending is None:
+                pending = _in_flight[digest] = threading.Event()
+                _stats["misses"] += 1
+                break
+            _stats["waits"] += 1
+        # Someone else is extracting this file; use their result (or retry if it failed)
+        pending.wait()
+
+    try:
+        fields = create()
+        size = sum(field_size(value) for value in fields.values())
+        fields = {**fields, 'content_size': size}
+        with _lock:
+            entry = _entries[digest] = {'fields': fields, 'size': size, 'refs': set()}
+            _acquire(entry, digest, session_id)
+            _bytes += size
+            _evict()
+        return fields
+    finally:
+        with _lock:
+            _in_flight.pop(digest, None)
+        pending.set()
+
+
+def release(session_id):
+    """Drop a session's reference; unreferenced content becomes evictable"""
+    with _lock:
+        digest = _session_refs.pop(session_id, None)
+        entry = _entries.get(digest)
+        if entry is not None:
+            entry['refs'].discard(session_id)
+            _evict()
+
+
+def clear():
+    global _bytes
+    with _lock:
+        _entries.clear()
+        _session_refs.clear()
+        _bytes = 0
+
+
+def cache_stats():
+    """Snapshot of the cache counters"""
+    with _lock:
+        stats = dict(_stats)
+        stats["entries"] = len(_entries)
+        stats["bytes"] = _bytes
+        stats["max_bytes"] = EXTRACTION_CACHE_MAX_BYTES
+        stats["referenced_entries"] = sum(1 for entry in _entries.values() if entry['refs'])
+        stats["sessions"] = len(_session_refs)
+    return stats
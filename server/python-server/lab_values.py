@@ -0,0 +1,232 @@
+import re
+from collections import Counter
+
+# Allows both 250,000 and the Indian 2,50,000 grouping
+NUMBER = r"\d+(?:,\d{2,3})*(?:\.\d+)?"
+
+# "<name> <value> [flag] [unit] [<low> - <high> | < limit | > limit] [flag]"
+LINE_PATTERN = re.compile(rf"""
+    ^(?P<name>[A-Za-z][A-Za-z0-9 ()/%.,'+\-]*?)\s*:?\s+
+    (?P<result>[<>]?\s?{NUMBER})\s*
+    (?P<flag1>(?:H|L|High|Low)\b)?\s*
+    (?P<unit>(?:[A-Za-zµμ%][^\s]*|/[A-Za-z][^\s]*|10\^\S+))?\s*
+    (?P<range>{NUMBER}\s*(?:-|–|to)\s*{NUMBER}|(?:[<>]=?|up\ to|upto)\s*{NUMBER})?\s*
+    (?P<flag>(?:H|L|High|Low|Abnormal)\b)?\s*$
+""", re.VERBOSE | re.IGNORECASE)
+
+RANGE_PATTERN = re.compile(rf"""
+    (?P<low>{NUMBER})\s*(?:-|–|to)\s*(?P<high>{NUMBER})
+    |(?P<cmp>[<>]=?|up\ to|upto)\s*(?P<limit>{NUMBER})
+""", re.VERBOSE | re.IGNORECASE)
+
+VALUE_PATTERN = re.compile(NUMBER)
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Lines that look like "<label> <number>" but are not test results
+SKIP_FIRST_WORDS = {
+    'page', 'age', 'date', 'time', 'sample', 'patient', 'report', 'ref', 'phone',
+    'mobile', 'id', 'uhid', 'reg', 'registration', 'lab', 'bill', 'collected',
+    'received', 'reported', 'printed', 'pin', 'order',
+}
+
+# Table headers, matched against lowercased header cells
+HEADER_KEYWORDS = {
+    'name': ('test', 'investigation', 'parameter', 'analyte', 'description'),
+    'result': ('result', 'value', 'observed'),
+    'unit': ('unit',),
+    'range': ('reference', 'range', 'normal', 'interval', 'bio'),
+}
+
+# Spelling variants and abbreviations, so "hb" or "sugar" find the right test
+ALIASES = {
+    'haemoglobin': 'hemoglobin', 'hb': 'hemoglobin', 'hgb': 'hemoglobin',
+    'sugar': 'glucose', 'leukocyte': 'leucocyte', 'leukocytes': 'leucocyte',
+    'leucocytes': 'leucocyte', 'wbc': 'leucocyte', 'tlc': 'leucocyte',
+    'platelets': 'platelet', 'plt': 'platelet', 'sgpt': 'alt', 'sgot': 'ast',
+    'thyroid': 'tsh', 'vit': 'vitamin', 'a1c': 'hba1c',
+}
+
+# Words in a question that say nothing about which test is meant
+QUERY_STOP_WORDS = {
+    'what', 'whats', 'is', 'are', 'my', 'the', 'a', 'of', 'in', 'level', 'levels',
+    'value', 'values', 'result', 'results', 'show', 'me', 'tell', 'about', 'how',
+    'much', 'test', 'report',
+}
+
+COLUMNS = ('name', 'result', 'value', 'unit', 'low', 'high', 'flag', 'key')
+
+
+def _number(text):
+    match = VALUE_PATTERN.search(text or "")
+    return float(match.group().replace(",", "")) if match else None
+
+
+def _key_words(text):
+    return [ALIASES.get(word, word) for word in WORD_PATTERN.findall(text.lower())]
+
+
+def _parse_range(text):
+    """'13.0 - 17.0' -> (13.0, 17.0); '< 200' -> (None, 200.0)"""
+    match = RANGE_PATTERN.search(text or "")
+    if not match:
+        return None, None
+    if match.group('low'):
+        return _number(match.group('low')), _number(match.group('high'))
+    limit = _number(match.group('limit'))
+    return (limit, None) if match.group('cmp').startswith('>') else (None, limit)
+
+
+def _flag(value, low, high, printed_flag):
+    """'H'/'L' from the reference range, else the flag printed on the report"""
+    if value is not None and (low is not None or high is not None):
+        if low is not None and value < low:
+            return 'L'
+        if high is not None and value > high:
+            return 'H'
+        return None
+    if printed_flag:
+        return printed_flag[0].upper() if printed_flag[0] in 'HhLl' else 'A'
+    return None
+
+
+def _row(name, result, unit, range_text, printed_flag):
+    name = " ".join(name.split()).strip(" :-")
+    if not name or name.split()[0].lower() in SKIP_FIRST_WORDS:
+        return None
+    value = _number(result)
+    if value is None:
+        return None
+    low, high = _parse_range(range_text)
+    return {
+        'name': name,
+        'result': result.strip(),
+        'value': value,
+        'unit': (unit or "").strip() or None,
+        'low': low,
+        'high': high,
+        'flag': _flag(value, low, high, printed_flag),
+        'key': " ".join(_key_words(name)),
+    }
+
+
+def parse_line(line):
+    """Parse one 'Hemoglobin 13.5 g/dL 13.0 - 17.0' style line, or None"""
+    match = LINE_PATTERN.match(line.strip())
+    if not match or not (match.group('unit') or match.group('range')):
+        return None
+    return _row(match.group('name'), match.group('result'), match.group('unit'),
+                match.group('range'), match.group('flag') or match.group('flag1'))
+
+
+def _header_columns(row):
+    """Map of field -> column index if this row is a table header"""
+    columns = {}
+    for index, cell in enumerate(row):
+        cell = (cell or "").lower()
+        for field, keywords in HEADER_KEYWORDS.items():
+            if field not in columns and any(keyword in cell for keyword in keywords):
+                columns[field] = index
+                break
+    return columns if 'name' in columns and 'result' in columns else None
+
+
+def _cell(row, index):
+    if index is None or index >= len(row):
+        return ""
+    return row[index] or ""
+
+
+def parse_table(table):
+    """Rows from a pdfplumber table, using its header when it has one"""
+    rows = []
+    columns = None
+    for cells in table:
+        if columns is None:
+            columns = _header_columns(cells)
+            if columns is not None:
+                continue
+
+        if columns is not None:
+            result = _cell(cells, columns['result'])
+            row = _row(_cell(cells, columns['name']), result, _cell(cells, columns.get('unit')),
+                       _cell(cells, columns.get('range')), None)
+            if row is None:
+                # Some reports put value and unit in one cell
+                row = parse_line(" ".join(cell for cell in cells if cell))
+        else:
+            row = parse_line(" ".join(cell for cell in cells if cell))
+        if row is not None:
+            rows.append(row)
+    return rows
+
+
+def parse_lab_values(text, tables=()):
+    """Parse every recognizable test result into a columnar dict.
+
+    Table rows come first (they keep their columns); text lines add tests
+    the tables missed. The page text repeats every table row, so each text
+    row cancels one identical table row instead of being added twice. The
+    result is {column: [values...]} with one entry per test for each of
+    COLUMNS.
+    """
+    columns = {column: [] for column in COLUMNS}
+
+    def add(row):
+        for column in COLUMNS:
+            columns[column].append(row[column])
+
+    from_tables = Counter()
+    for table in tables:
+        for row in parse_table(table):
+            add(row)
+            from_tables[(row['key'], row['result'])] += 1
+
+    for line in text.splitlines():
+        row = parse_line(line)
+        if row is None:
+            continue
+        identity = (row['key'], row['result'])
+        if from_tables[identity]:
+            from_tables[identity] -= 1
+        else:
+            add(row)
+    return columns
+
+
+def _matches(query_words, key_words):
+    return all(any(word == key or (len(word) >= 3 and key.startswith(word)) for key in key_words)
+               for word in query_words)
+
+
+def lookup(columns, query=None, flagged_only=False):
+    """Rows whose test name matches every content word of the query"""
+    query_words = [word for word in _key_words(query or "") if word not in QUERY_STOP_WORDS]
+    rows = []
+    for index, key in enumerate(columns['key']):
+        if flagged_only and not columns['flag'][index]:
+            continue
+        if query_words and not _matches(query_words, key.split()):
+            continue
+        rows.append({column: columns[column][index] for column in COLUMNS if column != 'key'})
+    return rows
+
+
+def _range_text(low, high):
+    if low is not None and high is not None:
+        return f"{low:g}-{high:g}"
+    if low is not None:
+        return f"> {low:g}"
+    if high is not None:
+        return f"< {high:g}"
+    return None
+
+
+def flagged_text(columns):
+    """Flagged results as prompt lines, e.g. Hemoglobin: 10.2 g/dL (12-15.5) L"""
+    lines = []
+    for row in lookup(columns, flagged_only=True):
+        unit = f" {row['unit']}" if row['unit'] else ""
+        range_text = _range_text(row['low'], row['high'])
+        reference = f" ({range_text})" if range_text else ""
+        lines.append(f"{row['name']}: {row['result']}{unit}{reference} {row['flag']}")
+    return "\n".join(lines)
@@ -0,0 +1,108 @@
+import os
+import threading
+
+DEFAULT_MODEL_ID = "gemini-1.5-flash"
+
+
+class LazyAgent:
+    """An agent configuration; every run() gets a new phi Agent built from it.
+
+    phi's Agent is stateful: each run is appended to its memory and the run
+    in progress lives on the Agent itself (run_id, run_response, which is
+    mutated and yielded for every streamed chunk). One Agent shared by all
+    requests would grow without bound and let concurrent streams read each
+    other's chunks. So LazyAgent only keeps the options, which never change,
+    and the Gemini client built from them; the Agent of a run is cheap to
+    build and goes away with the run.
+
+    The client is built on first use: importing phi and the Gemini client
+    takes about half a second, which every cold start would otherwise pay
+    before serving its first request (and requests that never reach the
+    model, like /upload or /session, would pay it for nothing).
+
+    with_web_search() returns a twin of the agent that also has the web
+    search tools, with_cached_content() one that answers on top of a context
+    cached with the model; `plain` points back from a twin to the original.
+    """
+
+    def __init__(self, description, instructions, model_id=DEFAULT_MODEL_ID, web_search=False, markdown=True,
+                 cached_content=None):
+        self._options = {
+            "description": description,
+            "instructions": instructions,
+            "model_id": model_id,
+            "web_search": web_search,
+            "markdown": markdown,
+            "cached_content": cached_content,
+        }
+        self._client = None
+        self._twin = None
+        self._lock = threading.Lock()
+        self.plain = self
+
+    @property
+    def built(self):
+        return self._client is not None
+
+    def client(self):
+        """The Gemini client shared by every run, built (once) on the first call"""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._build_client(**self._options)
+        return self._client
+
+    def get(self):
+        """A new Agent for one run"""
+        return self._build(client=self.client(), **self._options)
+
+    def with_web_search(self):
+        """This agent with the (cached) web search tools enabled"""
+        if self._options["web_search"]:
+            return self
+        with self._lock:
+            if self._twin is None:
+                self._twin = LazyAgent(**{**self._options, "web_search": True})
+                self._twin.plain = self
+        return self._twin
+
+    def with_cached_content(self, name, model_id):
+        """A twin of this agent whose requests extend the cached content
+        `name` (see context_cache). model_id is the version the cache was
+        created for. Not cached here: the caller keeps the twins it needs."""
+        twin = LazyAgent(**{**self._options, "model_id": model_id, "web_search": False, "cached_content": name})
+        twin.plain = self.plain
+        return twin
+
+    @staticmethod
+    def _build_client(description, instructions, model_id, web_search, markdown, cached_content):
+        # phi's Gemini calls genai.configure() and makes a new client (and
+        # connection) on every request unless it is given one
+        import google.generativeai as genai
+        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+        if cached_content:
+            # Requests on cached content may not add tools or a system instruction;
+            # phi sends the agent's instructions as an ordinary turn, which is allowed
+            return genai.GenerativeModel.from_cached_content(cached_content)
+
+        # The tool declarations are part of the client; phi adds them when a run starts
+        template = LazyAgent._build(description, instructions, model_id, web_search, markdown, cached_content)
+        template.update_model()
+        return genai.GenerativeModel(model_name=model_id, **template.model.request_kwargs)
+
+    @staticmethod
+    def _build(description, instructions, model_id, web_search, markdown, cached_content, client=None):
+        from phi.agent import Agent
+        from phi.model.google import Gemini
+        from search_tools import SEARCH_TOOLS
+
+        return Agent(
+            model=Gemini(id=model_id, client=client),
+            tools=list(SEARCH_TOOLS) if web_search else [],
+            description=description,
+            instructions=instructions,
+            markdown=markdown
+        )
+
+    def run(self, *args, **kwargs):
+        return self.get().run(*args, **kwargs)
@@ -0,0 +1,349 @@
+import os
+import random
+import threading
+import time
+
+# LLM gateway configuration
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))  # generations running at once
+LLM_RATE_PER_SECOND = float(os.getenv("LLM_RATE_PER_SECOND", "5"))  # 0 disables rate limiting
+LLM_RATE_BURST = int(os.getenv("LLM_RATE_BURST", "10"))
+LLM_ACQUIRE_TIMEOUT = float(os.getenv("LLM_ACQUIRE_TIMEOUT", "30"))  # max wait for a slot
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5"))
+LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", "8"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))  # consecutive, to open
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+LLM_COALESCE = os.getenv("LLM_COALESCE", "true").lower() == "true"
+
+# Upstream errors worth retrying: rate limits, overload and timeouts
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+TRANSIENT_HINTS = (
+    '429', 'rate limit', 'resource exhausted', 'resource has been exhausted',
+    'quota', 'unavailable', 'overloaded', 'deadline exceeded', 'timed out',
+)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+_END = object()
+
+
+class LLMUnavailable(Exception):
+    """The gateway refused to start a generation (busy or circuit open)"""
+
+
+class GatewayBusy(LLMUnavailable):
+    pass
+
+
+class CircuitOpen(LLMUnavailable):
+    pass
+
+
+def is_transient(error):
+    """Whether an upstream error is likely to go away on retry"""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    code = getattr(error, 'code', None)
+    if not isinstance(code, int):
+        code = getattr(error, 'status_code', None)
+    if isinstance(code, int) and code in TRANSIENT_STATUS_CODES:
+        return True
+    message = str(error).lower()
+    return any(hint in message for hint in TRANSIENT_HINTS)
+
+
+def backoff_seconds(attempt, base=LLM_RETRY_BASE_SECONDS, cap=LLM_RETRY_MAX_SECONDS):
+    """Exponential backoff with full jitter for the given retry (1, 2, ...)"""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average, `burst` at once.
+
+    Callers reserve a token straight away (the bucket may go into debt) and
+    sleep until it is due, so waiters are served in arrival order.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout=None):
+        """Take a token, waiting for it if needed; False if that would exceed timeout"""
+        if not self.rate:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            if timeout is not None and wait > timeout:
+                return False
+            self._tokens -= 1
+        if wait:
+            time.sleep(wait)
+        return True
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures and rejects calls
+    for `reset_seconds`; then lets one trial call through (half open) and
+    closes again if it succeeds."""
+
+    def __init__(self, failure_threshold, reset_seconds):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.reset_seconds:
+                    return False
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN:
+                if self._trial_running:
+                    return False
+                self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self._failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+
+    def release(self):
+        """A call that was allowed ended without an outcome (e.g. cancelled)"""
+        with self._lock:
+            self._trial_running = False
+
+
+class _Flight:
+    """One upstream generation, shared by every caller with the same key.
+
+    There is no producer thread: whichever subscriber needs a chunk that
+    has not arrived yet pulls it from upstream while the others wait, so
+    the generation keeps going as long as anyone is still reading.
+    """
+
+    def __init__(self, start):
+        self.start = start
+        self.upstream = None
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self.has_slot = False
+        self.admitted = False
+        self.pulling = threading.Lock()
+        self.changed = threading.Condition()
+
+
+class LLMGateway:
+    """Shared entry point for streamed model calls.
+
+    Every generation passes a circuit breaker, a token bucket and a
+    concurrency semaphore, in that order; when no slot frees up within
+    acquire_timeout the call fails with GatewayBusy instead of piling onto
+    the upstream. Transient errors (429s, 5xx, timeouts) are retried with
+    jittered exponential backoff, but only before the first chunk has been
+    sent. Callers passing the same key while a generation is in flight
+    share it instead of starting another one.
+    """
+
+    def __init__(self, max_concurrency=LLM_MAX_CONCURRENCY, rate_per_second=LLM_RATE_PER_SECOND,
+                 burst=LLM_RATE_BURST, acquire_timeout=LLM_ACQUIRE_TIMEOUT, max_retries=LLM_MAX_RETRIES,
+                 retry_base_seconds=LLM_RETRY_BASE_SECONDS, retry_max_seconds=LLM_RETRY_MAX_SECONDS,
+                 breaker_failures=LLM_BREAKER_FAILURES, breaker_reset_seconds=LLM_BREAKER_RESET_SECONDS,
+                 coalesce=LLM_COALESCE):
+        self.max_concurrency = max_concurrency
+        self.acquire_timeout = acquire_timeout
+        self.max_retries = max_retries
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.coalesce = coalesce
+        self.bucket = TokenBucket(rate_per_second, burst)
+        self.breaker = CircuitBreaker(breaker_failures, breaker_reset_seconds)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._flights = {}  # key -> _Flight still open to new subscribers
+        self._lock = threading.Lock()
+        self._stats = {
+            "started": 0,
+            "coalesced": 0,
+            "retries": 0,
+            "rejected_busy": 0,
+            "rejected_open": 0,
+            "failures": 0,
+            "running": 0,
+        }
+
+    def stream(self, start, key=None):
+        """Generator over the chunks of start() (a call returning phi's
+        streaming generator), run under the gateway's limits"""
+        with self._lock:
+            flight = self._flights.get(key) if key is not None and self.coalesce else None
+            if flight is None:
+                flight = _Flight(start)
+                if key is not None and self.coalesce:
+                    self._flights[key] = flight
+            else:
+                self._stats["coalesced"] += 1
+            flight.subscribers += 1
+        return self._follow(flight, key)
+
+    def _follow(self, flight, key):
+        index = 0
+        try:
+            while True:
+                chunk = self._chunk(flight, index, key)
+                if chunk is _END:
+                    return
+                yield chunk
+                index += 1
+        finally:
+            self._leave(flight, key)
+
+    def _chunk(self, flight, index, key):
+        """Chunk number `index` of the flight, _END when finished"""
+        while True:
+            with flight.changed:
+                if index < len(flight.chunks):
+                    return flight.chunks[index]
+                if flight.done:
+                    if flight.error is not None:
+                        raise flight.error
+                    return _END
+                if not flight.pulling.acquire(blocking=False):
+                    flight.changed.wait()
+                    continue
+            try:
+                chunk = self._pull(flight)
+                with flight.changed:
+                    if chunk is _END:
+                        flight.done = True
+                    else:
+                        flight.chunks.append(chunk)
+            except Exception as e:
+                with flight.changed:
+                    flight.done = True
+                    flight.error = e
+            finally:
+                flight.pulling.release()
+                with flight.changed:
+                    flight.changed.notify_all()
+            if flight.done:
+                self._finish(flight, key)
+
+    def _admit(self, flight):
+        if not self.breaker.allow():
+            with self._lock:
+                self._stats["rejected_open"] += 1
+            raise CircuitOpen("The model is failing; not sending new requests for now")
+        flight.admitted = True
+
+        deadline = time.monotonic() + self.acquire_timeout
+        if (not self.bucket.acquire(self.acquire_timeout)
+                or not self._slots.acquire(timeout=max(0.0, deadline - time.monotonic()))):
+            with self._lock:
+                self._stats["rejected_busy"] += 1
+            raise GatewayBusy("Too many model requests at the moment")
+        flight.has_slot = True
+        with self._lock:
+            self._stats["started"] += 1
+            self._stats["running"] += 1
+
+    def _pull(self, flight):
+        """Next chunk from upstream (starting and retrying it as needed)"""
+        if not flight.has_slot:
+            self._admit(flight)
+        attempt = 0
+        while True:
+            try:
+                if flight.upstream is None:
+                    flight.upstream = iter(flight.start())
+                return next(flight.upstream, _END)
+            except Exception as e:
+                if flight.chunks or attempt >= self.max_retries or not is_transient(e):
+                    raise
+                attempt += 1
+                with self._lock:
+                    self._stats["retries"] += 1
+                print(f"Model call failed ({e}), retry {attempt}/{self.max_retries}")
+                self._close_upstream(flight)
+                time.sleep(backoff_seconds(attempt, self.retry_base_seconds, self.retry_max_seconds))
+                self.bucket.acquire()
+
+    def _close_upstream(self, flight):
+        upstream, flight.upstream = flight.upstream, None
+        if upstream is not None and hasattr(upstream, 'close'):
+            try:
+                upstream.close()
+            except Exception as e:
+                print(f"Error closing model stream: {e}")
+
+    def _finish(self, flight, key):
+        """Record the outcome once and give back the slot"""
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            if not flight.admitted:
+                return
+            flight.admitted = False
+            if flight.has_slot:
+                flight.has_slot = False
+                self._stats["running"] -= 1
+                self._slots.release()
+            if flight.error is not None and not isinstance(flight.error, LLMUnavailable):
+                self._stats["failures"] += 1
+        self._close_upstream(flight)
+        if flight.error is None:
+            self.breaker.record_success()
+        elif not isinstance(flight.error, LLMUnavailable):
+            self.breaker.record_failure()
+        else:
+            self.breaker.release()
+
+    def _leave(self, flight, key):
+        with self._lock:
+            flight.subscribers -= 1
+            if flight.subscribers:
+                return
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        if not flight.done:
+            # Everyone stopped reading: stop the generation, no outcome to record
+            with self._lock:
+                if flight.has_slot:
+                    flight.has_slot = False
+                    self._stats["running"] -= 1
+                    self._slots.release()
+                admitted, flight.admitted = flight.admitted, False
+            self._close_upstream(flight)
+            if admitted:
+                self.breaker.release()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight_keys"] = len(self._flights)
+        stats["max_concurrency"] = self.max_concurrency
+        stats["circuit"] = self.breaker.state
+        return stats
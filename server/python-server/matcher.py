@@ -0,0 +1,140 @@
+import re
+from collections import deque
+from data import SYMPTOM_KEYWORDS, UPLOAD_KEYWORDS
+
+# Phrases are matched on whole words, so "gas" no longer fires inside "vegas"
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Kinds of phrases the shared matcher knows about
+UPLOAD = 'upload'
+SYMPTOM = 'symptom'
+
+
+def tokenize(text):
+    """Lowercase text and split it into word tokens"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class PhraseMatcher:
+    """Aho-Corasick automaton over word tokens.
+
+    Each phrase is a sequence of words; scanning the token stream once reports
+    every phrase occurrence, whatever the number of phrases.
+    """
+
+    def __init__(self, phrases):
+        # phrases: iterable of (phrase, payload)
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        self._vocabulary = set()
+        self._lengths = {}
+
+        for phrase, payload in phrases:
+            words = tokenize(phrase)
+            if not words:
+                continue
+            self._vocabulary.update(words)
+            self._lengths[phrase] = len(words)
+            state = 0
+            for word in words:
+                next_state = self._goto[state].get(word)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                    self._goto[state][word] = next_state
+                state = next_state
+            self._out[state].append((phrase, payload))
+
+        self._build_failure_links()
+
+    def _build_failure_links(self):
+        # Depth-1 states fail back to the root; deeper ones follow their
+        # parent's failure chain (breadth-first so parents are done first)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for word, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and word not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(word, 0)
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+
+    def find(self, tokens):
+        """Return (phrase, payload) for every phrase occurrence in tokens"""
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        vocabulary = self._vocabulary
+        hits = []
+        state = 0
+        for word in tokens:
+            # Words outside every phrase can only send us back to the root
+            if word not in vocabulary:
+                state = 0
+                continue
+            while state and word not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(word, 0)
+            if out[state]:
+                hits.extend(out[state])
+        return hits
+
+    def find_spans(self, tokens):
+        """Like find(), but return (start, end, phrase, payload) with the token
+        positions of each occurrence (end inclusive)"""
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        vocabulary = self._vocabulary
+        lengths = self._lengths
+        spans = []
+        state = 0
+        for position, word in enumerate(tokens):
+            if word not in vocabulary:
+                state = 0
+                continue
+            while state and word not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(word, 0)
+            for phrase, payload in out[state]:
+                spans.append((position - lengths[phrase] + 1, position, phrase, payload))
+        return spans
+
+
+def _phrases():
+    for keyword in UPLOAD_KEYWORDS:
+        yield keyword, (UPLOAD, keyword)
+    for keyword in SYMPTOM_KEYWORDS:
+        yield keyword, (SYMPTOM, keyword)
+
+
+# Built once at import from data.py and shared by every request
+MATCHER = PhraseMatcher(_phrases())
+
+
+def scan_text(text):
+    """Scan text once and return the distinct upload and symptom keywords it
+    contains.
+
+    Not cached: keyed on the whole text, a cache would keep request bodies
+    alive, and a short query scans in a few microseconds. Result is a dict
+    of frozensets:
+      upload_keywords, symptom_keywords
+    """
+    upload = set()
+    symptoms = set()
+    for _, (kind, value) in MATCHER.find(tokenize(text)):
+        if kind == UPLOAD:
+            upload.add(value)
+        else:
+            symptoms.add(value)
+
+    return {
+        'upload_keywords': frozenset(upload),
+        'symptom_keywords': frozenset(symptoms),
+    }
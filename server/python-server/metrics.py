@@ -0,0 +1,174 @@
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# Latency buckets in seconds, from sub-millisecond stages to long generations
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Size buckets in (estimated) tokens, for prompts and their parts
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 1500, 2000, 3000, 4000, 6000, 8000)
+
+_registry = []
+_lock = threading.Lock()
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+               for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with _lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}  # label values -> [bucket counts..., sum, count]
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with _lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with _lock:
+            for key, state in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, state):
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', bound)])} {count}")
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', '+Inf')])} {state[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {state[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {state[-1]}")
+        return lines
+
+
+class Gauge:
+    """A value read from a callback at scrape time (None skips it)"""
+
+    def __init__(self, name, documentation, read):
+        self.name = name
+        self.documentation = documentation
+        self.read = read
+        _registry.append(self)
+
+    def collect(self):
+        try:
+            value = self.read()
+        except Exception as e:
+            print(f"Metric {self.name} failed: {e}")
+            value = None
+        if value is None:
+            return []
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge",
+                f"{self.name} {value}"]
+
+
+REQUESTS = Counter("http_requests_total", "HTTP requests by route, method and status",
+                   ("endpoint", "method", "status"))
+REQUEST_SECONDS = Histogram("http_request_duration_seconds",
+                            "Time from request start to the end of the response body", ("endpoint",))
+STAGE_SECONDS = Histogram("stage_duration_seconds", "Time spent in each processing stage", ("stage",))
+LLM_FIRST_CHUNK_SECONDS = Histogram("llm_time_to_first_chunk_seconds",
+                                    "Time from starting a generation to its first text chunk", ("agent",))
+LLM_GENERATION_SECONDS = Histogram("llm_generation_seconds",
+                                   "Time from starting a generation to its end", ("agent", "outcome"))
+
+LLM_PROMPT_TOKENS = Histogram("llm_prompt_tokens", "Estimated tokens in each prompt sent to the model", ("agent",),
+                              buckets=TOKEN_BUCKETS)
+
+
+def observe_request(endpoint, method, status, seconds):
+    REQUESTS.inc(endpoint=endpoint, method=method, status=status)
+    REQUEST_SECONDS.observe(seconds, endpoint=endpoint)
+
+
+@contextmanager
+def span(stage):
+    """Time a block as one stage (also recorded when it raises)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+
+
+def timed(stage):
+    """Decorator form of span()"""
+    def decorate(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def time_generation(agent, upstream):
+    """Wrap a streaming generation to record time to first chunk and total.
+
+    The clock starts now, not at the first next(). Closing the wrapper
+    closes the upstream generation.
+    """
+    start = time.perf_counter()
+
+    def generate():
+        first = True
+        outcome = "error"
+        try:
+            for chunk in upstream:
+                if first:
+                    LLM_FIRST_CHUNK_SECONDS.observe(time.perf_counter() - start, agent=agent)
+                    first = False
+                yield chunk
+            outcome = "ok"
+        except GeneratorExit:
+            outcome = "cancelled"
+            raise
+        finally:
+            if hasattr(upstream, 'close'):
+                upstream.close()
+            LLM_GENERATION_SECONDS.observe(time.perf_counter() - start, agent=agent, outcome=outcome)
+
+    return generate()
+
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in list(_registry):
+        lines.extend(metric.collect())
+    return "\n".join(lines) + "\n"
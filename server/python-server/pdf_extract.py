@@ -0,0 +1,312 @@
+import atexit
+import io
+import mmap
+import multiprocessing
+import os
+import signal
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager, nullcontext
+
+import pdfplumber
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_c
+
+# PDF extraction configuration
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "4"))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "8"))
+PDF_PAGE_TIMEOUT = float(os.getenv("PDF_PAGE_TIMEOUT", "5"))
+PDF_TOTAL_TIMEOUT = float(os.getenv("PDF_TOTAL_TIMEOUT", "60"))
+# pdfplumber: layout-aware extraction for every page (original behaviour)
+# pdfium: pypdfium2's much faster text layer for every page
+# auto: pypdfium2 for text-only pages, pdfplumber for pages with tables/images
+PDF_EXTRACT_ENGINE = os.getenv("PDF_EXTRACT_ENGINE", "pdfplumber")
+
+ENGINES = ('pdfplumber', 'pdfium', 'auto')
+
+# PDFium is not thread-safe; every in-process call goes through this lock.
+# Worker processes are single-threaded and do not need it.
+_pdfium_lock = threading.Lock()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class PDFExtractionError(Exception):
+    pass
+
+
+class PageTimeout(Exception):
+    pass
+
+
+def _can_time_limit():
+    """Whether _time_limit can interrupt a page in this thread"""
+    return hasattr(signal, "SIGALRM") and threading.current_thread() is threading.main_thread()
+
+
+@contextmanager
+def _time_limit(seconds):
+    """Interrupt the block after `seconds` (main thread on POSIX only)"""
+    if not seconds or not _can_time_limit():
+        yield
+        return
+
+    def on_alarm(signum, frame):
+        raise PageTimeout(f"page took longer than {seconds}s")
+
+    previous = signal.signal(signal.SIGALRM, on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _is_text_only(page):
+    """True if the page has no drawn lines, boxes or images (so no tables)"""
+    for obj in page.get_objects():
+        if obj.type in (pdfium_c.FPDF_PAGEOBJ_PATH, pdfium_c.FPDF_PAGEOBJ_IMAGE,
+                        pdfium_c.FPDF_PAGEOBJ_SHADING):
+            return False
+    return True
+
+
+def _page_is_text_only(pdf_doc, page_number, lock):
+    with lock:
+        page = pdf_doc[page_number]
+        try:
+            return _is_text_only(page)
+        finally:
+            page.close()
+
+
+def _pdfium_text(pdf_doc, page_number, lock):
+    """Text of one page from pypdfium2's text layer"""
+    with lock:
+        page = pdf_doc[page_number]
+        try:
+            textpage = page.get_textpage()
+            try:
+                return textpage.get_text_range().replace("\r\n", "\n").strip()
+            finally:
+                textpage.close()
+        finally:
+            page.close()
+
+
+@contextmanager
+def _plumber_stream(source):
+    """What pdfplumber reads from: the PDF bytes, or a memory map of the file"""
+    if isinstance(source, (bytes, bytearray)):
+        yield io.BytesIO(source)
+        return
+    with open(source, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield data
+
+
+def _extract_pages(source, page_numbers, engine, page_timeout, deadline=None, lock=None,
+                   on_progress=None, tables=False):
+    """Extract the given 0-based pages -> list of (page_number, text, tables).
+
+    source is the PDF's bytes or the path of a file holding it; a file is
+    memory-mapped rather than read in. Every page's parsed objects are
+    dropped once it is done, so memory does not grow with the page count.
+
+    A page pdfplumber fails on, or that exceeds page_timeout, falls back to
+    pypdfium2's text layer. The per-page limit relies on SIGALRM, so it only
+    applies in the worker processes (or a main thread). on_progress is
+    called with the number of pages done after each page.
+
+    With tables=True, pdfplumber's tables are extracted from pages that have
+    ruling lines or boxes; text-only pages cannot hold a ruled table.
+    """
+    lock = lock or nullcontext()
+    with lock:
+        pdf_doc = pdfium.PdfDocument(source)
+    try:
+        results = []
+        with _plumber_stream(source) as stream:
+            pdf = pdfplumber.open(stream, pages=[n + 1 for n in page_numbers])
+            # Parse objects (images included) when a page needs them instead
+            # of keeping every object of the document once it has been read
+            pdf.doc.caching = False
+            plumber_pages = pdf.pages
+            for position, (page_number, plumber_page) in enumerate(zip(page_numbers, plumber_pages)):
+                if deadline is not None and time.monotonic() > deadline:
+                    raise PDFExtractionError(f"PDF extraction exceeded {PDF_TOTAL_TIMEOUT}s")
+
+                text_only = None
+                if engine == 'auto' or tables:
+                    text_only = _page_is_text_only(pdf_doc, page_number, lock)
+
+                text = None
+                if engine == 'pdfium' or (engine == 'auto' and text_only):
+                    text = _pdfium_text(pdf_doc, page_number, lock)
+                if text is None:
+                    try:
+                        with _time_limit(page_timeout):
+                            text = plumber_page.extract_text() or ""
+                    except Exception as e:
+                        print(f"pdfplumber failed on page {page_number + 1} ({e}), using pypdfium2")
+                        text = _pdfium_text(pdf_doc, page_number, lock)
+
+                page_tables = []
+                if tables and not text_only:
+                    try:
+                        with _time_limit(page_timeout):
+                            page_tables = plumber_page.extract_tables()
+                    except Exception as e:
+                        print(f"Table extraction failed on page {page_number + 1} ({e})")
+
+                # close() drops the page's layout objects; forgetting the page
+                # releases its content streams too
+                plumber_page.close()
+                plumber_pages[position] = plumber_page = None
+                results.append((page_number, text, page_tables))
+                if on_progress is not None:
+                    on_progress(len(results))
+            # Not pdf.close(): it parses every page again only to close it,
+            # and the stream is closed by _plumber_stream
+            pdf.flush_cache()
+        return results
+    finally:
+        with lock:
+            pdf_doc.close()
+
+
+def _page_count(source):
+    with _pdfium_lock:
+        pdf_doc = pdfium.PdfDocument(source)
+        try:
+            return len(pdf_doc)
+        finally:
+            pdf_doc.close()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: the server process runs threads (db loop, executors),
+            # which do not survive fork safely
+            _pool = ProcessPoolExecutor(max_workers=max(1, PDF_EXTRACT_WORKERS),
+                                        mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _reset_pool(wait=False):
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=wait, cancel_futures=True)
+            _pool = None
+
+
+def shutdown(wait=False):
+    """Stop the worker processes"""
+    _reset_pool(wait)
+
+
+atexit.register(shutdown)
+
+
+def _batches(page_count):
+    """Split pages into contiguous batches, at least one per worker"""
+    per_task = max(1, min(PDF_PAGES_PER_TASK, -(-page_count // max(1, PDF_EXTRACT_WORKERS))))
+    return [list(range(start, min(start + per_task, page_count)))
+            for start in range(0, page_count, per_task)]
+
+
+@contextmanager
+def _as_file(source):
+    """Path of a file holding the PDF (a temporary one for bytes)"""
+    if not isinstance(source, (bytes, bytearray)):
+        yield source
+        return
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as tmp:
+        tmp.write(source)
+        tmp.flush()
+        yield tmp.name
+
+
+def _extract_parallel(source, page_count, engine, deadline, on_progress=None, tables=False):
+    # Workers read the PDF from a file instead of receiving a pickled copy
+    # of the bytes with every batch
+    with _as_file(source) as path:
+        pool = _get_pool()
+        try:
+            pending = {pool.submit(_extract_pages, path, batch, engine, PDF_PAGE_TIMEOUT,
+                                   tables=tables)
+                       for batch in _batches(page_count)}
+            results = []
+            while pending:
+                done, pending = wait(pending, timeout=max(0, deadline - time.monotonic()),
+                                     return_when=FIRST_COMPLETED)
+                if not done:
+                    for future in pending:
+                        future.cancel()
+                    raise PDFExtractionError(f"PDF extraction exceeded {PDF_TOTAL_TIMEOUT}s")
+                for future in done:
+                    results.extend(future.result())
+                if on_progress is not None:
+                    on_progress(len(results))
+            return results
+        except BrokenProcessPool:
+            _reset_pool()
+            raise PDFExtractionError("PDF extraction worker crashed")
+
+
+def extract_document(source, engine=None, on_progress=None, tables=False):
+    """Extract the text of every page, in page order, and optionally tables.
+
+    source is the PDF's bytes or the path of a file holding it (uploads are
+    spooled to disk, see upload_spool.py).
+
+    Large documents are split into page batches across a process pool;
+    small ones (or PDF_EXTRACT_WORKERS <= 1) are handled in-process when
+    called from the main thread. Elsewhere (the upload worker threads)
+    nothing could interrupt a slow page in-process, so every document goes
+    through the pool. Raises PDFExtractionError if the whole document
+    exceeds PDF_TOTAL_TIMEOUT.
+    on_progress(pages_done, pages_total) is called as pages complete.
+
+    Returns (text, tables) where tables is a list of pdfplumber tables
+    (lists of rows of cell strings), empty unless tables=True.
+    """
+    engine = engine or PDF_EXTRACT_ENGINE
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown PDF extraction engine {engine!r}")
+
+    deadline = time.monotonic() + PDF_TOTAL_TIMEOUT
+    page_count = _page_count(source)
+
+    if on_progress is not None:
+        on_progress(0, page_count)
+
+        def progress(pages_done):
+            on_progress(pages_done, page_count)
+    else:
+        progress = None
+
+    parallel = PDF_EXTRACT_WORKERS > 1 and page_count >= PDF_PARALLEL_MIN_PAGES
+    if parallel or not _can_time_limit():
+        results = _extract_parallel(source, page_count, engine, deadline, progress, tables)
+        results.sort(key=lambda result: result[0])
+    else:
+        results = _extract_pages(source, list(range(page_count)), engine,
+                                 PDF_PAGE_TIMEOUT, deadline, _pdfium_lock, progress, tables)
+
+    text = "\n".join(page_text for _, page_text, _ in results if page_text).strip()
+    return text, [table for _, _, page_tables in results for table in page_tables]
+
+
+def extract_text(source, engine=None, on_progress=None):
+    """Extract the text of every page, in page order"""
+    return extract_document(source, engine, on_progress)[0]
@@ -0,0 +1,184 @@
+import math
+import os
+import re
+from collections import Counter
+
+from lab_values import ALIASES
+
+# Report retrieval configuration
+REPORT_CHUNK_TOKENS = int(os.getenv("REPORT_CHUNK_TOKENS", "120"))
+REPORT_CONTEXT_TOKENS = int(os.getenv("REPORT_CONTEXT_TOKENS", "1500"))  # 0 sends the whole report
+REPORT_TOP_K = int(os.getenv("REPORT_TOP_K", "8"))
+# Most of the budget pinned lines (the flagged results) may take
+REPORT_PINNED_SHARE = float(os.getenv("REPORT_PINNED_SHARE", "0.5"))
+
+# BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOP_WORDS = {
+    'a', 'an', 'the', 'is', 'are', 'was', 'what', 'whats', 'i', 'my', 'me', 'and',
+    'or', 'of', 'to', 'in', 'on', 'for', 'with', 'do', 'does', 'can', 'please',
+    'tell', 'about', 'it', 'be', 'am', 'have', 'has', 'this', 'that', 'how', 'why',
+    'should', 'report', 'level', 'levels', 'value', 'values',
+}
+
+# Marks a gap between non-adjacent excerpts in the prompt
+GAP_MARKER = "[...]"
+# Budget counted per selected chunk for the newline and gap marker around it
+SEPARATOR_TOKENS = 2
+
+
+def estimate_tokens(text):
+    """Rough Gemini token count (about 4 characters per token)"""
+    return (len(text) + 3) // 4
+
+
+def _terms(text):
+    words = (ALIASES.get(word, word) for word in WORD_PATTERN.findall(text.lower()))
+    return [word for word in words if word not in STOP_WORDS]
+
+
+def chunk_text(text, chunk_tokens=REPORT_CHUNK_TOKENS):
+    """Split text into chunks of whole lines, each about chunk_tokens long"""
+    chunks = []
+    current, current_tokens = [], 0
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        tokens = estimate_tokens(line)
+        if current and current_tokens + tokens > chunk_tokens:
+            chunks.append("\n".join(current))
+            current, current_tokens = [], 0
+        current.append(line)
+        current_tokens += tokens
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def build_index(text, chunk_tokens=REPORT_CHUNK_TOKENS):
+    """Chunk a report and build its BM25 index (plain lists/dicts, JSON-friendly)"""
+    chunks = chunk_text(text, chunk_tokens)
+    term_counts = [Counter(_terms(chunk)) for chunk in chunks]
+    doc_freq = Counter()
+    for counts in term_counts:
+        doc_freq.update(counts.keys())
+    lengths = [sum(counts.values()) for counts in term_counts]
+    return {
+        'chunks': chunks,
+        'tokens': [estimate_tokens(chunk) for chunk in chunks],
+        'term_counts': [dict(counts) for counts in term_counts],
+        'doc_freq': dict(doc_freq),
+        'lengths': lengths,
+        'avg_length': sum(lengths) / len(lengths) if lengths else 0.0,
+    }
+
+
+def _scores(index, query):
+    query_terms = set(_terms(query))
+    chunk_count = len(index['chunks'])
+    avg_length = index['avg_length'] or 1.0
+    scores = []
+    for counts, length in zip(index['term_counts'], index['lengths']):
+        score = 0.0
+        for term in query_terms:
+            tf = counts.get(term)
+            if not tf:
+                continue
+            df = index['doc_freq'][term]
+            idf = math.log(1 + (chunk_count - df + 0.5) / (df + 0.5))
+            score += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length))
+        scores.append(score)
+    return scores
+
+
+def _clip(text, tokens):
+    """text cut to about `tokens` tokens, at a line boundary when there is one"""
+    limit = max(tokens, 1) * 4
+    if len(text) <= limit:
+        return text
+    clipped = text[:limit]
+    return clipped.rsplit("\n", 1)[0] if "\n" in clipped else clipped
+
+
+def _fit_lines(lines, query, budget, title=""):
+    """title and the lines that fit `budget` tokens, in their original order.
+
+    When they do not all fit, the lines sharing most terms with the query
+    are kept first, then the earliest ones, and a last line counts the rest.
+    """
+    parts = [title] + lines if title else list(lines)
+    if estimate_tokens("\n".join(parts)) <= budget:
+        return "\n".join(parts)
+
+    query_terms = set(_terms(query))
+    order = sorted(range(len(lines)), key=lambda i: (-len(query_terms.intersection(_terms(lines[i]))), i))
+    # Each part is counted with its newline, so the joined text stays within budget
+    used = estimate_tokens(f"{title}\n") if title else 0
+    used += estimate_tokens(f"({len(lines)} more not shown)")
+    kept = []
+    for i in order:
+        cost = estimate_tokens(f"{lines[i]}\n")
+        if used + cost > budget:
+            continue
+        kept.append(i)
+        used += cost
+
+    parts = [title] if title else []
+    parts += [lines[i] for i in sorted(kept)]
+    parts.append(f"({len(lines) - len(kept)} more not shown)")
+    return "\n".join(parts)
+
+
+def select_context(index, query, budget=None, top_k=None, pinned=(), pinned_title=""):
+    """Report text to put in the prompt for this question.
+
+    Reports that fit the token budget are sent whole. Otherwise the
+    `pinned` lines (the flagged results, so broad questions like "is
+    anything abnormal?" still see values from every page) come first under
+    `pinned_title`, within REPORT_PINNED_SHARE of the budget; if they do not
+    all fit, the ones matching the question are kept. The top_k chunks by
+    BM25 score that fit the rest of the budget follow, in report order. A
+    question matching no chunk (e.g. "summarize my report") gets the
+    leading chunks that fit. At least one chunk is always sent, cut to what
+    is left of the budget if it is too long.
+    """
+    budget = REPORT_CONTEXT_TOKENS if budget is None else budget
+    top_k = REPORT_TOP_K if top_k is None else top_k
+    chunks = index['chunks']
+    tokens = index['tokens']
+    if not budget or sum(tokens) <= budget:
+        return "\n".join(chunks)
+
+    parts = []
+    if pinned:
+        parts = [_fit_lines(list(pinned), query, int(budget * REPORT_PINNED_SHARE), pinned_title), GAP_MARKER]
+        budget = max(budget - estimate_tokens("\n".join(parts) + "\n"), 1)
+
+    scores = _scores(index, query)
+    matched = [i for i in sorted(range(len(chunks)), key=lambda i: -scores[i]) if scores[i] > 0]
+    candidates = matched or range(len(chunks))
+
+    selected, used = [], 0
+    for i in candidates:
+        if matched and top_k and len(selected) >= top_k:
+            break
+        if used + tokens[i] + SEPARATOR_TOKENS > budget:
+            continue
+        selected.append(i)
+        used += tokens[i] + SEPARATOR_TOKENS
+
+    if not selected:
+        best = candidates[0]
+        return "\n".join(parts + [_clip(chunks[best], budget)])
+    previous = None
+    for i in sorted(selected):
+        if previous is not None and i != previous + 1:
+            parts.append(GAP_MARKER)
+        parts.append(chunks[i])
+        previous = i
+    return "\n".join(parts)
@@ -0,0 +1,225 @@
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+
+# Response cache configuration
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1000"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+RESPONSE_CACHE_SEMANTIC = os.getenv("RESPONSE_CACHE_SEMANTIC", "true").lower() == "true"
+RESPONSE_CACHE_SIMILARITY_THRESHOLD = float(os.getenv("RESPONSE_CACHE_SIMILARITY_THRESHOLD", "0.9"))
+
+# Only answers that do not depend on per-user data may be cached. Lab report
+# answers depend on the uploaded document, so there is deliberately no
+# namespace for lab_agent.
+NAMESPACES = ('general', 'symptoms')
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Words that carry no meaning for matching questions to each other. Negations
+# are kept on purpose: "fever" and "no fever" must not look alike.
+STOP_WORDS = {
+    'a', 'an', 'the', 'is', 'are', 'was', 'what', 'whats', 'i', 'im', 'my', 'me',
+    'and', 'or', 'of', 'to', 'in', 'on', 'for', 'with', 'do', 'does', 'can',
+    'please', 'tell', 'about', 'it', 'be', 'am', 'have', 'has', 'having',
+}
+
+_entries = OrderedDict()  # (namespace, normalized query) -> entry, LRU order
+_postings = {}            # (namespace, term) -> set of keys containing term
+_doc_freq = Counter()     # (namespace, term) -> number of cached queries with term
+_sizes = Counter()        # namespace -> number of cached queries
+_lock = threading.Lock()
+
+_stats = {
+    "lookups": 0,
+    "exact_hits": 0,
+    "similar_hits": 0,
+    "misses": 0,
+    "stores": 0,
+    "evictions": 0,
+    "expirations": 0,
+    "saved_seconds": 0.0,
+}
+
+
+def normalize_query(query):
+    """Lowercase, drop punctuation and collapse whitespace"""
+    return " ".join(WORD_PATTERN.findall(query.lower()))
+
+
+def _terms(normalized):
+    """Term counts used for similarity: content words plus word bigrams"""
+    words = [w for w in normalized.split() if w not in STOP_WORDS]
+    terms = Counter(words)
+    terms.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+    return terms
+
+
+def _words(terms):
+    """The content words among a query's terms (bigrams left out)"""
+    return {term for term in terms if ' ' not in term}
+
+
+def _idf(namespace, term):
+    return math.log((1 + _sizes[namespace]) / (1 + _doc_freq[(namespace, term)])) + 1
+
+
+def _weights(namespace, terms):
+    return {term: (1 + math.log(count)) * _idf(namespace, term) for term, count in terms.items()}
+
+
+def _cosine(a, b):
+    dot = sum(weight * b[term] for term, weight in a.items() if term in b)
+    if not dot:
+        return 0.0
+    norm_a = math.sqrt(sum(w * w for w in a.values()))
+    norm_b = math.sqrt(sum(w * w for w in b.values()))
+    return dot / (norm_a * norm_b)
+
+
+def _remove(key):
+    """Drop an entry and its index postings (caller holds the lock)"""
+    entry = _entries.pop(key)
+    namespace = key[0]
+    _sizes[namespace] -= 1
+    for term in entry['terms']:
+        posting = _postings.get((namespace, term))
+        if posting is not None:
+            posting.discard(key)
+            if not posting:
+                del _postings[(namespace, term)]
+        _doc_freq[(namespace, term)] -= 1
+        if _doc_freq[(namespace, term)] <= 0:
+            del _doc_freq[(namespace, term)]
+
+
+def _expired(entry, now):
+    return now - entry['created'] > RESPONSE_CACHE_TTL_SECONDS
+
+
+def _similar(namespace, terms, now):
+    """Best cached entry with the same content words whose TF-IDF cosine
+    similarity clears the threshold.
+
+    A word on either side that the other lacks changes the question:
+    "normal blood sugar" must not get the answer cached for "normal blood
+    sugar during pregnancy", nor "normal heart rate for an adult" the one
+    for "normal heart rate". Only wording (stop words, order, repeats) may
+    differ.
+    """
+    words = _words(terms)
+    postings = sorted((_postings.get((namespace, word), set()) for word in words), key=len)
+    candidates = set.intersection(*postings) if postings else set()
+
+    query_weights = _weights(namespace, terms)
+    best_key, best_score = None, 0.0
+    for key in candidates:
+        entry = _entries[key]
+        if _expired(entry, now) or _words(entry['terms']) != words:
+            continue
+        score = _cosine(query_weights, _weights(namespace, entry['terms']))
+        if score > best_score:
+            best_key, best_score = key, score
+
+    if best_key is not None and best_score >= RESPONSE_CACHE_SIMILARITY_THRESHOLD:
+        return best_key
+    return None
+
+
+def get(namespace, query):
+    """Return a cached response for this query, or None.
+
+    Exact match on the normalized query first, then (if enabled) the most
+    similar cached query above RESPONSE_CACHE_SIMILARITY_THRESHOLD.
+    """
+    if namespace not in NAMESPACES:
+        raise ValueError(f"Responses for {namespace!r} must not be cached")
+    if not RESPONSE_CACHE_ENABLED:
+        return None
+
+    normalized = normalize_query(query)
+    key = (namespace, normalized)
+    now = time.monotonic()
+
+    with _lock:
+        _stats["lookups"] += 1
+
+        entry = _entries.get(key)
+        if entry is not None and _expired(entry, now):
+            _remove(key)
+            _stats["expirations"] += 1
+            entry = None
+
+        if entry is not None:
+            _stats["exact_hits"] += 1
+        elif RESPONSE_CACHE_SEMANTIC:
+            terms = _terms(normalized)
+            similar_key = _similar(namespace, terms, now) if terms else None
+            if similar_key is not None:
+                key = similar_key
+                entry = _entries[key]
+                _stats["similar_hits"] += 1
+
+        if entry is None:
+            _stats["misses"] += 1
+            return None
+
+        _entries.move_to_end(key)
+        _stats["saved_seconds"] += entry['generation_seconds']
+        return entry['response']
+
+
+def put(namespace, query, response, generation_seconds=0.0):
+    """Cache a generated response, evicting least recently used entries"""
+    if namespace not in NAMESPACES:
+        raise ValueError(f"Responses for {namespace!r} must not be cached")
+    if not RESPONSE_CACHE_ENABLED:
+        return
+
+    normalized = normalize_query(query)
+    if not normalized:
+        return
+    key = (namespace, normalized)
+    terms = _terms(normalized)
+
+    with _lock:
+        if key in _entries:
+            _remove(key)
+
+        _entries[key] = {
+            'response': response,
+            'terms': terms,
+            'created': time.monotonic(),
+            'generation_seconds': generation_seconds,
+        }
+        _sizes[namespace] += 1
+        for term in terms:
+            _postings.setdefault((namespace, term), set()).add(key)
+            _doc_freq[(namespace, term)] += 1
+        _stats["stores"] += 1
+
+        while len(_entries) > RESPONSE_CACHE_SIZE:
+            _remove(next(iter(_entries)))
+            _stats["evictions"] += 1
+
+
+def clear():
+    """Drop every cached response"""
+    with _lock:
+        _entries.clear()
+        _postings.clear()
+        _doc_freq.clear()
+        _sizes.clear()
+
+
+def cache_stats():
+    """Snapshot of the cache counters"""
+    with _lock:
+        stats = dict(_stats)
+        stats["entries"] = len(_entries)
+    hits = stats["exact_hits"] + stats["similar_hits"]
+    stats["hit_rate"] = hits / stats["lookups"] if stats["lookups"] else 0.0
+    return stats
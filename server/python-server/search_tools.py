@@ -0,0 +1,149 @@
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# Web search configuration
+# auto: only questions that need fresh information get the search tools
+# always: every agent run may search (the original behaviour)
+# never: no agent ever searches
+SEARCH_POLICY = os.getenv("SEARCH_POLICY", "auto")
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "500"))
+SEARCH_CACHE_TTL_SECONDS = float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "3600"))
+SEARCH_TIMEOUT_SECONDS = int(os.getenv("SEARCH_TIMEOUT_SECONDS", "10"))
+
+# Questions that the model cannot answer from the report or its own training
+# data: recent events, new treatments, current guidelines, prices, places
+FRESH_INFO_PATTERNS = [re.compile(pattern) for pattern in [
+    r"\b(latest|newest|recent|recently|currently|up to date|up-to-date|nowadays)\b",
+    r"\b(today|yesterday|right now|this (week|month|year)|last (week|month|year))\b",
+    r"\b20[0-9]{2}\b",
+    r"\bnew (drug|drugs|medicine|medicines|treatment|treatments|vaccine|vaccines|variant|guideline|guidelines|study|research|therapy)\b",
+    r"\b(news|outbreak|outbreaks|recall|recalled|shortage|banned|fda|cdsco|icmr)\b",
+    r"\b(approved|approval) (for|by|in)\b",
+    r"\bcurrent (guideline|guidelines|recommendation|recommendations|treatment|cases|situation)\b",
+    r"\b(clinical trial|clinical trials|research on|studies on|study on)\b",
+    r"\b(price|prices|cost|costs|near me|available in|where (can|do|to) (i )?(get|buy|find))\b",
+]]
+
+_entries = OrderedDict()  # (kind, normalized query, max_results) -> (expires_at, result, seconds), LRU order
+_lock = threading.Lock()
+
+_stats = {
+    "queries_with_search": 0,
+    "queries_without_search": 0,
+    "lookups": 0,
+    "hits": 0,
+    "misses": 0,
+    "expirations": 0,
+    "evictions": 0,
+    "saved_seconds": 0.0,
+}
+
+
+def needs_web_search(query):
+    """Whether an agent answering this question should get the search tools"""
+    if SEARCH_POLICY == "always":
+        needed = True
+    elif SEARCH_POLICY == "never":
+        needed = False
+    else:
+        query_lower = (query or "").lower()
+        needed = any(pattern.search(query_lower) for pattern in FRESH_INFO_PATTERNS)
+    with _lock:
+        _stats["queries_with_search" if needed else "queries_without_search"] += 1
+    return needed
+
+
+def _fetch(kind, query, max_results):
+    """Run one DuckDuckGo search and return the results as JSON"""
+    from duckduckgo_search import DDGS
+
+    ddgs = DDGS(timeout=SEARCH_TIMEOUT_SECONDS)
+    if kind == 'news':
+        results = ddgs.news(keywords=query, max_results=max_results)
+    else:
+        results = ddgs.text(keywords=query, max_results=max_results)
+    return json.dumps(results, indent=2)
+
+
+def cached_search(kind, query, max_results=5):
+    """Search results for a query, served from the TTL cache when possible.
+
+    Failed searches are not cached; the error goes back to the model.
+    """
+    key = (kind, " ".join(query.lower().split()), max_results)
+    now = time.monotonic()
+    with _lock:
+        _stats["lookups"] += 1
+        entry = _entries.get(key)
+        if entry is not None:
+            expires_at, result, cost = entry
+            if expires_at > now:
+                _entries.move_to_end(key)
+                _stats["hits"] += 1
+                _stats["saved_seconds"] += cost
+                return result
+            del _entries[key]
+            _stats["expirations"] += 1
+        _stats["misses"] += 1
+
+    start = time.perf_counter()
+    result = _fetch(kind, query, max_results)
+    cost = time.perf_counter() - start
+    with _lock:
+        _entries[key] = (time.monotonic() + SEARCH_CACHE_TTL_SECONDS, result, cost)
+        _entries.move_to_end(key)
+        while len(_entries) > SEARCH_CACHE_SIZE:
+            _entries.popitem(last=False)
+            _stats["evictions"] += 1
+    return result
+
+
+# The agents' tools. phi builds the tool schema from the type hints and the
+# docstring, so these two keep both.
+
+def duckduckgo_search(query: str, max_results: int = 5) -> str:
+    """Use this function to search DuckDuckGo for a query.
+
+    Args:
+        query(str): The query to search for.
+        max_results (optional, default=5): The maximum number of results to return.
+
+    Returns:
+        The result from DuckDuckGo.
+    """
+    return cached_search('text', query, max_results)
+
+
+def duckduckgo_news(query: str, max_results: int = 5) -> str:
+    """Use this function to get the latest news from DuckDuckGo.
+
+    Args:
+        query(str): The query to search for.
+        max_results (optional, default=5): The maximum number of results to return.
+
+    Returns:
+        The latest news from DuckDuckGo.
+    """
+    return cached_search('news', query, max_results)
+
+
+SEARCH_TOOLS = [duckduckgo_search, duckduckgo_news]
+
+
+def clear():
+    with _lock:
+        _entries.clear()
+
+
+def cache_stats():
+    """Snapshot of the search routing and cache counters"""
+    with _lock:
+        stats = dict(_stats)
+        stats["entries"] = len(_entries)
+        stats["policy"] = SEARCH_POLICY
+    stats["hit_rate"] = stats["hits"] / stats["lookups"] if stats["lookups"] else 0.0
+    return stats
@@ -0,0 +1,360 @@
+import json
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+
+# Session store configuration
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(256 * 1024 * 1024)))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# Redis session fields whose JSON is at least this long are zlib-compressed
+REDIS_COMPRESS_MIN_BYTES = int(os.getenv("REDIS_COMPRESS_MIN_BYTES", "512"))
+
+
+# Fields holding a report's extracted content. Sessions made from the same
+# upload (same 'content_id') share these objects, so they are counted once.
+CONTENT_FIELDS = ('text', 'lab_values', 'report_index')
+
+
+def field_size(value):
+    """Approximate bytes held by a field, measured deeply: the length of a
+    string, or of the field's JSON for containers"""
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    return len(json.dumps(value, default=str))
+
+
+def field_sizes(session, previous=None, changed=()):
+    """Size of each field of a session, leaving out content shared through
+    its content_id. Sizes in `previous` are reused for unchanged fields."""
+    shared = CONTENT_FIELDS if session.get('content_id') else ()
+    sizes = {}
+    for name, value in session.items():
+        if name in shared:
+            continue
+        if previous is not None and name in previous and name not in changed:
+            sizes[name] = previous[name]
+        else:
+            sizes[name] = field_size(value)
+    return sizes
+
+
+def content_size(session):
+    """Size of the shared content fields of a session; 'content_size' when
+    the extraction cache already measured them"""
+    if session.get('content_size') is not None:
+        return session['content_size']
+    return sum(field_size(session[name]) for name in CONTENT_FIELDS if name in session)
+
+
+class SessionStore:
+    """Storage for uploaded-report sessions.
+
+    A session is a dict with at least 'text', 'filename' and 'timestamp' (time
+    of last access). Sessions expire after `timeout_seconds` without access.
+    """
+
+    # Called as on_remove(session_id, session) when a session expires, is
+    # evicted or deleted. Only stores that see removals happen can call it.
+    on_remove = None
+    reports_removals = False
+
+    def put(self, session_id, session):
+        raise NotImplementedError
+
+    def get(self, session_id, touch=True):
+        """Return a copy of the session, or None if missing or expired.
+
+        touch=True counts as an access and extends the session's lifetime.
+        """
+        raise NotImplementedError
+
+    def update(self, session_id, fields):
+        """Merge fields into an existing session; returns False if it is gone"""
+        raise NotImplementedError
+
+    def delete(self, session_id):
+        raise NotImplementedError
+
+    def cleanup(self):
+        """Drop expired sessions and return how many were removed"""
+        return 0
+
+    def stats(self):
+        return {}
+
+
+class InMemorySessionStore(SessionStore):
+    """Process-local store bounded by a global byte budget.
+
+    Sessions are kept in an OrderedDict in last-access order. With a sliding
+    timeout that is also expiry order, so cleanup only looks at the expired
+    sessions at the front instead of scanning everything, and the least
+    recently used session is the first to go when over budget.
+
+    Sizes are measured deeply (see field_size). Extracted content shared by
+    several sessions through a content_id is counted once, and its bytes are
+    freed with the last session using it.
+    """
+
+    reports_removals = True
+
+    def __init__(self, timeout_seconds, max_bytes=SESSION_MAX_BYTES):
+        self.timeout_seconds = timeout_seconds
+        self.max_bytes = max_bytes
+        self._sessions = OrderedDict()  # session_id -> (session, field sizes)
+        self._contents = {}  # content_id -> [size, sessions using it]
+        self._bytes = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._lock = threading.Lock()
+
+    def _expired(self, session, now):
+        return (now - session['timestamp']).total_seconds() > self.timeout_seconds
+
+    def _add_content(self, session):
+        content_id = session.get('content_id')
+        if content_id is None:
+            return
+        entry = self._contents.get(content_id)
+        if entry is None:
+            entry = self._contents[content_id] = [content_size(session), 0]
+            self._bytes += entry[0]
+        entry[1] += 1
+
+    def _remove_content(self, session):
+        content_id = session.get('content_id')
+        entry = self._contents.get(content_id)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if not entry[1]:
+            del self._contents[content_id]
+            self._bytes -= entry[0]
+
+    def _pop(self, session_id):
+        session, sizes = self._sessions.pop(session_id)
+        self._bytes -= sum(sizes.values())
+        self._remove_content(session)
+        if self.on_remove is not None:
+            self.on_remove(session_id, session)
+        return session
+
+    def _store(self, session_id, session, changed=None):
+        """Insert or replace a session in place, then enforce the byte budget.
+        changed names the fields that differ from the stored session (None: all)."""
+        previous = self._sessions.get(session_id)
+        reuse = previous[1] if previous is not None and changed is not None else None
+        sizes = field_sizes(session, reuse, changed or ())
+        # Add the new content reference first, so content kept by an update is not measured again
+        self._add_content(session)
+        if previous is not None:
+            self._bytes -= sum(previous[1].values())
+            self._remove_content(previous[0])
+        self._sessions[session_id] = (session, sizes)
+        self._bytes += sum(sizes.values())
+
+        if self._bytes > self.max_bytes:
+            # Never evict the session being stored, even if it alone is over budget
+            for victim in list(self._sessions):
+                if self._bytes <= self.max_bytes:
+                    break
+                if victim != session_id:
+                    self._pop(victim)
+                    self._evictions += 1
+
+    def put(self, session_id, session):
+        session = dict(session)
+        session.setdefault('timestamp', datetime.now())
+        with self._lock:
+            self._store(session_id, session)
+            self._sessions.move_to_end(session_id)
+
+    def get(self, session_id, touch=True):
+        now = datetime.now()
+        with self._lock:
+            item = self._sessions.get(session_id)
+            if item is None:
+                return None
+
+            session = item[0]
+            if self._expired(session, now):
+                self._pop(session_id)
+                self._expirations += 1
+                return None
+
+            if touch:
+                session['timestamp'] = now
+                self._sessions.move_to_end(session_id)
+            return dict(session)
+
+    def update(self, session_id, fields):
+        with self._lock:
+            item = self._sessions.get(session_id)
+            if item is None:
+                return False
+            # Updating is not an access, so the session keeps its place
+            self._store(session_id, {**item[0], **fields}, changed=fields)
+            return True
+
+    def delete(self, session_id):
+        with self._lock:
+            if session_id in self._sessions:
+                self._pop(session_id)
+
+    def cleanup(self):
+        now = datetime.now()
+        removed = 0
+        with self._lock:
+            while self._sessions:
+                session_id, (session, _) = next(iter(self._sessions.items()))
+                if not self._expired(session, now):
+                    break
+                self._pop(session_id)
+                removed += 1
+            self._expirations += removed
+        return removed
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": "memory",
+                "sessions": len(self._sessions),
+                "bytes": self._bytes,
+                "shared_contents": len(self._contents),
+                "max_bytes": self.max_bytes,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+            }
+
+
+class RedisSessionStore(SessionStore):
+    """Store shared by every worker/instance, backed by Redis (or a
+    compatible server such as fakeredis in tests).
+
+    Each session is a hash with a native TTL that is refreshed on access. The
+    report text is zlib-compressed; other fields are stored as JSON,
+    compressed too once it reaches REDIS_COMPRESS_MIN_BYTES (the report
+    index repeats every chunk's text, lab values and the conversation grow
+    with the report). Keys expire inside Redis, so on_remove is never called.
+
+    Writes to an existing session check that it is still there in the same
+    WATCH/MULTI transaction, so a key expiring between the check and the
+    write is not recreated with only the written fields. A hash without
+    'text' (every session has one) is treated as missing.
+    """
+
+    def __init__(self, client, timeout_seconds, prefix="session:"):
+        self.client = client
+        self.timeout_seconds = int(timeout_seconds)
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url, timeout_seconds):
+        import redis
+        return cls(redis.Redis.from_url(url), timeout_seconds)
+
+    def _key(self, session_id):
+        return f"{self.prefix}{session_id}"
+
+    @staticmethod
+    def _encode(fields):
+        encoded = {}
+        for name, value in fields.items():
+            if name == 'text':
+                encoded[name] = zlib.compress(value.encode('utf-8'))
+            elif name == 'timestamp':
+                encoded[name] = value.isoformat()
+            else:
+                value = json.dumps(value)
+                if len(value) >= REDIS_COMPRESS_MIN_BYTES:
+                    value = zlib.compress(value.encode('utf-8'))
+                encoded[name] = value
+        return encoded
+
+    @staticmethod
+    def _load_json(value):
+        # JSON never starts with 'x'; a zlib stream (default header 0x78) always does
+        if isinstance(value, bytes) and value[:1] == b'x':
+            value = zlib.decompress(value)
+        return json.loads(value)
+
+    @staticmethod
+    def _decode(data):
+        session = {}
+        for name, value in data.items():
+            name = name.decode() if isinstance(name, bytes) else name
+            if name == 'text':
+                session[name] = zlib.decompress(value).decode('utf-8')
+            elif name == 'timestamp':
+                session[name] = datetime.fromisoformat(value.decode() if isinstance(value, bytes) else value)
+            else:
+                session[name] = RedisSessionStore._load_json(value)
+        return session
+
+    def put(self, session_id, session):
+        session = dict(session)
+        session.setdefault('timestamp', datetime.now())
+        key = self._key(session_id)
+        pipe = self.client.pipeline()
+        pipe.delete(key)
+        pipe.hset(key, mapping=self._encode(session))
+        pipe.expire(key, self.timeout_seconds)
+        pipe.execute()
+
+    @staticmethod
+    def _has_text(data):
+        return b'text' in data or 'text' in data
+
+    def get(self, session_id, touch=True):
+        key = self._key(session_id)
+        if not touch:
+            data = self.client.hgetall(key)
+            return self._decode(data) if self._has_text(data) else None
+
+        now = datetime.now()
+
+        def read_and_touch(pipe):
+            data = pipe.hgetall(key)
+            if not self._has_text(data):
+                return None
+            pipe.multi()
+            pipe.hset(key, 'timestamp', now.isoformat())
+            pipe.expire(key, self.timeout_seconds)
+            return data
+
+        data = self.client.transaction(read_and_touch, key, value_from_callable=True)
+        if data is None:
+            return None
+        session = self._decode(data)
+        session['timestamp'] = now
+        return session
+
+    def update(self, session_id, fields):
+        key = self._key(session_id)
+        encoded = self._encode(fields)
+
+        def write(pipe):
+            if not pipe.hexists(key, 'text'):
+                return False
+            pipe.multi()
+            # HSET leaves the key's TTL alone
+            pipe.hset(key, mapping=encoded)
+            return True
+
+        return self.client.transaction(write, key, value_from_callable=True)
+
+    def delete(self, session_id):
+        self.client.delete(self._key(session_id))
+
+    def stats(self):
+        return {"backend": "redis"}
+
+
+def create_session_store(timeout_seconds):
+    """Build the store selected by SESSION_BACKEND ('memory' or 'redis')"""
+    if SESSION_BACKEND == "redis":
+        return RedisSessionStore.from_url(REDIS_URL, timeout_seconds)
+    return InMemorySessionStore(timeout_seconds, SESSION_MAX_BYTES)
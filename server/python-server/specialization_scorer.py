@@ -0,0 +1,148 @@
+import os
+import re
+import threading
+from data import (
+    NEGATION_CUES,
+    NEGATION_SCOPE_BREAKS,
+    SPECIALIZATION_PHRASE_WEIGHTS,
+    SYMPTOM_SPECIALIZATION_MAP,
+)
+from matcher import PhraseMatcher, tokenize
+
+# Specialization scoring configuration
+SPECIALIZATION_TOP_K = int(os.getenv("SPECIALIZATION_TOP_K", "3"))
+# Runners-up are only reported when they score at least this share of the top one
+SPECIALIZATION_MIN_SHARE = float(os.getenv("SPECIALIZATION_MIN_SHARE", "0.5"))
+# A negation cue covers symptoms starting at most this many words after it
+NEGATION_WINDOW = int(os.getenv("NEGATION_WINDOW", "5"))
+
+# Negation never reaches past the end of a clause: "no idea why, chest pain"
+CLAUSE_BREAK = re.compile(r"[.,:;!?()\n]+")
+
+PHRASE = 'phrase'
+NEGATION = 'negation'
+SCOPE_BREAK = 'scope_break'
+
+
+def phrase_weights():
+    """{phrase: {specialization: weight}} from the map and the weight table"""
+    weights = {phrase: {specialization: 1.0} for phrase, specialization in SYMPTOM_SPECIALIZATION_MAP.items()}
+    weights.update(SPECIALIZATION_PHRASE_WEIGHTS)
+    return weights
+
+
+class SpecializationScorer:
+    """Ranks specializations for symptom descriptions.
+
+    Phrases and specializations form a (phrases x specializations) weight
+    matrix, built once. A text is scanned into the set of phrases it
+    mentions, leaving out negated ones and phrases inside a longer match
+    ("fever" in "fever in child"); its scores are the sum of those phrases'
+    rows. rank_many() scores a whole batch with one NumPy accumulation.
+    """
+
+    def __init__(self, weights):
+        import numpy as np
+
+        self._np = np
+        self.phrases = list(weights)
+        self.specializations = list(dict.fromkeys(
+            specialization for phrase in self.phrases for specialization in weights[phrase]))
+        columns = {specialization: j for j, specialization in enumerate(self.specializations)}
+
+        self.weights = np.zeros((len(self.phrases), len(self.specializations)))
+        for i, phrase in enumerate(self.phrases):
+            for specialization, weight in weights[phrase].items():
+                self.weights[i, columns[specialization]] = weight
+
+        def entries():
+            for i, phrase in enumerate(self.phrases):
+                yield phrase, (PHRASE, i)
+            for cue in NEGATION_CUES:
+                yield cue, (NEGATION, None)
+            for word in NEGATION_SCOPE_BREAKS:
+                yield word, (SCOPE_BREAK, None)
+
+        self.matcher = PhraseMatcher(entries())
+
+    def phrase_hits(self, text):
+        """Indexes of the phrases a text mentions without negating them"""
+        hits = set()
+        for clause in CLAUSE_BREAK.split(text):
+            spans = self.matcher.find_spans(tokenize(clause))
+            # Longest match first at each position, so contained phrases are skipped
+            spans.sort(key=lambda span: (span[0], -span[1]))
+            negated_until = -1
+            covered_until = -1
+            for start, end, phrase, (kind, index) in spans:
+                if kind == NEGATION:
+                    negated_until = end + NEGATION_WINDOW
+                elif kind == SCOPE_BREAK:
+                    negated_until = -1
+                elif end > covered_until:
+                    covered_until = end
+                    if start > negated_until:
+                        hits.add(index)
+        return hits
+
+    def scores(self, texts):
+        """(len(texts) x specializations) score matrix"""
+        np = self._np
+        rows = []
+        phrases = []
+        for row, text in enumerate(texts):
+            for index in self.phrase_hits(text):
+                rows.append(row)
+                phrases.append(index)
+        scores = np.zeros((len(texts), len(self.specializations)))
+        np.add.at(scores, np.array(rows, dtype=np.intp), self.weights[np.array(phrases, dtype=np.intp)])
+        return scores
+
+    def rank_many(self, texts, top_k=SPECIALIZATION_TOP_K):
+        """For every text, [(specialization, confidence), ...] best first.
+
+        Confidence is the specialization's share of the text's total score.
+        A text with no (un-negated) symptom phrase gets an empty list.
+        """
+        np = self._np
+        scores = self.scores(texts)
+        # Stable sort keeps ties in table order
+        order = np.argsort(-scores, axis=1, kind="stable")[:, :top_k]
+        totals = scores.sum(axis=1)
+        ranked = []
+        for row, columns in enumerate(order):
+            best = scores[row, columns[0]]
+            ranked.append([
+                (self.specializations[j], round(float(scores[row, j] / totals[row]), 3))
+                for j in columns
+                if best > 0 and scores[row, j] >= best * SPECIALIZATION_MIN_SHARE
+            ])
+        return ranked
+
+    def rank(self, text, top_k=SPECIALIZATION_TOP_K):
+        return self.rank_many([text], top_k)[0]
+
+
+_scorer = None
+_lock = threading.Lock()
+
+
+def get_scorer():
+    """The shared scorer, built on first use (NumPy stays off the import path)"""
+    global _scorer
+    if _scorer is None:
+        with _lock:
+            if _scorer is None:
+                _scorer = SpecializationScorer(phrase_weights())
+    return _scorer
+
+
+def rank_specializations(text, top_k=SPECIALIZATION_TOP_K):
+    return get_scorer().rank(text, top_k)
+
+
+def rank_specializations_many(texts, top_k=SPECIALIZATION_TOP_K):
+    """rank_specializations() for many texts; identical texts are scored once"""
+    distinct = list(dict.fromkeys(texts))
+    by_text = dict(zip(distinct, get_scorer().rank_many(distinct, top_k))) if distinct else {}
+    return [by_text[text] for text in texts]
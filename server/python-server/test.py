@@ -1,3 +1,5 @@
+import io
+import sys
 import pdfplumber
 
 def test_pdf_extraction(pdf_path):
@@ -20,5 +22,10 @@ def test_pdf_extraction(pdf_path):
         print(f"❌ Error: {e}")
         return False
 
-# Test with your PDF
-test_pdf_extraction("C:/Users/ks520/Downloads/pd.pdf")
\ No newline at end of file
+# Test with your PDF: python test.py path/to/report.pdf
+# Without one, a generated lab report is used (see benchmarks/bench_pdf_extract.py)
+if len(sys.argv) > 1:
+    test_pdf_extraction(sys.argv[1])
+else:
+    from benchmarks.bench_pdf_extract import make_lab_pdf
+    test_pdf_extraction(io.BytesIO(make_lab_pdf(3)))
\ No newline at end of file
@@ -0,0 +1,132 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# Upload job configuration
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "4"))
+UPLOAD_QUEUE_SIZE = int(os.getenv("UPLOAD_QUEUE_SIZE", "16"))  # running + waiting jobs
+UPLOAD_WAIT_SECONDS = float(os.getenv("UPLOAD_WAIT_SECONDS", "5"))
+UPLOAD_RETRY_AFTER_SECONDS = int(os.getenv("UPLOAD_RETRY_AFTER_SECONDS", "5"))
+
+# Session 'status' values; sessions without one were stored fully processed
+PROCESSING = 'processing'
+READY = 'ready'
+FAILED = 'failed'
+
+POLL_INTERVAL_SECONDS = 0.1
+
+
+class UploadQueueFull(Exception):
+    pass
+
+
+def session_status(session):
+    return session.get('status', READY)
+
+
+class UploadJobs:
+    """Runs text extraction for uploaded PDFs on a background pool.
+
+    The session is created straight away with status 'processing' and is
+    updated with page progress, then with the fields returned by
+    process(session_id, upload, on_progress) ('ready') or an error
+    ('failed'). At most queue_size jobs may be running or waiting; beyond
+    that submit() raises UploadQueueFull so the caller can answer 429.
+    """
+
+    def __init__(self, store, process, workers=UPLOAD_WORKERS, queue_size=UPLOAD_QUEUE_SIZE):
+        self.store = store
+        self.process = process
+        self.queue_size = queue_size
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upload")
+        self._slots = threading.BoundedSemaphore(queue_size)
+        self._in_flight = 0
+        self._finished = {}  # session_id -> Event, for jobs running in this process
+        self._lock = threading.Lock()
+
+    def submit(self, session_id, filename, upload):
+        """Queue extraction of an upload (see upload_spool) for a new session;
+        raises UploadQueueFull"""
+        if not self._slots.acquire(blocking=False):
+            raise UploadQueueFull(f"{self.queue_size} uploads are already being processed")
+
+        finished = threading.Event()
+        with self._lock:
+            self._in_flight += 1
+            self._finished[session_id] = finished
+        try:
+            self.store.put(session_id, {
+                'text': '',
+                'filename': filename,
+                'status': PROCESSING,
+                'pages_done': 0,
+                'pages_total': None,
+                'timestamp': datetime.now()
+            })
+            self._executor.submit(self._run, session_id, upload, finished)
+        except Exception:
+            self._release(session_id, finished)
+            raise
+
+    def _release(self, session_id, finished):
+        with self._lock:
+            self._in_flight -= 1
+            self._finished.pop(session_id, None)
+        self._slots.release()
+        finished.set()
+
+    def _run(self, session_id, upload, finished):
+        def on_progress(pages_done, pages_total):
+            self.store.update(session_id, {'pages_done': pages_done, 'pages_total': pages_total})
+
+        try:
+            try:
+                fields = self.process(session_id, upload, on_progress)
+                if fields.get('text'):
+                    fields['status'] = READY
+                else:
+                    fields = {'status': FAILED, 'error': "No text could be extracted from the PDF"}
+            except Exception as e:
+                fields = {'status': FAILED, 'error': f"Failed to process PDF: {str(e)}"}
+            self.store.update(session_id, fields)
+        except Exception as e:
+            print(f"Upload job {session_id} failed: {e}")
+        finally:
+            self._release(session_id, finished)
+
+    def wait(self, session_id, timeout=UPLOAD_WAIT_SECONDS):
+        """Return the session, first waiting up to `timeout` if still processing"""
+        session = self.store.get(session_id)
+        if session is None or session_status(session) != PROCESSING:
+            return session
+
+        with self._lock:
+            finished = self._finished.get(session_id)
+        if finished is not None:
+            finished.wait(timeout)
+        else:
+            # Job runs in another worker or instance sharing the store
+            deadline = time.monotonic() + timeout
+            while time.monotonic() < deadline:
+                time.sleep(POLL_INTERVAL_SECONDS)
+                session = self.store.get(session_id)
+                if session is None or session_status(session) != PROCESSING:
+                    return session
+        return self.store.get(session_id)
+
+    async def wait_async(self, session_id, timeout=UPLOAD_WAIT_SECONDS):
+        """wait() for the event loop: polls instead of blocking a thread"""
+        session = await asyncio.to_thread(self.store.get, session_id)
+        deadline = time.monotonic() + timeout
+        while (session is not None and session_status(session) == PROCESSING
+               and time.monotonic() < deadline):
+            await asyncio.sleep(POLL_INTERVAL_SECONDS)
+            session = await asyncio.to_thread(self.store.get, session_id)
+        return session
+
+    def stats(self):
+        with self._lock:
+            return {"in_flight": self._in_flight, "queue_size": self.queue_size}
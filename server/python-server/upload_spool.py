@@ -0,0 +1,55 @@
+import hashlib
+import os
+import tempfile
+
+# Upload spooling configuration
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR") or None  # None: the system temp dir
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(64 * 1024)))
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class SpooledUpload:
+    """An uploaded file kept on disk until its extraction is done.
+
+    Holds the path, size and SHA-256 digest (the extraction cache key), so
+    the upload path never needs the whole file in memory; extraction
+    memory-maps the file (see pdf_extract). Whoever ends up owning it calls
+    remove().
+    """
+
+    def __init__(self, path, size, digest):
+        self.path = path
+        self.size = size
+        self.digest = digest
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def spool(stream, max_bytes=None):
+    """Copy a file-like stream to a spool file in UPLOAD_CHUNK_BYTES pieces,
+    hashing it on the way. Raises UploadTooLarge past max_bytes."""
+    digest = hashlib.sha256()
+    size = 0
+    fd, path = tempfile.mkstemp(suffix=".pdf", prefix="upload-", dir=UPLOAD_SPOOL_DIR)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = stream.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_bytes is not None and size > max_bytes:
+                    raise UploadTooLarge(f"Upload is larger than {max_bytes} bytes")
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return SpooledUpload(path, size, digest.hexdigest())